@@ -2,15 +2,23 @@ import os
 import re
 import math
 import uuid
+import json
 import random
-from datetime import datetime, date, timedelta
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, send_file
+from datetime import datetime, date
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, send_file, g, has_app_context, has_request_context
+from flask.cli import AppGroup
 from flask_session import Session
+import click
 import psycopg2
-from psycopg2 import sql, Error
+import psycopg2.errors
+import psycopg2.extensions
+import psycopg2.extras
+import psycopg2.pool
+from psycopg2 import Error
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import pandas as pd
+import numpy as np
 from dotenv import load_dotenv
 from io import BytesIO
 from reportlab.pdfgen import canvas
@@ -19,9 +27,19 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
-import calendar
+import zlib
+import base64
+import bisect
+import hashlib
 import sys
 import logging
+import threading
+import time
+import tracemalloc
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from types import MappingProxyType
 
 # ====================================
 # INITIALIZATION & CONFIGURATION
@@ -38,52 +56,1549 @@ Session(app)
 # ====================================
 # DATABASE HELPER
 # ====================================
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', '1800'))      # seconds before a connection is recycled
+DB_POOL_CHECKOUT_TIMEOUT = float(os.getenv('DB_POOL_CHECKOUT_TIMEOUT', '10'))  # seconds to wait for a free connection
+DB_POOL_PING_AFTER = float(os.getenv('DB_POOL_PING_AFTER', '30'))            # idle seconds before checkout pings
+DB_REPLICA_HOST = os.getenv('DB_REPLICA_HOST')  # read replica for read_only_route views; unset = primary only
+DB_REPLICA_STICKY_SECONDS = float(os.getenv('DB_REPLICA_STICKY_SECONDS', '5'))  # primary-only window after a write
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '5000'))  # default per-request budget; 0 disables
+DB_LOCK_TIMEOUT_MS = int(os.getenv('DB_LOCK_TIMEOUT_MS', '2000'))
+DB_RETRY_AFTER = int(os.getenv('DB_RETRY_AFTER', '5'))  # Retry-After seconds on 503s
+DB_SHED_P95_MS = float(os.getenv('DB_SHED_P95_MS', '250'))  # statement p95 that opens the breaker
+DB_SHED_WINDOW = int(os.getenv('DB_SHED_WINDOW', '500'))    # recent statements the p95 is taken over
+DB_SHED_COOLDOWN = float(os.getenv('DB_SHED_COOLDOWN', '30'))  # seconds expensive views stay shed
+
+
+def get_db_params(replica=False):
+    params = dict(
+        host=os.getenv('DB_HOST', 'localhost'),
+        database=os.getenv('DB_NAME', 'ecoquant'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', ''),
+        port=os.getenv('DB_PORT', '5432')
+    )
+    if replica:
+        # Unset replica settings fall back to the primary's
+        params.update(
+            host=DB_REPLICA_HOST,
+            port=os.getenv('DB_REPLICA_PORT', params['port']),
+            database=os.getenv('DB_REPLICA_NAME', params['database']),
+            user=os.getenv('DB_REPLICA_USER', params['user']),
+            password=os.getenv('DB_REPLICA_PASSWORD', params['password']),
+            # A write routed here by mistake fails loudly instead of diverging
+            options='-c default_transaction_read_only=on'
+        )
+    return params
+
+
+SQL_INSTRUMENTATION = os.getenv('SQL_INSTRUMENTATION', 'true').lower() in ('1', 'true', 'yes')
+SQL_REPEAT_WARN_THRESHOLD = int(os.getenv('SQL_REPEAT_WARN_THRESHOLD', '5'))  # same statement this many times => N+1 warning
+SQL_SLOW_LOG_LENGTH = 200  # characters of the slowest statement kept for logging
+
+
+def normalize_sql(query):
+    """Collapses a statement to its shape so repeated executions compare equal."""
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    query = re.sub(r"'(?:[^']|'')*'", '?', str(query))
+    query = re.sub(r'\b\d+(?:\.\d+)?\b', '?', query)
+    return ' '.join(query.split())
+
+
+class RequestQueryStats:
+    """Statements executed while serving one request (kept on flask g)."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_query = None
+        self.statements = {}
+
+    def record(self, query, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        normalized = normalize_sql(query)
+        self.statements[normalized] = self.statements.get(normalized, 0) + 1
+        if elapsed > self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_query = normalized
+
+    def repeated(self, threshold):
+        """Statements executed more than threshold times: likely N+1 loops."""
+        return {query: n for query, n in self.statements.items() if n > threshold}
+
+
+def current_query_stats():
+    if SQL_INSTRUMENTATION and has_app_context():
+        return g.get('query_stats')
+    return None
+
+
+class DatabaseLatencyBreaker:
+    """
+    Opens when the p95 of recent statement times crosses a threshold.
+    While open, views declared with @db_budget(shed_when_slow=True) are
+    refused so cheap pages (marketplace, dashboard) keep the database.
+    """
+
+    def __init__(self, threshold_ms, window, cooldown, min_samples=50):
+        self.threshold = threshold_ms / 1000
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._open_until = 0.0
+        self._checked_at = 0.0
+        self._p95 = 0.0
+
+    def record(self, elapsed):
+        self._samples.append(elapsed)
+
+    def p95(self):
+        samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return 0.0
+        return samples[int(len(samples) * 0.95) - 1]
+
+    def is_open(self):
+        now = time.monotonic()
+        if now < self._open_until:
+            return True
+        if now - self._checked_at < 1.0:
+            return False
+        with self._lock:
+            self._checked_at = now
+            self._p95 = self.p95()
+            if self._p95 > self.threshold:
+                self._open_until = now + self.cooldown
+                # Judge the next period on fresh samples only
+                self._samples.clear()
+                app.logger.warning(f"Database p95 {self._p95 * 1000:.0f}ms over budget, shedding expensive routes for {self.cooldown:.0f}s")
+                return True
+        return False
+
+
+db_latency_breaker = DatabaseLatencyBreaker(DB_SHED_P95_MS, DB_SHED_WINDOW, DB_SHED_COOLDOWN)
+
+
+def transaction_settings(conn):
+    """set_config() pairs applied at the start of every transaction on conn."""
+    settings = []
+    if conn.rls_context:
+        role, user_id = conn.rls_context
+        settings += [('role', role), ('app.user_id', user_id)]
+    if conn.db_budget:
+        statement_ms, lock_ms = conn.db_budget
+        settings += [('statement_timeout', f'{statement_ms}ms'), ('lock_timeout', f'{lock_ms}ms')]
+    return settings
+
+
+class RLSCursor(psycopg2.extensions.cursor):
+    """
+    Cursor that applies the connection's RLS context and DB budget
+    transaction-locally. They are sent in the same round-trip as the first
+    statement of every transaction, so they disappear on commit/rollback and
+    a pooled connection can never carry one request's settings into another.
+    Every statement is timed into the latency breaker and, inside a request,
+    into g.query_stats.
+    """
+
+    def execute(self, query, vars=None):
+        statement = query
+        settings = transaction_settings(self.connection)
+        if settings and self.connection.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            prefix = "SELECT " + ", ".join(["set_config(%s, %s, true)"] * len(settings))
+            query = self.mogrify(prefix, [value for pair in settings for value in pair]) + b'; ' + self.mogrify(query, vars)
+            vars = None
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        except (psycopg2.errors.QueryCanceled, psycopg2.errors.LockNotAvailable):
+            # Routes tend to swallow errors; flag it so the response becomes a 503
+            if has_request_context():
+                g.db_budget_exceeded = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            db_latency_breaker.record(elapsed)
+            stats = current_query_stats()
+            if stats is not None:
+                stats.record(statement, elapsed)
+
+
+class PoolConnection(psycopg2.extensions.connection):
+    """psycopg2 connection carrying the bookkeeping the pool needs."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cursor_factory = RLSCursor
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        # (role, user_id) applied by RLSCursor at the start of each transaction
+        self.rls_context = None
+        # (statement_timeout_ms, lock_timeout_ms), applied the same way
+        self.db_budget = None
+        # HOT_QUERIES names already PREPAREd on this server session
+        self.prepared_statements = set()
+
+    def commit(self):
+        super().commit()
+        # Seen by remember_db_write() to pin the session to the primary
+        if has_request_context():
+            g.db_committed = True
+
+
+class PooledConnection:
+    """
+    A connection checked out of the pool.
+    Behaves like a psycopg2 connection, but close() returns it to the pool.
+    """
+
+    def __init__(self, pool, conn):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_conn', conn)
+
+    def __getattr__(self, name):
+        conn = object.__getattribute__(self, '_conn')
+        if conn is None:
+            raise psycopg2.InterfaceError("connection already returned to the pool")
+        return getattr(conn, name)
+
+    def __setattr__(self, name, value):
+        if self._conn is None:
+            raise psycopg2.InterfaceError("connection already returned to the pool")
+        setattr(self._conn, name, value)
+
+    @property
+    def closed(self):
+        return 1 if self._conn is None else self._conn.closed
+
+    def close(self):
+        conn = self._conn
+        if conn is None:
+            return
+        object.__setattr__(self, '_conn', None)
+        self._pool.putconn(conn)
+
+
+class ConnectionPool:
+    """
+    Process-wide, thread-safe pool of PostgreSQL connections.
+    Connections are health checked on checkout, recycled after max_lifetime
+    seconds and rolled back to a clean state when they are returned.
+    """
+
+    def __init__(self, minconn, maxconn, max_lifetime, timeout, ping_after, connect_params=None):
+        self.minconn = minconn
+        self.maxconn = max(maxconn, 1)
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.connect_params = connect_params or get_db_params()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._size = 0       # open connections, idle + checked out
+        self._in_use = 0
+        self._warmed = False
+        self._counters = {
+            'connections_opened': 0,
+            'connections_closed': 0,
+            'checkouts': 0,
+            'checkout_waits': 0,
+            'checkout_timeouts': 0,
+            'health_check_failures': 0,
+            'recycled': 0
+        }
+
+    def _check_fork(self):
+        # Connections inherited from a parent process (gunicorn preload) must not be shared
+        if os.getpid() != self._pid:
+            self._reset_state()
+
+    def _open(self):
+        conn = psycopg2.connect(connection_factory=PoolConnection, **self.connect_params)
+        with self._cond:
+            self._counters['connections_opened'] += 1
+        return conn
+
+    def _discard(self, conn, counter=None):
+        try:
+            if not conn.closed:
+                psycopg2.extensions.connection.close(conn)
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._counters['connections_closed'] += 1
+            if counter:
+                self._counters[counter] += 1
+            self._cond.notify()
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.created_at > self.max_lifetime:
+            return False
+        if time.monotonic() - conn.last_used >= self.ping_after:
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT 1")
+                cur.close()
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        return True
+
+    def _warm(self):
+        # Open the minimum number of connections on first use in this process
+        with self._cond:
+            if self._warmed:
+                return
+            self._warmed = True
+            missing = max(self.minconn - self._size, 0)
+            self._size += missing
+        for _ in range(missing):
+            try:
+                conn = self._open()
+            except psycopg2.Error:
+                with self._cond:
+                    self._size -= 1
+                continue
+            with self._cond:
+                self._idle.append(conn)
+                self._cond.notify()
+
+    def getconn(self):
+        self._check_fork()
+        self._warm()
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            with self._cond:
+                while not self._idle and self._size >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['checkout_timeouts'] += 1
+                        raise psycopg2.pool.PoolError(
+                            f"no database connection available within {self.timeout:g}s")
+                    self._counters['checkout_waits'] += 1
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn = self._idle.pop()  # LIFO keeps recently used connections warm
+                else:
+                    self._size += 1
+                self._in_use += 1
+
+            if conn is None:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(conn):
+                with self._cond:
+                    self._in_use -= 1
+                expired = not conn.closed and time.monotonic() - conn.created_at > self.max_lifetime
+                self._discard(conn, 'recycled' if expired else 'health_check_failures')
+                continue
+
+            with self._cond:
+                self._counters['checkouts'] += 1
+            return PooledConnection(self, conn)
+
+    def putconn(self, conn):
+        if os.getpid() != self._pid:
+            return
+        with self._cond:
+            self._in_use -= 1
+
+        if conn.closed:
+            self._discard(conn)
+            return
+        if time.monotonic() - conn.created_at > self.max_lifetime:
+            self._discard(conn, 'recycled')
+            return
+
+        try:
+            # Never hand out a connection with an open or aborted transaction
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            conn.rls_context = None
+            conn.db_budget = None
+            if conn.autocommit:
+                conn.autocommit = False
+        except psycopg2.Error:
+            self._discard(conn, 'health_check_failures')
+            return
+
+        conn.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._counters)
+            stats.update({
+                'min_size': self.minconn,
+                'max_size': self.maxconn,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._in_use
+            })
+        return stats
+
+
+_db_pools = {}
+_db_pool_lock = threading.Lock()
+
+
+def get_db_pool(replica=False):
+    """Process-wide pool for the primary, or for the read replica when one is configured."""
+    key = 'replica' if replica and DB_REPLICA_HOST else 'primary'
+    pool = _db_pools.get(key)
+    if pool is None:
+        with _db_pool_lock:
+            pool = _db_pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_MAX_LIFETIME,
+                                      DB_POOL_CHECKOUT_TIMEOUT, DB_POOL_PING_AFTER,
+                                      connect_params=get_db_params(replica=key == 'replica'))
+                _db_pools[key] = pool
+    return pool
+
+
+def read_only_route(view):
+    """
+    Marks a view as read-only: its connections come from the replica pool,
+    unless this session wrote within the last DB_REPLICA_STICKY_SECONDS.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def db_budget(statement_timeout_ms, lock_timeout_ms=None, shed_when_slow=False):
+    """
+    Per-view DB budget, applied as statement_timeout/lock_timeout on every
+    connection the view checks out. A blown budget turns into a 503.
+    shed_when_slow views are refused outright while the latency breaker is open.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if shed_when_slow and db_latency_breaker.is_open():
+                return db_unavailable_response("The database is under heavy load. Please try again shortly.")
+            g.db_budget = (statement_timeout_ms, lock_timeout_ms or DB_LOCK_TIMEOUT_MS)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def query_budget(max_statements):
+    """
+    Per-view ceiling on SQL statements per request. Going over it logs a
+    sql_query_budget warning, so a page that regresses into extra round-trips
+    shows up in the logs.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            g.query_budget = max_statements
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_db_budget():
+    if not DB_STATEMENT_TIMEOUT_MS:
+        return None
+    return g.get('db_budget', (DB_STATEMENT_TIMEOUT_MS, DB_LOCK_TIMEOUT_MS))
+
+
+def use_replica():
+    if not DB_REPLICA_HOST or not has_request_context() or not g.get('db_read_only'):
+        return False
+    # Read-your-writes: stay on the primary until the replica has caught up
+    return time.time() - session.get('db_written_at', 0) > DB_REPLICA_STICKY_SECONDS
+
+
 def get_db_connection():
+    """
+    Checks a connection out of the process-wide pool.
+    conn.close() returns it; anything still checked out when the request
+    ends is returned by release_db_connections().
+    """
+    conn = get_db_pool(replica=use_replica()).getconn()
+    if has_app_context():
+        g.setdefault('db_connections', []).append(conn)
+    if has_request_context():
+        conn.db_budget = current_db_budget()
+    return conn
+
+
+@contextmanager
+def db_connection():
+    """Checks a pooled connection out for the duration of a with block."""
+    conn = get_db_connection()
     try:
-        conn = psycopg2.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            database=os.getenv('DB_NAME', 'ecoquant'),
-            user=os.getenv('DB_USER', 'postgres'),
-            password=os.getenv('DB_PASSWORD', ''),
-            port=os.getenv('DB_PORT', '5432')
+        yield conn
+    finally:
+        conn.close()
+
+
+@app.teardown_appcontext
+def release_db_connections(exc):
+    for conn in g.pop('db_connections', []):
+        conn.close()
+
+
+def get_secure_db_connection(user_id=None, role='app_user'):
+    """
+    Returns a pooled DB connection with RLS context set.
+    Use this for all user-scoped operations.
+    """
+    # If user_id is not provided, try to get from session
+    if user_id is None and 'user_id' in session:
+        user_id = session['user_id']
+        # Also try to get role from session if not explicitly "app_admin"
+        if 'role' in session:
+             role = 'app_admin' if session['role'] == 'admin' else 'app_user'
+
+    conn = get_db_connection()
+    if user_id:
+        # Role and app.user_id are set with SET LOCAL semantics by RLSCursor,
+        # bundled into the first statement of each transaction
+        conn.rls_context = (role, str(user_id))
+    return conn
+
+
+@contextmanager
+def secure_db_connection(user_id=None, role='app_user'):
+    """Checks out an RLS-scoped pooled connection for the duration of a with block."""
+    conn = get_secure_db_connection(user_id, role)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+# ====================================
+# EMISSION FACTOR CACHE
+# ====================================
+FACTOR_CACHE_TTL = float(os.getenv('FACTOR_CACHE_TTL', '60'))  # seconds between version checks
+
+
+class FactorVersionIndex:
+    """
+    Effective-dated factor values, one sorted interval list per factor name.
+    A date resolves with a bisect over the effective_from dates; arrays of
+    dates resolve with np.searchsorted, the vectorised equivalent.
+    """
+
+    def __init__(self, rows):
+        # rows: (name, effective_from, effective_to, co2e_per_unit); to is exclusive
+        intervals = {}
+        for name, start, end, value in sorted(rows, key=lambda row: (row[0], row[1])):
+            intervals.setdefault(name, []).append((start, end, float(value)))
+        self._starts = {name: [i[0] for i in items] for name, items in intervals.items()}
+        self._ends = {name: [i[1] for i in items] for name, items in intervals.items()}
+        self._values = {name: [i[2] for i in items] for name, items in intervals.items()}
+
+    def factor(self, name, on_date, default=0.0):
+        starts = self._starts.get(name)
+        if not starts:
+            return default
+        i = bisect.bisect_right(starts, on_date) - 1
+        if i >= 0 and on_date < self._ends[name][i]:
+            return self._values[name][i]
+        return default
+
+    def on(self, on_date):
+        """{name: co2e_per_unit} of every factor in effect on on_date"""
+        factors = {}
+        for name in self._starts:
+            value = self.factor(name, on_date, None)
+            if value is not None:
+                factors[name] = value
+        return factors
+
+    def for_dates(self, dates):
+        """{name: float64 array} of each factor in effect on each of `dates`"""
+        dates = np.asarray(dates, dtype='M8[D]')
+        factors = {}
+        for name, starts in self._starts.items():
+            starts = np.array(starts, dtype='M8[D]')
+            ends = np.array(self._ends[name], dtype='M8[D]')
+            values = np.array(self._values[name] + [0.0])
+            i = np.searchsorted(starts, dates, side='right') - 1
+            covered = (i >= 0) & (dates < ends[i])
+            factors[name] = values[np.where(covered, i, -1)]
+        return factors
+
+
+class EmissionFactorCache:
+    """
+    Per-process snapshot of the emission_factors table and the interval
+    index of its effective-dated versions.
+    Within the TTL the snapshot is served without touching the database;
+    after it expires a single version check decides whether to reload.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._factors = None
+        self._spreads = None
+        self._index = None
+        self._today = (None, None, None)  # (index, date, factors) memo for get()
+        self._version = None
+        self._checked_at = 0.0
+
+    def _fetch_version(self, cur):
+        # emission_factors_version_seq is bumped by a statement trigger on every write
+        try:
+            cur.execute("SELECT last_value FROM emission_factors_version_seq")
+            return cur.fetchone()[0]
+        except psycopg2.errors.UndefinedTable:
+            # Schema without the version sequence: fall back to a content fingerprint
+            cur.connection.rollback()
+            cur.execute("SELECT count(*), max(created_at), sum(co2e_per_unit) FROM emission_factors")
+            return tuple(cur.fetchone())
+
+    def _refresh(self):
+        with db_connection() as conn:
+            cur = conn.cursor()
+            version = self._fetch_version(cur)
+            if self._factors is None or version != self._version:
+                try:
+                    cur.execute("SELECT name, co2e_per_unit, uncertainty_pct FROM emission_factors")
+                    rows = cur.fetchall()
+                except psycopg2.errors.UndefinedColumn:
+                    # Schema before migration 0005: no spreads recorded
+                    conn.rollback()
+                    cur.execute("SELECT name, co2e_per_unit, 0 FROM emission_factors")
+                    rows = cur.fetchall()
+                factors = {row[0]: float(row[1]) for row in rows}
+                try:
+                    cur.execute("""
+                        SELECT name, effective_from, effective_to, co2e_per_unit
+                        FROM emission_factor_versions
+                    """)
+                    version_rows = cur.fetchall()
+                except psycopg2.errors.UndefinedTable:
+                    # Schema before migration 0006: today's factors apply to every date
+                    conn.rollback()
+                    version_rows = [(name, date.min, date.max, value) for name, value in factors.items()]
+                self._index = FactorVersionIndex(version_rows)
+                self._factors = factors
+                self._spreads = {row[0]: float(row[2] or 0) for row in rows}
+                self._version = version
+            cur.close()
+        self._checked_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        if self._factors is not None and time.monotonic() - self._checked_at < self.ttl:
+            return
+        with self._lock:
+            if self._factors is not None and time.monotonic() - self._checked_at < self.ttl:
+                return
+            try:
+                self._refresh()
+            except psycopg2.Error as e:
+                if self._factors is None:
+                    raise
+                # Keep serving the last good snapshot until the database is back
+                app.logger.warning(f"Emission factor refresh failed, using cached values: {e}")
+                self._checked_at = time.monotonic()
+
+    def get(self):
+        """Returns {name: co2e_per_unit} in effect today. Treat the dict as read-only."""
+        return self.on(None)
+
+    def spreads(self):
+        """Returns {name: uncertainty_pct}, the relative standard deviation of each factor."""
+        self._ensure_fresh()
+        return self._spreads
+
+    def on(self, on_date):
+        """Returns {name: co2e_per_unit} in effect on a date; None means today."""
+        self._ensure_fresh()
+        if on_date is not None:
+            return self._index.on(on_date)
+        today = date.today()
+        index, day, factors = self._today
+        if index is not self._index or day != today:
+            factors = self._index.on(today)
+            self._today = (self._index, today, factors)
+        return factors
+
+    def for_dates(self, dates):
+        """Returns {name: array} of the factors in effect on each date."""
+        self._ensure_fresh()
+        return self._index.for_dates(dates)
+
+    def version(self):
+        self._ensure_fresh()
+        return self._version
+
+    def observe(self, version):
+        """
+        Takes a version read alongside other data. A match counts as a fresh
+        check; anything else makes the next use reload.
+        """
+        if self._factors is not None and version == self._version:
+            self._checked_at = time.monotonic()
+        else:
+            self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._checked_at = 0.0
+
+
+emission_factor_cache = EmissionFactorCache(FACTOR_CACHE_TTL)
+
+
+def get_emission_factors():
+    return emission_factor_cache.get()
+
+
+# ====================================
+# RESULT CACHES
+# ====================================
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU mapping with hit/miss counters.
+    With a ttl, entries also expire that many seconds after they were stored.
+    """
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] is None or entry[0] > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._data[key]
+                self.expired += 1
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._data), 'maxsize': self.maxsize, 'ttl': self.ttl,
+                    'hits': self.hits, 'misses': self.misses, 'expired': self.expired}
+
+
+DASHBOARD_CACHE_SIZE = int(os.getenv('DASHBOARD_CACHE_SIZE', '1000'))  # users per worker (in-process backend)
+DASHBOARD_CACHE_URL = os.getenv('DASHBOARD_CACHE_URL')  # e.g. redis://cache:6379/0 to share one cache between workers
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', '86400'))  # seconds; only bounds idle entries
+
+
+class LocalCacheBackend:
+    """In-process cache backend: an LRUCache per worker"""
+
+    def __init__(self, maxsize):
+        self._cache = LRUCache(maxsize)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.put(key, value)
+
+    def stats(self):
+        return {'type': 'local', **self._cache.stats()}
+
+
+class RedisCacheBackend:
+    """
+    Cache backend shared by every worker. Values are stored as JSON. Needs
+    the redis package; configure the server with maxmemory-policy allkeys-lru.
+    """
+
+    def __init__(self, url, ttl):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        value = self._client.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self._client.set(key, json.dumps(value), ex=self.ttl)
+
+    def stats(self):
+        return {'type': 'redis', 'ttl': self.ttl}
+
+
+def make_cache_backend(url, maxsize, ttl):
+    if url:
+        return RedisCacheBackend(url, ttl)
+    return LocalCacheBackend(maxsize)
+
+
+class DashboardCache:
+    """
+    Per-user dashboard context. Every write to a user's projects or their
+    emissions/credit totals bumps user_data_versions (see database.sql), so
+    an entry is reused only while the user's data version and the day
+    (the timeline window depends on it) are unchanged.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def data_version(self, cur, user_id):
+        execute_hot_query(cur, 'user_data_version', (user_id,))
+        row = cur.fetchone()
+        return row[0] if row else 0
+
+    def etag(self, user_id, version, variant=''):
+        """Strong validator for the user's dashboard (variant: e.g. the page) at a data version, today"""
+        return hashlib.sha1(f"{user_id}:{version}:{date.today().isoformat()}:{variant}".encode()).hexdigest()
+
+    def get_or_load(self, cur, user_id, version=None):
+        """
+        (data version, context) for user_id. The version is read first (or
+        passed in, read earlier on the same connection), data only on a miss.
+        """
+        if version is None:
+            version = self.data_version(cur, user_id)
+        stamp = [version, date.today().isoformat()]
+        key = f"dashboard-summary:{user_id}"
+        entry = self.backend.get(key)
+        if entry is not None and entry[0] == stamp:
+            self.hits += 1
+            return version, entry[1]
+        if entry is None:
+            self.misses += 1
+        else:
+            self.stale += 1
+        context = load_dashboard(cur, user_id)
+        self.backend.set(key, [stamp, context])
+        return version, context
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'stale': self.stale, 'backend': self.backend.stats()}
+
+
+dashboard_cache = DashboardCache(make_cache_backend(DASHBOARD_CACHE_URL, DASHBOARD_CACHE_SIZE, DASHBOARD_CACHE_TTL))
+
+
+# ====================================
+# EMISSION UNCERTAINTY
+# ====================================
+UNCERTAINTY_DRAWS = int(os.getenv('UNCERTAINTY_DRAWS', '20000'))
+UNCERTAINTY_MAX_DRAWS = 100000
+UNCERTAINTY_CACHE_SIZE = int(os.getenv('UNCERTAINTY_CACHE_SIZE', '256'))
+UNCERTAINTY_PERCENTILES = (5, 50, 95)
+
+# Per-factor contributions are passed in this order
+UNCERTAINTY_FACTORS = ['Asphalt', 'Aggregate', 'Cement', 'Steel', 'Diesel', 'Electricity', 'Transport']
+UNCERTAINTY_CATEGORIES = [
+    ('Materials', [0, 1, 2, 3]),
+    ('Equipment', [4]),
+    ('Electricity', [5]),
+    ('Transport', [6])
+]
+
+
+class EmissionUncertaintyEngine:
+    """
+    Monte Carlo percentile bands for a project's emissions.
+    Each factor is drawn from a lognormal with mean co2e_per_unit and
+    relative standard deviation uncertainty_pct; contributions scale
+    linearly with their factor, so only the per-factor CO2e is needed.
+    Results are cached per (project, factor version, contributions, draws).
+    """
+
+    def __init__(self, draws, cache_size):
+        self.draws = draws
+        self.cache = LRUCache(cache_size)
+
+    def bands(self, project_id, contributions, draws=None):
+        """
+        contributions: CO2e per factor in UNCERTAINTY_FACTORS order (any unit).
+        Returns {category: {'p5': .., 'p50': .., 'p95': ..}} plus 'Total', same unit.
+        """
+        draws = draws or self.draws
+        contributions = tuple(float(c or 0) for c in contributions)
+        key = (str(project_id), emission_factor_cache.version(), contributions, draws)
+        result = self.cache.get(key)
+        if result is None:
+            result = self._simulate(key, contributions, draws)
+            self.cache.put(key, result)
+        return result
+
+    def _simulate(self, key, contributions, draws):
+        spreads = emission_factor_cache.spreads()
+        cv = np.array([spreads.get(name, 0) / 100 for name in UNCERTAINTY_FACTORS])
+        sigma = np.sqrt(np.log1p(cv ** 2))
+        # Seeded from the cache key so a recomputation gives the same bands
+        rng = np.random.default_rng(zlib.crc32(repr(key).encode()))
+        samples = rng.lognormal(-sigma ** 2 / 2, sigma, size=(draws, len(UNCERTAINTY_FACTORS))) * np.array(contributions)
+
+        names = [name for name, _ in UNCERTAINTY_CATEGORIES] + ['Total']
+        totals = np.column_stack([samples[:, idx].sum(axis=1) for _, idx in UNCERTAINTY_CATEGORIES] + [samples.sum(axis=1)])
+        percentiles = np.percentile(totals, UNCERTAINTY_PERCENTILES, axis=0)
+        return {
+            name: {f'p{p}': round(float(percentiles[i, j]), 2) for i, p in enumerate(UNCERTAINTY_PERCENTILES)}
+            for j, name in enumerate(names)
+        }
+
+
+emission_uncertainty = EmissionUncertaintyEngine(UNCERTAINTY_DRAWS, UNCERTAINTY_CACHE_SIZE)
+
+
+# ====================================
+# HOT QUERIES
+# ====================================
+# Read queries behind the busiest pages, by name. `flask db check-plans`
+# EXPLAINs every entry, and tests/test_hot_query_plans.py checks their plans on
+# seeded data, so add new per-request reads here rather than inline.
+# Routes run them through execute_hot_query(), which PREPAREs each one once per
+# pooled connection so Postgres skips parse/plan on repeat calls.
+# Set DB_PREPARED_STATEMENTS=false behind a transaction-mode pgbouncer.
+DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', 'true').lower() in ('1', 'true', 'yes')
+
+HOT_QUERIES = {
+    'project_emission_profile': """
+        SELECT p.user_id, p.type,
+               COALESCE(t.co2e_total_kg, 0), COALESCE(t.co2e_materials_kg, 0),
+               COALESCE(t.co2e_fuel_kg, 0), COALESCE(t.co2e_electricity_kg, 0),
+               COALESCE(t.co2e_transport_kg, 0), COALESCE(t.reduction_kg, 0),
+               t.updated_at
+        FROM projects p
+        LEFT JOIN project_emission_totals t ON t.project_id = p.id
+        WHERE p.id = %s
+    """,
+    'dashboard_summary': """
+        WITH user_projects AS (
+            SELECT p.start_date, p.end_date,
+                COALESCE(t.co2e_total_kg / 1000, 0) AS total_co2e_tons,
+                COALESCE(t.credits_earned, 0) AS credits,
+                COALESCE(t.sort_reduction_pct, 0) AS reduction_pct,
+                t.co2e_fuel_kg, t.co2e_electricity_kg,
+                t.co2e_materials_kg + t.co2e_transport_kg AS co2e_scope3_kg
+            FROM projects p
+            LEFT JOIN project_emission_totals t ON t.project_id = p.id
+            WHERE p.user_id = %s
+        ),
+        scopes AS (
+            SELECT
+                SUM(co2e_fuel_kg) / 1000 AS scope1,
+                SUM(co2e_electricity_kg) / 1000 AS scope2,
+                SUM(co2e_scope3_kg) / 1000 AS scope3
+            FROM user_projects
         )
-        return conn
-    except Exception:
-        raise
+        -- float8 decodes far cheaper than NUMERIC -> Decimal on the client
+        SELECT u.start_date, u.end_date,
+            u.total_co2e_tons::float8, u.credits::float8, u.reduction_pct::float8,
+            s.scope1::float8, s.scope2::float8, s.scope3::float8
+        FROM user_projects u
+        CROSS JOIN scopes s
+    """,
+    'user_data_version': """
+        SELECT version FROM user_data_versions WHERE user_id = %s
+    """,
+    'dashboard_timeline': """
+        SELECT
+            p.id,
+            p.start_date,
+            p.end_date,
+            COALESCE(t.co2e_total_kg / 1000, 0) AS total_emissions_tons
+        FROM projects p
+        LEFT JOIN project_emission_totals t ON t.project_id = p.id
+        WHERE p.user_id = %s
+    """,
+    'project_totals': """
+        SELECT p.id, p.name, p.type, p.location, p.start_date, p.end_date,
+            COALESCE(t.co2e_total_kg / 1000, 0) AS total_co2e_tons,
+            COALESCE(t.credits_earned, 0) AS credits
+        FROM projects p
+        LEFT JOIN project_emission_totals t ON t.project_id = p.id
+        WHERE p.id = %s AND p.user_id = %s
+    """,
+    'project_breakdown': """
+        SELECT
+            t.co2e_asphalt_kg / 1000 AS asphalt,
+            t.co2e_aggregate_kg / 1000 AS aggregate,
+            t.co2e_cement_kg / 1000 AS cement,
+            t.co2e_steel_kg / 1000 AS steel,
+            t.co2e_fuel_kg / 1000 AS diesel,
+            t.co2e_electricity_kg / 1000 AS electricity,
+            t.co2e_transport_kg / 1000 AS transport,
+            t.co2e_materials_kg / 1000 AS materials
+        FROM project_emission_totals t
+        WHERE t.project_id = %s
+    """,
+    'project_detail': """
+        SELECT p.id, p.name, p.type, p.location, p.start_date, p.end_date,
+            COALESCE(t.co2e_total_kg / 1000, 0)::float8 AS total_co2e_tons,
+            COALESCE(t.credits_earned, 0)::float8 AS credits,
+            COALESCE(t.co2e_asphalt_kg / 1000, 0)::float8 AS asphalt,
+            COALESCE(t.co2e_aggregate_kg / 1000, 0)::float8 AS aggregate,
+            COALESCE(t.co2e_cement_kg / 1000, 0)::float8 AS cement,
+            COALESCE(t.co2e_steel_kg / 1000, 0)::float8 AS steel,
+            COALESCE(t.co2e_fuel_kg / 1000, 0)::float8 AS diesel,
+            COALESCE(t.co2e_electricity_kg / 1000, 0)::float8 AS electricity,
+            COALESCE(t.co2e_transport_kg / 1000, 0)::float8 AS transport,
+            COALESCE(t.co2e_materials_kg / 1000, 0)::float8 AS materials,
+            -- Recommendations ride along as one JSON array
+            (SELECT COALESCE(json_agg(json_build_object(
+                        'title', r.title, 'description', r.description, 'impact', r.impact,
+                        'cost', COALESCE(r.cost, 0), 'category', COALESCE(NULLIF(r.category, ''), 'General'))
+                    ORDER BY r.display_order), '[]')
+             FROM recommendations r
+             WHERE r.project_id = p.id) AS recommendations,
+            -- Lets the page skip the factor cache's own version check
+            (SELECT last_value FROM emission_factors_version_seq) AS factor_version
+        FROM projects p
+        LEFT JOIN project_emission_totals t ON t.project_id = p.id
+        WHERE p.id = %s AND p.user_id = %s
+    """,
+    'project_quantities': """
+        SELECT p.id, COALESCE(t.asphalt_t, 0), COALESCE(t.aggregate_t, 0),
+               COALESCE(t.cement_t, 0), COALESCE(t.steel_t, 0),
+               COALESCE(t.diesel_l, 0), COALESCE(t.electricity_kwh, 0),
+               COALESCE(t.transport_tkm, 0), p.start_date
+        FROM projects p
+        LEFT JOIN project_emission_totals t ON t.project_id = p.id
+        WHERE p.id = %s AND p.user_id = %s
+    """,
+    'user_reports': """
+        SELECT r.id, r.name, r.created_at, r.file_size, p.name as project_name
+        FROM reports r
+        LEFT JOIN projects p ON r.project_id = p.id
+        WHERE r.user_id = %s
+        ORDER BY r.created_at DESC
+    """,
+    'marketplace_active_listings': """
+        SELECT ml.id, ml.quantity_available, ml.price_per_credit, ml.listed_at,
+               p.name as project_name, p.type as project_type, p.location,
+               u.username as seller_name,
+               cc.credits_earned, cc.credits_used,
+               (cc.credits_earned - COALESCE(cc.credits_used, 0)) as total_available
+        FROM marketplace_listings ml
+        JOIN carbon_credits cc ON ml.credit_id = cc.id
+        JOIN projects p ON cc.project_id = p.id
+        JOIN users u ON ml.seller_id = u.id
+        WHERE ml.status = 'active' AND ml.quantity_available > 0
+        ORDER BY ml.listed_at DESC
+    """,
+    'carbon_project_credits': """
+        SELECT p.id AS project_id, p.name AS project_name,
+               COALESCE(SUM(cc.credits_earned), 0) AS total_credits,
+               COALESCE(SUM(cc.credits_used), 0) AS used_credits,
+               COALESCE(SUM(cc.listed_quantity), 0) AS listed_credits,
+               COALESCE(SUM(cc.credits_earned) - COALESCE(SUM(cc.credits_used), 0) - COALESCE(SUM(cc.listed_quantity), 0), 0) AS available_credits,
+               MAX(cc.issued_at) AS last_issued
+        FROM projects p
+        LEFT JOIN carbon_credits cc ON p.id = cc.project_id
+        WHERE p.user_id = %s
+        GROUP BY p.id, p.name
+        ORDER BY last_issued DESC NULLS LAST
+    """,
+    'project_credit_issuances': """
+        SELECT id, credits_earned, credits_used, listed_quantity,
+               (credits_earned - COALESCE(credits_used, 0) - listed_quantity) as available_quantity,
+               credit_value, issued_at, status
+        FROM carbon_credits
+        WHERE project_id = %s
+        ORDER BY issued_at DESC
+    """,
+    'marketplace_other_listings': """
+        SELECT ml.id, ml.quantity_available, ml.price_per_credit, ml.listed_at, ml.status,
+               p.name as project_name, p.type as project_type, p.location,
+               u.username as seller_name,
+               cc.credits_earned, cc.credits_used, cc.listed_quantity
+        FROM marketplace_listings ml
+        JOIN carbon_credits cc ON ml.credit_id = cc.id
+        JOIN projects p ON cc.project_id = p.id
+        JOIN users u ON ml.seller_id = u.id
+        WHERE ml.status = 'active' AND ml.quantity_available > 0
+        AND ml.seller_id != %s
+        ORDER BY ml.listed_at DESC
+    """,
+    'report_project_totals': """
+        SELECT p.id, p.name, p.type, p.start_date, p.end_date,
+               COALESCE(t.asphalt_t, 0), COALESCE(t.aggregate_t, 0),
+               COALESCE(t.cement_t, 0), COALESCE(t.steel_t, 0),
+               COALESCE(t.diesel_l, 0), COALESCE(t.electricity_kwh, 0),
+               COALESCE(t.transport_tkm, 0),
+               COALESCE(t.co2e_total_kg / 1000, 0) AS total_co2e,
+               COALESCE(t.credits_earned, 0) AS credits
+        FROM projects p
+        LEFT JOIN project_emission_totals t ON t.project_id = p.id
+        WHERE p.id = ANY(%s)
+    """,
+    'project_credit_history': """
+        SELECT issued_at, credits_earned, credits_used
+        FROM carbon_credits
+        WHERE project_id = %s
+        ORDER BY issued_at
+    """,
+    'seller_listings': """
+        SELECT ml.id, ml.quantity_available, ml.price_per_credit, ml.listed_at, ml.status,
+               p.name as project_name, p.type as project_type,
+               cc.credits_earned, COALESCE(cc.credits_used, 0) as credits_used
+        FROM marketplace_listings ml
+        JOIN carbon_credits cc ON ml.credit_id = cc.id
+        JOIN projects p ON cc.project_id = p.id
+        WHERE ml.seller_id = %s
+        ORDER BY ml.listed_at DESC
+    """,
+    'api_marketplace_listings': """
+        SELECT ml.id, ml.quantity_available, ml.price_per_credit, ml.listed_at,
+               p.name as project_name, p.type as project_type, p.location,
+               u.username as seller_name,
+               cc.credits_earned, cc.credits_used,
+               (cc.credits_earned - COALESCE(cc.credits_used, 0)) as total_available
+        FROM marketplace_listings ml
+        JOIN carbon_credits cc ON ml.credit_id = cc.id
+        JOIN projects p ON cc.project_id = p.id
+        JOIN users u ON ml.seller_id = u.id
+        WHERE ml.status = 'active' AND ml.quantity_available > 0
+        AND ml.seller_id != %s  -- Exclude current user's listings
+        ORDER BY ml.listed_at DESC
+    """,
+    'listing_for_purchase': """
+        SELECT ml.id, ml.credit_id, ml.quantity_available, ml.price_per_credit, ml.seller_id,
+               cc.credits_earned, COALESCE(cc.credits_used, 0) as credits_used,
+               cc.listed_quantity, cc.project_id as seller_project_id
+        FROM marketplace_listings ml
+        JOIN carbon_credits cc ON ml.credit_id = cc.id
+        WHERE ml.id = %s AND ml.status = 'active'
+    """,
+    'user_credits': """
+        SELECT cc.id, p.name as project_name, cc.credits_earned,
+               COALESCE(cc.credits_used, 0) as credits_used,
+               cc.listed_quantity,
+               (cc.credits_earned - COALESCE(cc.credits_used, 0) - cc.listed_quantity) as available_credits,
+               cc.credit_value
+        FROM carbon_credits cc
+        JOIN projects p ON cc.project_id = p.id
+        WHERE p.user_id = %s
+        ORDER BY p.name
+    """,
+    'user_project_names': "SELECT id, name FROM projects WHERE user_id = %s",
+}
+
+# Keyset pages of a user's projects, one statement per sort key and direction:
+# sort -> (project_emission_totals column, key type). Each is read straight off
+# a (user_id, key, project_id) index (migrations/0008), so any page costs what
+# the first one does.
+PROJECT_SORTS = {
+    'start_date': ('sort_start_date', 'date'),
+    'co2e': ('sort_co2e_t', 'float8'),
+    'credits': ('sort_credits', 'float8'),
+    'reduction': ('sort_reduction_pct', 'float8'),
+}
+
+PROJECT_PAGE_QUERY = """
+    SELECT p.id, p.name, p.type, p.start_date, p.end_date,
+        t.sort_co2e_t, t.sort_credits, t.sort_reduction_pct,
+        t.{key}::text
+    FROM project_emission_totals t
+    JOIN projects p ON p.id = t.project_id
+    WHERE t.user_id = %s AND (t.{key}, t.project_id) {op} (%s::{type}, %s)
+    ORDER BY t.{key} {direction}, t.project_id {direction}
+    LIMIT %s
+"""
+
+for _sort, (_key, _type) in PROJECT_SORTS.items():
+    for _direction, _op in (('asc', '>'), ('desc', '<')):
+        HOT_QUERIES[f'project_page_{_sort}_{_direction}'] = PROJECT_PAGE_QUERY.format(
+            key=_key, type=_type, op=_op, direction=_direction.upper())
+
+
+def _numbered_placeholders(query):
+    counter = iter(range(1, query.count('%s') + 1))
+    return re.sub(r'%s', lambda m: f'${next(counter)}', query)
+
+
+PREPARED_HOT_QUERIES = {name: _numbered_placeholders(query) for name, query in HOT_QUERIES.items()}
+
+
+def execute_hot_query(cur, name, params=()):
+    """
+    Runs HOT_QUERIES[name]. On pooled connections the statement is prepared
+    on first use and afterwards executed by name.
+    """
+    conn = cur.connection
+    if not DB_PREPARED_STATEMENTS or not isinstance(conn, PoolConnection):
+        return cur.execute(HOT_QUERIES[name], params)
+    if name not in conn.prepared_statements:
+        cur.execute(f"PREPARE {name} AS {PREPARED_HOT_QUERIES[name]}")
+        # Prepared statements outlive transactions, so a later rollback keeps it
+        conn.prepared_statements.add(name)
+    if params:
+        return cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    return cur.execute(f"EXECUTE {name}")
+
+
+# ====================================
+# SCHEMA MIGRATIONS
+# ====================================
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATIONS_LOCK_KEY = 0x45516D67  # pg_advisory_xact_lock key serialising concurrent runners
+
+
+def list_migrations():
+    """Returns [(version, name, path)] for migrations/NNNN_name.sql in version order."""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = re.match(r'^(\d+)_(\w+)\.sql$', filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return sorted(migrations)
+
+
+def get_applied_migrations(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def apply_migrations():
+    """
+    Applies pending migrations, each in its own transaction.
+    Runs on a direct connection (not the request pool) as the schema owner.
+    Returns the list of (version, name) applied.
+    """
+    applied = []
+    conn = psycopg2.connect(**get_db_params())
+    try:
+        cur = conn.cursor()
+        for version, name, path in list_migrations():
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATIONS_LOCK_KEY,))
+            if version in get_applied_migrations(cur):
+                conn.rollback()
+                continue
+            with open(path) as f:
+                cur.execute(f.read())
+            cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            conn.commit()
+            applied.append((version, name))
+        cur.close()
+    finally:
+        conn.rollback()
+        conn.close()
+    return applied
+
+
+def _seq_scanned_relations(plan):
+    relations = []
+    if plan.get('Node Type') == 'Seq Scan':
+        relations.append(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        relations.extend(_seq_scanned_relations(child))
+    return relations
+
+
+def _sample_params(query, value=1):
+    # Sample ids are enough: the planner only needs parameter types
+    return [[value] if is_array else date.today() if cast == '::date' else value
+            for is_array, cast in re.findall(r'(ANY\()?%s(::\w+)?', query)]
+
+
+def check_hot_query_plans():
+    """
+    EXPLAINs every HOT_QUERIES entry with sequential scans disabled.
+    A Seq Scan that survives means no index can serve the query.
+    Plans are made as app_user with app.user_id set, like RLSCursor does,
+    so row level security policies are part of every plan.
+    Returns {name: [seq-scanned relations]}.
+    """
+    results = {}
+    conn = psycopg2.connect(**get_db_params())
+    try:
+        cur = conn.cursor()
+        cur.execute("SET LOCAL enable_seqscan = off")
+        cur.execute("SELECT set_config('role', 'app_user', true), set_config('app.user_id', '1', true)")
+        # A sequence is a single row; reading one is not a table scan
+        cur.execute("SELECT relname FROM pg_class WHERE relkind = 'S'")
+        sequences = {row[0] for row in cur.fetchall()}
+        for name, query in HOT_QUERIES.items():
+            cur.execute("EXPLAIN (FORMAT JSON) " + query, _sample_params(query))
+            results[name] = [relation for relation in _seq_scanned_relations(cur.fetchone()[0][0]['Plan'])
+                             if relation not in sequences]
+        cur.close()
+    finally:
+        conn.rollback()
+        conn.close()
+    return results
+
+
+db_cli = AppGroup('db', help='Database schema maintenance.')
+
+
+@db_cli.command('migrate')
+def db_migrate_command():
+    """Apply pending migrations."""
+    applied = apply_migrations()
+    for version, name in applied:
+        click.echo(f"Applied {version:04d}_{name}")
+    if not applied:
+        click.echo("Database is up to date")
+
+
+@db_cli.command('status')
+def db_status_command():
+    """List migrations and whether they are applied."""
+    with psycopg2.connect(**get_db_params()) as conn:
+        cur = conn.cursor()
+        applied = get_applied_migrations(cur)
+    conn.close()
+    for version, name, path in list_migrations():
+        click.echo(f"[{'x' if version in applied else ' '}] {version:04d}_{name}")
+
+
+@db_cli.command('check-plans')
+def db_check_plans_command():
+    """Fail if any hot query plans a sequential scan."""
+    failures = 0
+    for name, relations in check_hot_query_plans().items():
+        if relations:
+            failures += 1
+            click.echo(f"FAIL {name}: Seq Scan on {', '.join(relations)}")
+        else:
+            click.echo(f"ok   {name}")
+    if failures:
+        raise SystemExit(1)
+
+
+@db_cli.command('bench-prepared')
+@click.option('--query', 'name', default='dashboard_summary', type=click.Choice(sorted(HOT_QUERIES)))
+@click.option('--iterations', default=500, show_default=True)
+@click.option('--param', default=1, show_default=True, help='Value bound to every placeholder (e.g. a user id).')
+def db_bench_prepared_command(name, iterations, param):
+    """Time a hot query as plain SQL vs. a prepared statement."""
+    params = _sample_params(HOT_QUERIES[name], param)
+    conn = psycopg2.connect(**get_db_params())
+    try:
+        cur = conn.cursor()
+        cur.execute(f"PREPARE {name} AS {PREPARED_HOT_QUERIES[name]}")
+        execute_sql = f"EXECUTE {name} ({', '.join(['%s'] * len(params))})" if params else f"EXECUTE {name}"
+        timings = {}
+        for label, query in (('plain', HOT_QUERIES[name]), ('prepared', execute_sql)):
+            cur.execute(query, params)  # warm up
+            cur.fetchall()
+            started = time.perf_counter()
+            for _ in range(iterations):
+                cur.execute(query, params)
+                cur.fetchall()
+            timings[label] = (time.perf_counter() - started) * 1000 / iterations
+            click.echo(f"{label:9s} {timings[label]:.3f} ms/call")
+        click.echo(f"saved     {timings['plain'] - timings['prepared']:.3f} ms/call "
+                   f"({100 * (1 - timings['prepared'] / timings['plain']):.0f}%)")
+        cur.close()
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+@db_cli.command('bench-dashboard')
+@click.option('--projects', default=5000, show_default=True)
+@click.option('--iterations', default=50, show_default=True)
+def db_bench_dashboard_command(projects, iterations):
+    """Time the dashboard load as three queries vs. the dashboard_summary statement.
+
+    Seeds a throwaway user with --projects projects inside a transaction that
+    is rolled back, and reads as app_user so row level security applies.
+    """
+    per_query = (
+        """SELECT p.id, p.name, p.type, p.start_date, p.end_date,
+               COALESCE(t.co2e_total_kg / 1000, 0), COALESCE(t.credits_earned, 0)
+           FROM projects p LEFT JOIN project_emission_totals t ON t.project_id = p.id
+           WHERE p.user_id = %s""",
+        """SELECT SUM(t.co2e_fuel_kg) / 1000, SUM(t.co2e_electricity_kg) / 1000,
+               SUM(t.co2e_materials_kg + t.co2e_transport_kg) / 1000
+           FROM project_emission_totals t JOIN projects p ON t.project_id = p.id
+           WHERE p.user_id = %s""",
+        HOT_QUERIES['dashboard_timeline']
+    )
+    conn = psycopg2.connect(**get_db_params())
+    try:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO users (username, email) VALUES (%s, %s) RETURNING id",
+                    (f"bench-{uuid.uuid4().hex}", f"{uuid.uuid4().hex}@bench.invalid"))
+        user_id = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO projects (user_id, name, type, start_date, end_date)
+            SELECT %s, 'Bench ' || g, 'Road', DATE '2024-01-01' + g %% 700, DATE '2024-06-01' + g %% 700
+            FROM generate_series(1, %s) g
+        """, (user_id, projects))
+        cur.execute("""
+            INSERT INTO emissions (project_id, asphalt_t, diesel_l, electricity_kwh, transport_tkm, recycled_pct)
+            SELECT id, 100, 50, 1000, 20, 10 FROM projects WHERE user_id = %s
+        """, (user_id,))
+        cur.execute("ANALYZE projects")
+        cur.execute("ANALYZE project_emission_totals")
+        cur.execute("SET LOCAL ROLE app_user")
+        cur.execute("SELECT set_config('app.user_id', %s, true)", (str(user_id),))
+
+        def three_queries():
+            for query in per_query:
+                cur.execute(query, (user_id,))
+                cur.fetchall()
+
+        def summary():
+            cur.execute(HOT_QUERIES['dashboard_summary'], (user_id,))
+            return cur.fetchall()
+
+        rows = summary()
+        timings = {}
+        for label, run in (('3 queries', three_queries), ('summary', summary),
+                           ('context', lambda: dashboard_context(rows))):
+            run()  # warm up
+            started = time.perf_counter()
+            for _ in range(iterations):
+                run()
+            timings[label] = (time.perf_counter() - started) * 1000 / iterations
+            click.echo(f"{label:10s} {timings[label]:.2f} ms/load")
+        click.echo(f"{projects} projects: {timings['3 queries'] - timings['summary']:.2f} ms/load saved on "
+                   f"the database round-trips; context is the Python post-processing of the summary rows")
+        cur.close()
+    finally:
+        conn.rollback()
+        conn.close()
 
-def get_secure_db_connection(user_id=None, role='app_user'):
-    """
-    Returns a DB connection with RLS context set.
-    Use this for all user-scoped operations.
+
+@db_cli.command('bench-pages')
+@click.option('--projects', default=20000, show_default=True)
+@click.option('--iterations', default=200, show_default=True)
+def db_bench_pages_command(projects, iterations):
+    """Time the first and the last page of a user's projects for every sort.
+
+    Seeds a throwaway user with --projects projects (deleted afterwards) and
+    VACUUMs, since every seeded rollup row is updated at least once, then
+    reads as app_user so row level security applies.
     """
-    conn = get_db_connection()
+    conn = psycopg2.connect(**get_db_params())
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute("INSERT INTO users (username, email) VALUES (%s, %s) RETURNING id",
+                (f"bench-{uuid.uuid4().hex}", f"{uuid.uuid4().hex}@bench.invalid"))
+    user_id = cur.fetchone()[0]
     try:
-        # If user_id is not provided, try to get from session
-        if user_id is None and 'user_id' in session:
-            user_id = session['user_id']
-            # Also try to get role from session if not explicitly "app_admin"
-            if 'role' in session:
-                 role = 'app_admin' if session['role'] == 'admin' else 'app_user'
-
-        if user_id:
-            cur = conn.cursor()
-            # Switch to restricted role
-            # Note: We must execute this first
-            cur.execute(sql.SQL("SET ROLE {}").format(sql.Identifier(role)))
-            
-            # Set variable for RLS policies
-            cur.execute("SELECT set_config('app.user_id', %s, false)", (str(user_id),))
-            cur.close()
-        return conn
-    except Exception as e:
+        cur.execute("""
+            INSERT INTO projects (user_id, name, type, start_date, end_date)
+            SELECT %s, 'Bench ' || g, 'Road', DATE '2024-01-01' + g %% 700, DATE '2024-06-01' + g %% 700
+            FROM generate_series(1, %s) g
+        """, (user_id, projects))
+        cur.execute("""
+            INSERT INTO emissions (project_id, asphalt_t, diesel_l, electricity_kwh, transport_tkm, recycled_pct)
+            SELECT id, id %% 997, 50, 1000, 20, id %% 40 FROM projects WHERE user_id = %s
+        """, (user_id,))
+        cur.execute("""
+            INSERT INTO carbon_credits (project_id, user_id, credits_earned)
+            SELECT id, user_id, id %% 101 FROM projects WHERE user_id = %s
+        """, (user_id,))
+        cur.execute("VACUUM ANALYZE projects")
+        cur.execute("VACUUM ANALYZE project_emission_totals")
+        conn.autocommit = False
+        cur.execute("SET LOCAL ROLE app_user")
+        cur.execute("SELECT set_config('app.user_id', %s, true)", (str(user_id),))
+
+        for sort in PROJECT_SORTS:
+            # Cursor of the row just before the last page
+            first = load_project_page(cur, user_id, sort, limit=projects - PROJECT_PAGE_SIZE)
+            last_page = {'after': first['next_cursor']}
+            timings = []
+            for kwargs in ({}, last_page):
+                load_project_page(cur, user_id, sort, **kwargs)  # warm up
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    load_project_page(cur, user_id, sort, **kwargs)
+                timings.append((time.perf_counter() - started) * 1000 / iterations)
+            click.echo(f"{sort:10s} first page {timings[0]:.3f} ms, last page {timings[1]:.3f} ms")
+    finally:
+        conn.rollback()
+        conn.autocommit = True
+        cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
+        cur.close()
+        conn.close()
+
+
+@db_cli.command('recompute-co2e')
+@click.option('--project', 'project_ids', type=int, multiple=True, help='Limit to a project id (repeatable).')
+def db_recompute_co2e_command(project_ids):
+    """Re-cost stored emissions with the factor versions in effect on each row's period."""
+    conn = psycopg2.connect(**get_db_params())
+    try:
+        cur = conn.cursor()
+        started = time.perf_counter()
+        cur.execute("SELECT recompute_emissions_co2e_for(%s)", (list(project_ids) or None,))
+        conn.commit()
+        cur.close()
+    finally:
         conn.close()
-        raise e
+    click.echo(f"Recomputed stored CO2e in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+app.cli.add_command(db_cli)
 
 
 # ====================================
 # CALCULATION HELPERS
 # ====================================
-def calculate_emissions_data(data):
+CALCULATE_BATCH_MAX_ROWS = int(os.getenv('CALCULATE_BATCH_MAX_ROWS', '5000'))  # scenarios per /calculate/batch request
+SWEEP_MAX_STEPS = int(os.getenv('SWEEP_MAX_STEPS', '201'))  # points per sensitivity axis
+
+def calculate_emissions_data(data, factors=None):
     try:
         # Convert empty strings to 0 for numeric fields
         numeric_fields = ['asphalt_t', 'aggregate_t', 'cement_t', 'steel_t', 'diesel_l', 
@@ -93,12 +1608,9 @@ def calculate_emissions_data(data):
             if field in data and data[field] in ['', None]:
                 data[field] = 0
 
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Get emission factors and convert to float
-        cur.execute("SELECT name, co2e_per_unit FROM emission_factors")
-        factors = {row[0]: float(row[1]) for row in cur.fetchall()}
+        # Get emission factors from the in-process snapshot
+        if factors is None:
+            factors = get_emission_factors()
         
         # Calculate emissions (all in kg)
         total_co2e_kg = 0
@@ -182,18 +1694,386 @@ def calculate_emissions_data(data):
         }
 
 
-def generate_recommendations(emission_data, project_type=None):
-    recommendations = []
-    
-    # Get emission breakdown
-    materials_emissions = emission_data['breakdown'].get('Materials', 0)
-    equipment_emissions = emission_data['breakdown'].get('Equipment Fuel', 0)
-    electricity_emissions = emission_data['breakdown'].get('Electricity', 0)
-    transport_emissions = emission_data['breakdown'].get('Transport', 0)
-    total_emissions = emission_data['total_co2e']
-    
-    # Material-related recommendations - expanded list
-    material_recommendations = [
+EMISSION_INPUT_FIELDS = ['asphalt_t', 'aggregate_t', 'cement_t', 'steel_t', 'diesel_l',
+                         'electricity_kwh', 'transport_tkm', 'water_use', 'waste_t',
+                         'recycled_pct', 'renewable_pct']
+
+# One row of emission inputs with a fixed field order (88 bytes). Batches are
+# contiguous arrays of these; each field is a zero-copy strided view.
+EMISSIONS_RECORD = np.dtype([(field, np.float64) for field in EMISSION_INPUT_FIELDS])
+
+
+def emissions_records(rows, count=-1):
+    """
+    EMISSIONS_RECORD array straight from row tuples in EMISSION_INPUT_FIELDS
+    order, e.g. a psycopg2 cursor. Columns must be non-NULL (COALESCE them).
+    """
+    return np.fromiter(rows, dtype=EMISSIONS_RECORD, count=count)
+
+
+def emission_input_records(data):
+    """emission_input_columns() packed into one EMISSIONS_RECORD array"""
+    columns = emission_input_columns(data)
+    records = np.empty(len(columns[EMISSION_INPUT_FIELDS[0]]), dtype=EMISSIONS_RECORD)
+    for field in EMISSION_INPUT_FIELDS:
+        records[field] = columns[field]
+    return records
+
+
+def _text_input_float(value):
+    # get_float() in calculate_emissions_data() for a string
+    if value == '':
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+def emission_input_columns(data):
+    """
+    Cleans a DataFrame or {field: array-like} mapping into float64 arrays,
+    one per EMISSION_INPUT_FIELDS entry. Missing columns, blanks and
+    non-numeric values become 0, as get_float() does for a single row, and
+    strings are parsed by float() just like there ('1_000' is 1000, 'nan'
+    stays NaN). The one difference: a NaN number reads as 0, since that is
+    how pandas marks a blank CSV cell.
+    An EMISSIONS_RECORD array is already clean and is returned as field views.
+    """
+    if isinstance(data, np.ndarray) and data.dtype.names:
+        return {field: data[field] if field in data.dtype.names else np.zeros(len(data))
+                for field in EMISSION_INPUT_FIELDS}
+    if isinstance(data, pd.DataFrame):
+        size = len(data.index)
+    else:
+        size = max((len(values) for values in data.values()), default=0)
+    columns = {}
+    for field in EMISSION_INPUT_FIELDS:
+        if field in data:
+            series = pd.Series(data[field], copy=False)
+            values = pd.to_numeric(series, errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+            if series.dtype == object:
+                text = series.map(type).eq(str).to_numpy()
+                if text.any():
+                    values = values.copy()
+                    values[text] = [_text_input_float(value) for value in series[text]]
+            columns[field] = values
+        else:
+            columns[field] = np.zeros(size)
+    return columns
+
+
+def calculate_emissions_batch(data, factors=None):
+    """
+    Vectorised calculate_emissions_data() for many rows at once.
+    Returns unrounded per-row arrays (kg, except reduction_pct and credits).
+    The arithmetic mirrors the scalar function operation for operation, so
+    emission_results_from_batch() reproduces its output bit for bit.
+    """
+    columns = emission_input_columns(data)
+    if factors is None:
+        factors = get_emission_factors()
+
+    materials_kg = np.zeros(len(columns['asphalt_t']))
+    for field, factor_name in (("asphalt_t", "Asphalt"), ("aggregate_t", "Aggregate"),
+                               ("cement_t", "Cement"), ("steel_t", "Steel")):
+        materials_kg += columns[field] * factors.get(factor_name, 0)
+    fuel_kg = columns['diesel_l'] * factors.get('Diesel', 0)
+    electricity_kg = columns['electricity_kwh'] * factors.get('Electricity', 0)
+    transport_kg = columns['transport_tkm'] * factors.get('Transport', 0)
+    total_kg = materials_kg + fuel_kg + electricity_kg + transport_kg
+
+    reduction_kg = total_kg * (columns['recycled_pct'] / 100 * 0.3 + columns['renewable_pct'] / 100 * 0.4)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reduction_pct = np.where(total_kg > 0, reduction_kg / total_kg * 100, 0.0)
+
+    return {
+        'total_kg': total_kg,
+        'materials_kg': materials_kg,
+        'fuel_kg': fuel_kg,
+        'electricity_kg': electricity_kg,
+        'transport_kg': transport_kg,
+        'reduction_kg': reduction_kg,
+        'reduction_pct': reduction_pct,
+        'credits': reduction_kg / 1000
+    }
+
+
+def emission_results_from_batch(batch):
+    """Per-row dicts in the calculate_emissions_data() result shape"""
+    results = []
+    for total, materials, fuel, electricity, transport, credits, pct in zip(
+            batch['total_kg'].tolist(), batch['materials_kg'].tolist(), batch['fuel_kg'].tolist(),
+            batch['electricity_kg'].tolist(), batch['transport_kg'].tolist(),
+            batch['credits'].tolist(), batch['reduction_pct'].tolist()):
+        results.append({
+            "total_co2e": round(total / 1000, 2),
+            "breakdown": {
+                "Materials": round(materials / 1000, 2),
+                "Equipment Fuel": round(fuel / 1000, 2),
+                "Electricity": round(electricity / 1000, 2),
+                "Transport": round(transport / 1000, 2)
+            },
+            "credits": round(credits, 2),
+            "reduction_pct": round(pct, 2) if total > 0 else 0
+        })
+    return results
+
+
+SWEEP_MATERIALS = {'asphalt_t': 'Asphalt', 'aggregate_t': 'Aggregate', 'cement_t': 'Cement', 'steel_t': 'Steel'}
+
+
+def emissions_sensitivity_grid(quantities, factors, recycled_pct, renewable_pct,
+                               substitute=None, substitution=None):
+    """
+    Evaluates a project's summed quantities over every combination of the
+    given axes in one broadcast operation.
+    substitution is the share of the `substitute` material displaced by a
+    zero-carbon alternative. Surfaces are shaped
+    (len(substitution), len(recycled_pct), len(renewable_pct)), in tons.
+    """
+    base_kg = sum(quantities[field] * factors.get(name, 0) for field, name in SWEEP_MATERIALS.items())
+    base_kg += quantities['diesel_l'] * factors.get('Diesel', 0)
+    base_kg += quantities['electricity_kwh'] * factors.get('Electricity', 0)
+    base_kg += quantities['transport_tkm'] * factors.get('Transport', 0)
+
+    if substitute is None:
+        substitution = np.zeros(1)
+        displaced_kg = 0.0
+    else:
+        displaced_kg = quantities[substitute] * factors.get(SWEEP_MATERIALS[substitute], 0)
+    total_kg = (base_kg - substitution * displaced_kg)[:, None, None]
+    share = recycled_pct[None, :, None] / 100 * 0.3 + renewable_pct[None, None, :] / 100 * 0.4
+    reduction_kg = total_kg * share
+
+    shape = np.broadcast_shapes(total_kg.shape, share.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reduction_pct = np.where(total_kg > 0, reduction_kg / total_kg * 100, 0.0)
+    return {
+        'total_co2e': np.broadcast_to(total_kg / 1000, shape),
+        'net_co2e': (total_kg - reduction_kg) / 1000,
+        'credits': reduction_kg / 1000,
+        'reduction_pct': np.broadcast_to(reduction_pct, shape)
+    }
+
+
+class EmissionProfile:
+    """A project_emission_profile row: owner, type and stored kg totals"""
+    __slots__ = ('user_id', 'project_type', 'total_kg', 'materials_kg', 'fuel_kg',
+                 'electricity_kg', 'transport_kg', 'reduction_kg', 'updated_at')
+
+    def __init__(self, user_id, project_type, total_kg, materials_kg, fuel_kg,
+                 electricity_kg, transport_kg, reduction_kg, updated_at):
+        self.user_id = user_id
+        self.project_type = project_type
+        self.total_kg = float(total_kg)
+        self.materials_kg = float(materials_kg)
+        self.fuel_kg = float(fuel_kg)
+        self.electricity_kg = float(electricity_kg)
+        self.transport_kg = float(transport_kg)
+        self.reduction_kg = float(reduction_kg)
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row) if row else None
+
+    def emission_data(self):
+        return emission_data_from_totals(self.total_kg, self.materials_kg, self.fuel_kg,
+                                         self.electricity_kg, self.transport_kg, self.reduction_kg)
+
+
+def emission_data_from_totals(total_kg, materials_kg, fuel_kg, electricity_kg, transport_kg, reduction_kg):
+    """Builds the calculate_emissions_data() result shape from stored kg totals"""
+    total_kg = float(total_kg or 0)
+    reduction_kg = float(reduction_kg or 0)
+    breakdown = {
+        "Materials": float(materials_kg or 0),
+        "Equipment Fuel": float(fuel_kg or 0),
+        "Electricity": float(electricity_kg or 0),
+        "Transport": float(transport_kg or 0)
+    }
+    return {
+        "total_co2e": round(total_kg / 1000, 2),
+        "breakdown": {k: round(v / 1000, 2) for k, v in breakdown.items()},
+        "credits": round(reduction_kg / 1000, 2),
+        "reduction_pct": round(reduction_kg / total_kg * 100, 2) if total_kg > 0 else 0
+    }
+
+
+emissions_cli = AppGroup('emissions', help='Emission calculation tools.')
+
+
+def _traced(build):
+    """(result, bytes held, live allocations) for build() under tracemalloc"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        result = build()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    diff = after.compare_to(before, 'filename')
+    return result, sum(stat.size_diff for stat in diff), sum(stat.count_diff for stat in diff)
+
+
+@emissions_cli.command('bench-records')
+@click.option('--rows', default=100000, show_default=True)
+def emissions_bench_records_command(rows):
+    """Memory and allocations of emission rows as dicts vs. EMISSIONS_RECORD."""
+    rng = np.random.default_rng(0)
+    factors = dict.fromkeys(UNCERTAINTY_FACTORS, 1.0)  # values don't affect the timing; skips the database
+    source = [tuple(values) for values in rng.uniform(0, 500, (rows, len(EMISSION_INPUT_FIELDS))).tolist()]
+
+    dicts, dict_bytes, dict_allocs = _traced(lambda: [dict(zip(EMISSION_INPUT_FIELDS, row)) for row in source])
+    records, record_bytes, record_allocs = _traced(lambda: emissions_records(source, len(source)))
+    for label, size, allocs in (('dict', dict_bytes, dict_allocs), ('record', record_bytes, record_allocs)):
+        click.echo(f"{label:7s} {size / rows:8.1f} B/row  {allocs:>9d} allocations")
+
+    for label, data in (('dict', dicts), ('record', records)):
+        started = time.perf_counter()
+        if label == 'dict':
+            data = {field: [row[field] for row in data] for field in EMISSION_INPUT_FIELDS}
+        calculate_emissions_batch(data, factors)
+        click.echo(f"{label:7s} {(time.perf_counter() - started) * 1000:8.1f} ms to calculate")
+
+
+app.cli.add_command(emissions_cli)
+
+
+# ====================================
+# PERIOD ALLOCATION
+# ====================================
+# Spreads (start, end, total) intervals evenly over their days and sums them
+# into calendar buckets. Cost is O((intervals + buckets) log intervals), so a
+# decade of weeks over tens of thousands of projects stays in milliseconds.
+TIMELINE_PERIODS = ('week', 'month', 'quarter', 'year')
+TIMELINE_MAX_BUCKETS = int(os.getenv('TIMELINE_MAX_BUCKETS', '1000'))
+
+
+def period_edges(first, last, period):
+    """
+    Bucket boundaries (datetime64[D]) for the calendar periods covering
+    first..last inclusive: buckets + 1 edges. Weeks start on Monday.
+    """
+    first = np.datetime64(first, 'D')
+    last = np.datetime64(last, 'D')
+    if period == 'week':
+        # Day 0 (1970-01-01) was a Thursday
+        monday = first - (first.astype(np.int64) + 3) % 7
+        return np.arange(monday, last + 8, 7)
+    if period == 'month':
+        return np.arange(first.astype('M8[M]'), last.astype('M8[M]') + 2).astype('M8[D]')
+    if period == 'quarter':
+        start = first.astype('M8[M]')
+        start -= start.astype(np.int64) % 3
+        return np.arange(start, last.astype('M8[M]') + 4, 3).astype('M8[D]')
+    if period == 'year':
+        return np.arange(first.astype('M8[Y]'), last.astype('M8[Y]') + 2).astype('M8[D]')
+    raise ValueError(f"period must be one of {', '.join(TIMELINE_PERIODS)}")
+
+
+def period_labels(edges, period):
+    """Display labels for the buckets between consecutive edges"""
+    labels = []
+    for day in edges[:-1].tolist():
+        if period == 'week':
+            year, week, _ = day.isocalendar()
+            labels.append(f"{year}-W{week:02d}")
+        elif period == 'month':
+            labels.append(day.strftime('%b %Y'))
+        elif period == 'quarter':
+            labels.append(f"Q{(day.month - 1) // 3 + 1} {day.year}")
+        else:
+            labels.append(str(day.year))
+    return labels
+
+
+def allocate_to_periods(starts, ends, totals, edges):
+    """
+    Amount of each interval falling in each bucket, summed per bucket.
+    Intervals cover whole days from start to end inclusive; ones with a
+    missing date or an end before the start are ignored.
+    """
+    starts = np.asarray(starts, dtype='M8[D]')
+    ends = np.asarray(ends, dtype='M8[D]')
+    totals = np.asarray(totals, dtype=np.float64)
+    valid = ~(np.isnat(starts) | np.isnat(ends)) & (ends >= starts)
+    # Days relative to the first edge keep the prefix sums small
+    origin = edges[0]
+    s = (starts[valid] - origin).astype(np.float64)
+    e = (ends[valid] - origin).astype(np.float64) + 1
+    rate = totals[valid] / (e - s)
+    t = (edges - origin).astype(np.float64)
+
+    def ramp(points, weights):
+        # sum(weights_i * max(t - points_i, 0)) at every edge
+        order = np.argsort(points)
+        points = points[order]
+        weight_sum = np.concatenate(([0.0], np.cumsum(weights[order])))
+        moment_sum = np.concatenate(([0.0], np.cumsum(weights[order] * points)))
+        k = np.searchsorted(points, t, side='right')
+        return t * weight_sum[k] - moment_sum[k]
+
+    # Cumulative amount allocated before each edge
+    cumulative = ramp(s, rate) - ramp(e, rate)
+    return np.clip(np.diff(cumulative), 0, None)  # clip rounding residue below zero
+
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_NAT = np.iinfo(np.int64).min
+
+
+def dates_to_days(values):
+    """datetime64[D] array from date objects (None -> NaT) via ordinals, skipping numpy's per-item parsing"""
+    return np.fromiter((d.toordinal() - _EPOCH_ORDINAL if d else _NAT for d in values),
+                       dtype=np.int64, count=len(values)).view('M8[D]')
+
+
+def emissions_timeline(rows, period, first, last):
+    """
+    {'labels', 'actual', 'projected'} for (start_date, end_date, total) rows
+    allocated over the periods covering first..last.
+    """
+    edges = period_edges(first, last, period)
+    if len(edges) - 1 > TIMELINE_MAX_BUCKETS:
+        raise ValueError(f"Range spans more than {TIMELINE_MAX_BUCKETS} {period}s")
+    starts, ends, totals = zip(*rows) if rows else ((), (), ())
+    actual = allocate_to_periods(dates_to_days(starts), dates_to_days(ends),
+                                 [float(t or 0) for t in totals], edges).tolist()
+    return {
+        'labels': period_labels(edges, period),
+        'actual': actual,
+        'projected': [val * 0.9 for val in actual]  # projected is 90% of actual
+    }
+
+
+@emissions_cli.command('bench-timeline')
+@click.option('--projects', default=50000, show_default=True)
+@click.option('--period', default='week', show_default=True, type=click.Choice(TIMELINE_PERIODS))
+def emissions_bench_timeline_command(projects, period):
+    """Time allocating random project intervals over ten years of periods."""
+    rng = np.random.default_rng(0)
+    first = np.datetime64('2020-01-01')
+    starts = first + rng.integers(0, 3650, projects)
+    ends = starts + rng.integers(0, 720, projects)
+    totals = rng.uniform(1, 1000, projects)
+    edges = period_edges(first, first + 3650, period)
+    started = time.perf_counter()
+    allocated = allocate_to_periods(starts, ends, totals, edges)
+    elapsed = (time.perf_counter() - started) * 1000
+    click.echo(f"{projects} projects x {len(allocated)} {period}s in {elapsed:.1f} ms "
+               f"(allocated {allocated.sum():.1f} of {totals.sum():.1f})")
+
+
+# ====================================
+# RECOMMENDATION CATALOG
+# ====================================
+# Built once at import. Entries are shared between calls, so they are read-only
+# mappings; copy one before changing it.
+RECOMMENDATION_CATALOG = {
+    # Material-related recommendations
+    'materials': (
         {
             'title': 'Use Recycled Materials',
             'description': 'Incorporate recycled asphalt pavement (RAP) and supplementary cementitious materials (SCMs) to reduce material-related emissions by up to 30%.',
@@ -222,10 +2102,9 @@ def generate_recommendations(emission_data, project_type=None):
             'cost': 200000,
             'category': 'Materials'
         }
-    ]
-    
+    ),
     # Equipment-related recommendations
-    equipment_recommendations = [
+    'equipment': (
         {
             'title': 'Electrify Equipment',
             'description': 'Replace diesel-powered equipment with electric alternatives where feasible to eliminate direct emissions and reduce noise pollution.',
@@ -254,10 +2133,9 @@ def generate_recommendations(emission_data, project_type=None):
             'cost': 200000,
             'category': 'Equipment'
         }
-    ]
-    
+    ),
     # Energy-related recommendations
-    energy_recommendations = [
+    'energy': (
         {
             'title': 'Switch to Solar Power',
             'description': 'Install solar panels at site offices and batch plants to reduce grid electricity dependence by 40-60%.',
@@ -286,10 +2164,9 @@ def generate_recommendations(emission_data, project_type=None):
             'cost': 150000,
             'category': 'Energy'
         }
-    ]
-    
+    ),
     # Transport-related recommendations
-    transport_recommendations = [
+    'transport': (
         {
             'title': 'Optimize Logistics',
             'description': 'Implement route optimization software and increase local sourcing of materials to reduce transport emissions by 15-25%.',
@@ -318,10 +2195,9 @@ def generate_recommendations(emission_data, project_type=None):
             'cost': 800000,
             'category': 'Logistics'
         }
-    ]
-    
+    ),
     # General recommendations
-    general_recommendations = [
+    'general': (
         {
             'title': 'Conduct Energy Audit',
             'description': 'Perform a comprehensive energy audit to identify additional energy-saving opportunities across all operations.',
@@ -350,90 +2226,152 @@ def generate_recommendations(emission_data, project_type=None):
             'cost': 300000,
             'category': 'General'
         }
-    ]
-    
-    # Project-type specific recommendations
-    project_specific_recommendations = []
+    ),
+    # Building / construction projects
+    'building': (
+        {
+            'title': 'Implement Green Building Practices',
+            'description': 'Adopt green building standards like LEED or IGBC to improve overall sustainability and reduce operational emissions.',
+            'impact': 'High',
+            'cost': 1000000,
+            'category': 'General'
+        },
+        {
+            'title': 'Optimize Building Orientation',
+            'description': 'Design building orientation to maximize natural light and reduce artificial lighting needs by 15-25%.',
+            'impact': 'Medium',
+            'cost': 200000,
+            'category': 'Design'
+        }
+    ),
+    # Road / highway projects
+    'road': (
+        {
+            'title': 'Use Permeable Pavement',
+            'description': 'Implement permeable pavement solutions to manage stormwater and reduce environmental impact.',
+            'impact': 'Medium',
+            'cost': 700000,
+            'category': 'Materials'
+        },
+        {
+            'title': 'Optimize Road Grade',
+            'description': 'Design road grades to minimize vehicle fuel consumption over the lifecycle of the road.',
+            'impact': 'Medium',
+            'cost': 400000,
+            'category': 'Design'
+        }
+    )
+}
+RECOMMENDATION_CATALOG = {group: tuple(MappingProxyType(rec) for rec in recs)
+                          for group, recs in RECOMMENDATION_CATALOG.items()}
+
+# (catalog group, breakdown key, share of total emissions above which the group applies)
+RECOMMENDATION_HOTSPOT_RULES = (
+    ('materials', 'Materials', 0.3),
+    ('equipment', 'Equipment Fuel', 0.2),
+    ('energy', 'Electricity', 0.15),
+    ('transport', 'Transport', 0.25)
+)
+
+# (project_type keywords, catalog group); the first rule with a matching keyword wins
+RECOMMENDATION_PROJECT_TYPE_RULES = (
+    (('Building', 'Construction'), 'building'),
+    (('Road', 'Highway'), 'road')
+)
+
+# Categories select_recommendations() picks from first, in order
+RECOMMENDATION_CATEGORY_PRIORITY = ['Materials', 'Equipment', 'Energy', 'Logistics', 'General']
+
+
+def _compile_recommendation_table():
+    """
+    Precomputes, for every combination of hotspot flags and project-type
+    group, the recommendation list and its split by priority category, so
+    selection is a table lookup.
+    """
+    table = {}
+    type_groups = [None] + [group for _, group in RECOMMENDATION_PROJECT_TYPE_RULES]
+    for mask in range(1 << len(RECOMMENDATION_HOTSPOT_RULES)):
+        flags = tuple(bool(mask & (1 << i)) for i in range(len(RECOMMENDATION_HOTSPOT_RULES)))
+        for type_group in type_groups:
+            candidates = []
+            for flag, (group, _, _) in zip(flags, RECOMMENDATION_HOTSPOT_RULES):
+                if flag:
+                    candidates.extend(RECOMMENDATION_CATALOG[group])
+            # General recommendations are always included
+            candidates.extend(RECOMMENDATION_CATALOG['general'])
+            if type_group:
+                candidates.extend(RECOMMENDATION_CATALOG[type_group])
+
+            unique, seen_titles = [], set()
+            for rec in candidates:
+                if rec['title'] not in seen_titles:
+                    seen_titles.add(rec['title'])
+                    unique.append(rec)
+            by_category = {category: tuple(rec for rec in unique if rec.get('category', 'General') == category)
+                           for category in RECOMMENDATION_CATEGORY_PRIORITY}
+            table[flags, type_group] = (tuple(unique), by_category)
+    return table
+
+
+RECOMMENDATION_TABLE = _compile_recommendation_table()
+
+
+def project_type_group(project_type):
     if project_type:
-        if 'Building' in project_type or 'Construction' in project_type:
-            project_specific_recommendations.extend([
-                {
-                    'title': 'Implement Green Building Practices',
-                    'description': 'Adopt green building standards like LEED or IGBC to improve overall sustainability and reduce operational emissions.',
-                    'impact': 'High',
-                    'cost': 1000000,
-                    'category': 'General'
-                },
-                {
-                    'title': 'Optimize Building Orientation',
-                    'description': 'Design building orientation to maximize natural light and reduce artificial lighting needs by 15-25%.',
-                    'impact': 'Medium',
-                    'cost': 200000,
-                    'category': 'Design'
-                }
-            ])
-        elif 'Road' in project_type or 'Highway' in project_type:
-            project_specific_recommendations.extend([
-                {
-                    'title': 'Use Permeable Pavement',
-                    'description': 'Implement permeable pavement solutions to manage stormwater and reduce environmental impact.',
-                    'impact': 'Medium',
-                    'cost': 700000,
-                    'category': 'Materials'
-                },
-                {
-                    'title': 'Optimize Road Grade',
-                    'description': 'Design road grades to minimize vehicle fuel consumption over the lifecycle of the road.',
-                    'impact': 'Medium',
-                    'cost': 400000,
-                    'category': 'Design'
-                }
-            ])
-    
-    # Select recommendations based on emission profile
-    all_recommendations = []
-    
-    # Add recommendations based on emission hotspots
-    if materials_emissions > total_emissions * 0.3:  # If materials account for >30% of emissions
-        all_recommendations.extend(material_recommendations)
-    
-    if equipment_emissions > total_emissions * 0.2:  # If equipment account for >20% of emissions
-        all_recommendations.extend(equipment_recommendations)
-    
-    if electricity_emissions > total_emissions * 0.15:  # If electricity account for >15% of emissions
-        all_recommendations.extend(energy_recommendations)
-    
-    if transport_emissions > total_emissions * 0.25:  # If transport account for >25% of emissions
-        all_recommendations.extend(transport_recommendations)
-    
-    # Always include some general recommendations
-    all_recommendations.extend(general_recommendations)
-    
-    # Add project-specific recommendations
-    all_recommendations.extend(project_specific_recommendations)
-    
-    # If no specific issues found, provide a broader set of recommendations
-    if not all_recommendations:
-        all_recommendations.extend(material_recommendations[:2])
-        all_recommendations.extend(equipment_recommendations[:2])
-        all_recommendations.extend(energy_recommendations[:1])
-        all_recommendations.extend(transport_recommendations[:1])
-        all_recommendations.extend(general_recommendations[:2])
-    
-    # Remove duplicates by title
-    unique_recommendations = []
+        for keywords, group in RECOMMENDATION_PROJECT_TYPE_RULES:
+            if any(keyword in project_type for keyword in keywords):
+                return group
+    return None
+
+
+def recommendation_candidates(emission_data, project_type=None):
+    """(recommendations, {priority category: recommendations}) for a project"""
+    breakdown = emission_data['breakdown']
+    total_emissions = emission_data['total_co2e']
+    flags = tuple(breakdown.get(key, 0) > total_emissions * share
+                  for _, key, share in RECOMMENDATION_HOTSPOT_RULES)
+    return RECOMMENDATION_TABLE[flags, project_type_group(project_type)]
+
+
+def generate_recommendations(emission_data, project_type=None):
+    return list(recommendation_candidates(emission_data, project_type)[0])
+
+
+RECOMMENDATION_CACHE_SIZE = int(os.getenv('RECOMMENDATION_CACHE_SIZE', '512'))
+
+# (project_id, emissions version, factor version) -> (candidates, candidates by category)
+recommendation_cache = LRUCache(RECOMMENDATION_CACHE_SIZE)
+
+
+def select_recommendations(recommendations, categorized_recs, rng=random):
+    """Picks 2 recommendations, preferring distinct high-priority categories"""
+    selected_recommendations = []
     seen_titles = set()
     
-    for rec in all_recommendations:
+    # Select one recommendation from high priority categories first
+    for category in RECOMMENDATION_CATEGORY_PRIORITY:
+        if categorized_recs[category] and len(selected_recommendations) < 2:
+            rec = rng.choice(categorized_recs[category])
+            if rec['title'] not in seen_titles:
+                selected_recommendations.append(rec)
+                seen_titles.add(rec['title'])
+    
+    # If we still need more, select randomly from all
+    while len(selected_recommendations) < 2 and recommendations:
+        rec = rng.choice(recommendations)
         if rec['title'] not in seen_titles:
+            selected_recommendations.append(rec)
             seen_titles.add(rec['title'])
-            unique_recommendations.append(rec)
-    
-    return unique_recommendations
+    return selected_recommendations
 
 
-@app.route('/refresh-recommendations/<project_id>', methods=['POST'])
+@app.route('/refresh-recommendations/<project_id>', methods=['GET', 'POST'])
 def refresh_recommendations(project_id):
+    """
+    Two recommendations for the project. Random by default; with ?seed=<value>
+    the pick is reproducible and the response carries an ETag.
+    """
     try:
         if 'user_id' not in session:
             return jsonify({"status": "error", "message": "Unauthorized"}), 401
@@ -441,89 +2379,50 @@ def refresh_recommendations(project_id):
         conn = get_db_connection()
         cur = conn.cursor()
         
-        # Check project ownership
-        cur.execute("SELECT user_id FROM projects WHERE id = %s", (project_id,))
-        project = cur.fetchone()
-        if not project or project[0] != session['user_id']:
+        # Check project ownership and read the emission rollup in one round-trip
+        execute_hot_query(cur, 'project_emission_profile', (project_id,))
+        profile = EmissionProfile.from_row(cur.fetchone())
+        if not profile or profile.user_id != session['user_id']:
             cur.close()
             conn.close()
             return jsonify({"status": "error", "message": "Unauthorized access to project"}), 403
         
-        # Get current project data including emissions
-        cur.execute("""
-            SELECT p.type, 
-                   e.asphalt_t, e.aggregate_t, e.cement_t, e.steel_t,
-                   e.diesel_l, e.electricity_kwh, e.transport_tkm,
-                   e.water_use, e.waste_t, e.recycled_pct, e.renewable_pct
-            FROM projects p
-            LEFT JOIN emissions e ON p.id = e.project_id
-            WHERE p.id = %s
-        """, (project_id,))
-        
-        project_data = cur.fetchone()
-        if not project_data:
-            cur.close()
-            conn.close()
-            return jsonify({"status": "error", "message": "Project data not found"}), 404
-        
-        # Convert to dictionary format for calculate_emissions_data
-        data = {
-            'project_type': project_data[0],
-            'asphalt_t': project_data[1] or 0,
-            'aggregate_t': project_data[2] or 0,
-            'cement_t': project_data[3] or 0,
-            'steel_t': project_data[4] or 0,
-            'diesel_l': project_data[5] or 0,
-            'electricity_kwh': project_data[6] or 0,
-            'transport_tkm': project_data[7] or 0,
-            'water_use': project_data[8] or 0,
-            'waste_t': project_data[9] or 0,
-            'recycled_pct': project_data[10] or 0,
-            'renewable_pct': project_data[11] or 0
-        }
-        
-        # Calculate current emissions
-        emission_data = calculate_emissions_data(data)
-        
-        # Generate NEW recommendations based on current data
-        recommendations = generate_recommendations(emission_data, data['project_type'])
-        
-        # Select 2 unique recommendations to return
-        selected_recommendations = []
-        seen_titles = set()
-        
-        # Try to get diverse recommendations (different categories)
-        category_priority = ['Materials', 'Equipment', 'Energy', 'Logistics', 'General']
-        categorized_recs = {category: [] for category in category_priority}
-        
-        for rec in recommendations:
-            category = rec.get('category', 'General')
-            if category in categorized_recs:
-                categorized_recs[category].append(rec)
-        
-        # Select one recommendation from high priority categories first
-        for category in category_priority:
-            if categorized_recs[category] and len(selected_recommendations) < 2:
-                rec = random.choice(categorized_recs[category])
-                if rec['title'] not in seen_titles:
-                    selected_recommendations.append(rec)
-                    seen_titles.add(rec['title'])
-        
-        # If we still need more, select randomly from all
-        while len(selected_recommendations) < 2 and recommendations:
-            rec = random.choice(recommendations)
-            if rec['title'] not in seen_titles:
-                selected_recommendations.append(rec)
-                seen_titles.add(rec['title'])
+        # The rollup's updated_at moves on every emissions/credits write; the
+        # project type is edited on the project row, so it goes in the key too
+        cache_key = (str(project_id), profile.project_type, profile.updated_at, emission_factor_cache.version())
+        cached = recommendation_cache.get(cache_key)
+        if cached is None:
+            # Current emissions straight from the stored per-project totals
+            cached = recommendation_candidates(profile.emission_data(), profile.project_type)
+            recommendation_cache.put(cache_key, cached)
+        recommendations, categorized_recs = cached
+        
+        seed = request.args.get('seed')
+        etag = None
+        if seed is None:
+            selected_recommendations = select_recommendations(recommendations, categorized_recs)
+        else:
+            etag = hashlib.sha1(repr((cache_key, seed)).encode()).hexdigest()
+            if request.method in ('GET', 'HEAD') and etag in request.if_none_match:
+                cur.close()
+                conn.close()
+                response = app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+            selected_recommendations = select_recommendations(
+                recommendations, categorized_recs, random.Random(f"{seed}:{cache_key}"))
         
         cur.close()
         conn.close()
         
-        return jsonify({
+        response = jsonify({
             "status": "success", 
-            "recommendations": selected_recommendations,
+            "recommendations": [dict(rec) for rec in selected_recommendations],
             "message": "New recommendations generated based on current project data"
         })
+        if etag:
+            response.set_etag(etag)
+        return response
     except Exception as e:
         if 'conn' in locals():
             conn.rollback()
@@ -550,7 +2449,86 @@ def require_auth():
     
     if request.endpoint not in auth_routes and 'user_id' not in session:
         return redirect(url_for('login'))
-    
+
+
+@app.after_request
+def remember_db_write(response):
+    # A request that committed pins this session to the primary for a few seconds
+    if DB_REPLICA_HOST and g.get('db_committed'):
+        session['db_written_at'] = time.time()
+    return response
+
+
+def db_unavailable_response(message):
+    if request.path.startswith('/api/') or request.is_json:
+        response = jsonify({"status": "error", "message": message})
+    else:
+        response = app.make_response(render_template('error.html', error=message))
+    response.status_code = 503
+    response.headers['Retry-After'] = str(DB_RETRY_AFTER)
+    return response
+
+
+@app.errorhandler(psycopg2.errors.QueryCanceled)
+@app.errorhandler(psycopg2.errors.LockNotAvailable)
+def handle_db_budget_exceeded(e):
+    return db_unavailable_response("The request took too long. Please try again shortly.")
+
+
+@app.before_request
+def start_query_stats():
+    if SQL_INSTRUMENTATION:
+        g.query_stats = RequestQueryStats()
+
+
+@app.after_request
+def report_query_stats(response):
+    stats = g.pop('query_stats', None)
+    if stats is None:
+        return response
+
+    db_ms = stats.total_time * 1000
+    response.headers.add('Server-Timing', f'db;dur={db_ms:.1f};desc="{stats.count} queries"')
+    if stats.count:
+        response.headers.add('Server-Timing', f'db-slowest;dur={stats.slowest_time * 1000:.1f}')
+
+    app.logger.info(json.dumps({
+        'event': 'request_sql',
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'queries': stats.count,
+        'db_ms': round(db_ms, 2),
+        'slowest_ms': round(stats.slowest_time * 1000, 2),
+        'slowest_sql': (stats.slowest_query or '')[:SQL_SLOW_LOG_LENGTH]
+    }))
+    budget = g.pop('query_budget', None)
+    if budget is not None and stats.count > budget:
+        app.logger.warning(json.dumps({
+            'event': 'sql_query_budget',
+            'endpoint': request.endpoint,
+            'queries': stats.count,
+            'budget': budget
+        }))
+    for query, n in stats.repeated(SQL_REPEAT_WARN_THRESHOLD).items():
+        app.logger.warning(json.dumps({
+            'event': 'sql_repeated',
+            'endpoint': request.endpoint,
+            'executions': n,
+            'sql': query[:SQL_SLOW_LOG_LENGTH]
+        }))
+    return response
+
+
+@app.after_request
+def enforce_db_budget(response):
+    # Registered last so it runs first: the replacement 503 still gets Server-Timing
+    if g.pop('db_budget_exceeded', False) and response.status_code != 503:
+        app.logger.warning(f"DB budget exceeded on {request.endpoint}")
+        return db_unavailable_response("The request took too long. Please try again shortly.")
+    return response
+
 
 # ====================================
 # AUTHENTICATION ROUTES
@@ -632,6 +2610,41 @@ def verify_session():
     return jsonify({"status": "error"}), 401
 
 
+def admin_required(view):
+    """Limits a view to admins; process-wide monitoring is not for every user."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get('role') != 'admin':
+            return jsonify({"status": "error", "message": "Admin access required"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@app.route('/api/db/pool-stats')
+@admin_required
+def db_pool_stats():
+    """Connection pool counters for monitoring"""
+    stats = {"status": "success", "pool": get_db_pool().stats()}
+    if DB_REPLICA_HOST:
+        stats["replica_pool"] = get_db_pool(replica=True).stats()
+    return jsonify(stats)
+
+
+@app.route('/api/cache/stats')
+@admin_required
+def cache_stats():
+    """Hit/miss counters of the in-process result caches"""
+    return jsonify({
+        "status": "success",
+        "caches": {
+            "calculation": calculation_cache.stats(),
+            "dashboard": dashboard_cache.stats(),
+            "recommendations": recommendation_cache.stats(),
+            "uncertainty": emission_uncertainty.cache.stats()
+        }
+    })
+
+
 @app.context_processor
 def inject_user_context():
     return dict(
@@ -692,212 +2705,219 @@ def calculate_project_status(start_date, end_date):
 # ====================================
 # DASHBOARD & PROJECT ROUTES
 # ====================================
+def dashboard_context(rows):
+    """
+    Template context (project count, totals, scopes, timeline) from
+    dashboard_summary rows. The projects themselves are paged separately.
+    """
+    total_co2e_tons = 0.0
+    total_credits = 0.0
+    total_reduction = 0.0
+    for _, _, co2e, credits, reduction_pct, *_ in rows:
+        total_co2e_tons += float(co2e)
+        total_credits += float(credits)
+        total_reduction += float(reduction_pct)
+
+    # Scope sums repeat on every row; no rows means no emissions
+    scope_sums = rows[0][5:8] if rows else (None, None, None)
+    scopes = {f'scope{i}': float(value) if value else 0.0 for i, value in enumerate(scope_sums, 1)}
+
+    # Spread each project's emissions over the last 6 calendar months
+    today = date.today()
+    timeline = emissions_timeline([row[:3] for row in rows], 'month',
+                                  np.datetime64(today, 'M') - 5, today)
+    return {
+        'project_count': len(rows),
+        'total_co2e': total_co2e_tons,
+        'total_credits': total_credits,
+        'avg_reduction': total_reduction / len(rows) if rows else 0.0,
+        'scopes': scopes,
+        'timeline': timeline
+    }
+
+
+def load_dashboard(cur, user_id):
+    """Everything the dashboard shows, in one round-trip"""
+    execute_hot_query(cur, 'dashboard_summary', (user_id,))
+    return dashboard_context(cur.fetchall())
+
+
+PROJECT_PAGE_SIZE = int(os.getenv('PROJECT_PAGE_SIZE', '20'))
+PROJECT_PAGE_MAX = 100
+
+
+def encode_page_cursor(key, project_id):
+    """Opaque cursor for the row with sort key text `key` and id project_id"""
+    return base64.urlsafe_b64encode(f"{key}|{project_id}".encode()).decode().rstrip('=')
+
+
+def decode_page_cursor(cursor, key_type):
+    """(key text, project id) from a cursor; ValueError when it is malformed"""
+    try:
+        key, project_id = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode().rsplit('|', 1)
+        if key_type == 'date':
+            if key != '-infinity':
+                date.fromisoformat(key)
+        else:
+            float(key)
+        return key, int(project_id)
+    except ValueError:
+        raise ValueError("Invalid page cursor")
+
+
+def project_page_args(args):
+    """
+    load_project_page() keyword arguments from a query string:
+    ?sort=start_date|co2e|credits|reduction&dir=asc|desc&limit=&after=|before=
+    """
+    sort = args.get('sort', 'start_date')
+    if sort not in PROJECT_SORTS:
+        raise ValueError(f"sort must be one of: {', '.join(PROJECT_SORTS)}")
+    direction = args.get('dir', 'desc')
+    if direction not in ('asc', 'desc'):
+        raise ValueError("dir must be asc or desc")
+    limit = int(args.get('limit', PROJECT_PAGE_SIZE))
+    if not 1 <= limit <= PROJECT_PAGE_MAX:
+        raise ValueError(f"limit must be between 1 and {PROJECT_PAGE_MAX}")
+    return {'sort': sort, 'direction': direction, 'limit': limit,
+            'after': args.get('after') or None, 'before': args.get('before') or None}
+
+
+def load_project_page(cur, user_id, sort='start_date', direction='desc', limit=PROJECT_PAGE_SIZE,
+                      after=None, before=None):
+    """
+    One page of the user's projects, ordered by sort then id, starting after
+    the `after` cursor (or ending before the `before` cursor). Returns the
+    projects with the cursors of the neighbouring pages (None at either end).
+    """
+    cursor = before or after
+    # A page before a cursor is read in the opposite order, then flipped
+    read_direction = ('asc' if direction == 'desc' else 'desc') if before else direction
+    if cursor:
+        key, last_id = decode_page_cursor(cursor, PROJECT_SORTS[sort][1])
+    else:
+        key, last_id = ('infinity', 2147483647) if read_direction == 'desc' else ('-infinity', 0)
+    execute_hot_query(cur, f'project_page_{sort}_{read_direction}', (user_id, key, last_id, limit + 1))
+    rows = cur.fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if before:
+        rows.reverse()
+
+    projects = []
+    for project_id, name, project_type, start_date, end_date, co2e, credits, reduction_pct, _ in rows:
+        projects.append({
+            'id': project_id,
+            'name': name,
+            'type': project_type,
+            'date': start_date.isoformat() if start_date else '',
+            'co2e': co2e,
+            'credits': credits,
+            'reduction': round(reduction_pct, 2),
+            'status': calculate_project_status(start_date, end_date) if start_date and end_date else "Unknown"
+        })
+    first = encode_page_cursor(rows[0][8], rows[0][0]) if rows else None
+    last = encode_page_cursor(rows[-1][8], rows[-1][0]) if rows else None
+    return {
+        'projects': projects,
+        'sort': sort,
+        'dir': direction,
+        'limit': limit,
+        'prev_cursor': first if (more if before else after) else None,
+        'next_cursor': last if (before or more) else None
+    }
+
+
 @app.route('/dashboard')
+@read_only_route
 def dashboard():
     try:
+        page_args = project_page_args(request.args)
         conn = get_secure_db_connection()
         cur = conn.cursor()
+        _, context = dashboard_cache.get_or_load(cur, session['user_id'])
+        page = load_project_page(cur, session['user_id'], **page_args)
+        cur.close()
+        conn.close()
         
-        # Get user's projects with aggregated data
-        cur.execute("""
-            SELECT p.id, p.name, p.type, p.start_date, p.end_date,
-                COALESCE(SUM(
-                    e.asphalt_t * ef_asphalt.co2e_per_unit +
-                    e.aggregate_t * ef_aggregate.co2e_per_unit +
-                    e.cement_t * ef_cement.co2e_per_unit +
-                    e.steel_t * ef_steel.co2e_per_unit +
-                    e.diesel_l * ef_diesel.co2e_per_unit +
-                    e.electricity_kwh * ef_electricity.co2e_per_unit +
-                    e.transport_tkm * ef_transport.co2e_per_unit
-                ) / 1000, 0) AS total_co2e_tons,
-                COALESCE(SUM(cc.credits_earned), 0) AS credits
-            FROM projects p
-            LEFT JOIN emissions e ON p.id = e.project_id
-            LEFT JOIN carbon_credits cc ON p.id = cc.project_id
-            JOIN emission_factors ef_asphalt ON ef_asphalt.name = 'Asphalt'
-            JOIN emission_factors ef_aggregate ON ef_aggregate.name = 'Aggregate'
-            JOIN emission_factors ef_cement ON ef_cement.name = 'Cement'
-            JOIN emission_factors ef_steel ON ef_steel.name = 'Steel'
-            JOIN emission_factors ef_diesel ON ef_diesel.name = 'Diesel'
-            JOIN emission_factors ef_electricity ON ef_electricity.name = 'Electricity'
-            JOIN emission_factors ef_transport ON ef_transport.name = 'Transport'
-            WHERE p.user_id = %s
-            GROUP BY p.id, p.name, p.type, p.start_date, p.end_date
-        """, (session['user_id'],))
-        
-        projects = []
-        total_co2e_tons = 0.0  # Initialize as float
-        total_credits = 0.0    # Initialize as float
-        
-        for row in cur.fetchall():
-            project_id = row[0]
-            # Convert to float to avoid Decimal issues
-            total_co2e_kg = float(row[5]) * 1000  # Convert back to kg for reduction calculation
-            
-            # Calculate status based on dates
-            start_date = row[3]
-            end_date = row[4]
-            status = calculate_project_status(start_date, end_date) if start_date and end_date else "Unknown"
-            
-            # Convert to float and calculate reduction percentage
-            co2e_tons = float(row[5])
-            credits = float(row[6])
-            reduction_pct = (credits * 1000 / total_co2e_kg * 100) if total_co2e_kg > 0 else 0
-            reduction_pct = round(reduction_pct, 2)
-            
-            projects.append({
-                'id': row[0],
-                'name': row[1],
-                'type': row[2],
-                'date': row[3].strftime('%Y-%m-%d') if row[3] else '',
-                'co2e': co2e_tons,
-                'credits': credits,
-                'reduction': reduction_pct,
-                'status': status  # Use calculated status
-            })
-            total_co2e_tons += co2e_tons
-            total_credits += credits
+        return render_template('dashboard.html', 
+                               username=session.get('username', 'User'),
+                               page=page,
+                               **context)
+    except Exception as e:
+        return render_template('error.html', error=str(e))
 
-        # Calculate emissions by scope
-        cur.execute("""
-            SELECT 
-                SUM(e.diesel_l * ef_diesel.co2e_per_unit) / 1000 AS scope1,
-                SUM(e.electricity_kwh * ef_electricity.co2e_per_unit) / 1000 AS scope2,
-                SUM(
-                    e.asphalt_t * ef_asphalt.co2e_per_unit +
-                    e.aggregate_t * ef_aggregate.co2e_per_unit +
-                    e.cement_t * ef_cement.co2e_per_unit +
-                    e.steel_t * ef_steel.co2e_per_unit +
-                    e.transport_tkm * ef_transport.co2e_per_unit
-                ) / 1000 AS scope3
-            FROM emissions e
-            JOIN projects p ON e.project_id = p.id
-            JOIN emission_factors ef_diesel ON ef_diesel.name = 'Diesel'
-            JOIN emission_factors ef_electricity ON ef_electricity.name = 'Electricity'
-            JOIN emission_factors ef_asphalt ON ef_asphalt.name = 'Asphalt'
-            JOIN emission_factors ef_aggregate ON ef_aggregate.name = 'Aggregate'
-            JOIN emission_factors ef_cement ON ef_cement.name = 'Cement'
-            JOIN emission_factors ef_steel ON ef_steel.name = 'Steel'
-            JOIN emission_factors ef_transport ON ef_transport.name = 'Transport'
-            WHERE p.user_id = %s
-        """, (session['user_id'],))
-        
-        scopes_row = cur.fetchone()
-        # Convert all values to float
-        scopes = {
-            'scope1': float(scopes_row[0]) if scopes_row[0] else 0.0,
-            'scope2': float(scopes_row[1]) if scopes_row[1] else 0.0,
-            'scope3': float(scopes_row[2]) if scopes_row[2] else 0.0
-        }
 
-        # Generate month labels for the last 6 months
-        months = []
-        today = datetime.now()
-        for i in range(5, -1, -1):  # Last 6 months including current
-            month_date = today - timedelta(days=30*i)
-            months.append(month_date.strftime('%b %Y'))
+@app.route('/api/dashboard')
+@read_only_route
+def api_dashboard():
+    """
+    The dashboard's aggregates and a page of projects (same query string as
+    /api/user/projects) as JSON, with a strong ETag over the user's data
+    version. A matching If-None-Match costs one primary-key lookup.
+    """
+    try:
+        page_args = project_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
 
-        # Initialize with zeros as floats
-        timeline_actual = [0.0] * 6
-        timeline_projected = [0.0] * 6
+    try:
+        conn = get_secure_db_connection()
+        cur = conn.cursor()
+        version = dashboard_cache.data_version(cur, session['user_id'])
+        etag = dashboard_cache.etag(session['user_id'], version, sorted(page_args.items()))
+        if etag in request.if_none_match:
+            response = app.response_class(status=304)
+        else:
+            _, context = dashboard_cache.get_or_load(cur, session['user_id'], version)
+            page = load_project_page(cur, session['user_id'], **page_args)
+            response = jsonify({"status": "success", "data_version": version, **context, **page})
+        cur.close()
+        conn.close()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
 
-        # Get project emissions with dates
-        cur.execute("""
-            SELECT 
-                p.id,
-                p.start_date,
-                p.end_date,
-                COALESCE(SUM(
-                    e.asphalt_t * ef_asphalt.co2e_per_unit +
-                    e.aggregate_t * ef_aggregate.co2e_per_unit +
-                    e.cement_t * ef_cement.co2e_per_unit +
-                    e.steel_t * ef_steel.co2e_per_unit +
-                    e.diesel_l * ef_diesel.co2e_per_unit +
-                    e.electricity_kwh * ef_electricity.co2e_per_unit +
-                    e.transport_tkm * ef_transport.co2e_per_unit
-                ) / 1000, 0) AS total_emissions_tons
-            FROM projects p
-            LEFT JOIN emissions e ON p.id = e.project_id
-            JOIN emission_factors ef_asphalt ON ef_asphalt.name = 'Asphalt'
-            JOIN emission_factors ef_aggregate ON ef_aggregate.name = 'Aggregate'
-            JOIN emission_factors ef_cement ON ef_cement.name = 'Cement'
-            JOIN emission_factors ef_steel ON ef_steel.name = 'Steel'
-            JOIN emission_factors ef_diesel ON ef_diesel.name = 'Diesel'
-            JOIN emission_factors ef_electricity ON ef_electricity.name = 'Electricity'
-            JOIN emission_factors ef_transport ON ef_transport.name = 'Transport'
-            WHERE p.user_id = %s
-            GROUP BY p.id, p.start_date, p.end_date
-        """, (session['user_id'],))
+    response.set_etag(etag)
+    # Private, and clients must revalidate (cheaply) before reusing it
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
-        projects_emissions = cur.fetchall()
 
-        # For each project, distribute emissions across its duration
-        for project in projects_emissions:
-            project_id, start_date, end_date, total_emissions = project
-            
-            # Convert to float to avoid Decimal issues
-            total_emissions_float = float(total_emissions) if total_emissions else 0.0
-            
-            if not start_date or not end_date or total_emissions_float == 0:
-                continue
-                
-            # Convert to datetime objects if they aren't already
-            if isinstance(start_date, str):
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-            if isinstance(end_date, str):
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-            
-            # Calculate project duration in days
-            duration_days = (end_date - start_date).days
-            if duration_days <= 0:
-                continue
-                
-            # Calculate daily emissions rate
-            daily_emissions = total_emissions_float / duration_days
-            
-            # For each month in our timeline, calculate how many project days fall in that month
-            for i, month_label in enumerate(months):
-                # Parse month label to get month and year
-                month_str, year_str = month_label.split()
-                month_num = list(calendar.month_abbr).index(month_str[:3])
-                year_num = int(year_str)
-                
-                # Get first and last day of the month
-                _, month_days = calendar.monthrange(year_num, month_num)
-                month_start = date(year_num, month_num, 1)
-                month_end = date(year_num, month_num, month_days)
-                
-                # Calculate overlap between project dates and this month
-                overlap_start = max(start_date, month_start)
-                overlap_end = min(end_date, month_end)
-                
-                if overlap_start <= overlap_end:
-                    overlap_days = (overlap_end - overlap_start).days + 1
-                    month_emissions = daily_emissions * overlap_days
-                    timeline_actual[i] += month_emissions  # Now both are floats
-
-        # Calculate projected values (90% of actual)
-        timeline_projected = [val * 0.9 for val in timeline_actual]
-
-        # Create timeline object
-        timeline = {
-            'labels': months,
-            'actual': timeline_actual,
-            'projected': timeline_projected
-        }
-        
+@app.route('/api/dashboard/timeline')
+@read_only_route
+def dashboard_timeline():
+    """
+    The user's emissions (tons CO2e) spread over calendar periods.
+    ?period=week|month|quarter|year, ?from= and ?to= as YYYY-MM-DD
+    (default: the last 6 months).
+    """
+    period = request.args.get('period', 'month')
+    try:
+        today = date.today()
+        last = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if 'to' in request.args else today
+        first = (datetime.strptime(request.args['from'], '%Y-%m-%d').date() if 'from' in request.args
+                 else np.datetime64(last, 'M') - 5)
+        if np.datetime64(first, 'D') > np.datetime64(last, 'D'):
+            raise ValueError("from must not be after to")
+        period_edges(first, last, period)  # validates the period
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    try:
+        conn = get_secure_db_connection()
+        cur = conn.cursor()
+        execute_hot_query(cur, 'dashboard_timeline', (session['user_id'],))
+        rows = [row[1:] for row in cur.fetchall()]
         cur.close()
         conn.close()
-        
-        return render_template('dashboard.html', 
-                               projects=projects, 
-                               total_co2e=total_co2e_tons,
-                               total_credits=total_credits,
-                               username=session.get('username', 'User'),
-                               scopes=scopes,
-                               timeline=timeline)
+        timeline = emissions_timeline(rows, period, first, last)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
-        return render_template('error.html', error=str(e))
+        return jsonify({"status": "error", "message": str(e)}), 500
+    return jsonify({"status": "success", "period": period, **timeline})
 
 
 def update_project_statuses():
@@ -1019,8 +3039,8 @@ def save_project():
              data.get('renewable_pct', 0) or 0)
         )
         
-        # Calculate emissions for credits
-        result = calculate_emissions_data(data)
+        # Calculate emissions for credits with the factors in effect at the start date
+        result = calculate_emissions_data(data, emission_factor_cache.on(start_date))
         
         # Save carbon credits
         cur.execute(
@@ -1066,39 +3086,21 @@ def save_project():
 
 
 @app.route('/project/<project_id>')
+@read_only_route
+# One statement, which also carries the factor version; a fresh pooled
+# connection PREPAREs it first
+@query_budget(2)
 def project_detail(project_id):
     try:
         conn = get_secure_db_connection()
         cur = conn.cursor()
         
-        # Get project details with emissions
-        cur.execute("""
-            SELECT p.id, p.name, p.type, p.location, p.start_date, p.end_date,
-                COALESCE(SUM(
-                    e.asphalt_t * ef_asphalt.co2e_per_unit +
-                    e.aggregate_t * ef_aggregate.co2e_per_unit +
-                    e.cement_t * ef_cement.co2e_per_unit +
-                    e.steel_t * ef_steel.co2e_per_unit +
-                    e.diesel_l * ef_diesel.co2e_per_unit +
-                    e.electricity_kwh * ef_electricity.co2e_per_unit +
-                    e.transport_tkm * ef_transport.co2e_per_unit
-                ) / 1000, 0) AS total_co2e_tons,
-                COALESCE(SUM(cc.credits_earned), 0) AS credits
-            FROM projects p
-            LEFT JOIN emissions e ON p.id = e.project_id
-            LEFT JOIN carbon_credits cc ON p.id = cc.project_id
-            JOIN emission_factors ef_asphalt ON ef_asphalt.name = 'Asphalt'
-            JOIN emission_factors ef_aggregate ON ef_aggregate.name = 'Aggregate'
-            JOIN emission_factors ef_cement ON ef_cement.name = 'Cement'
-            JOIN emission_factors ef_steel ON ef_steel.name = 'Steel'
-            JOIN emission_factors ef_diesel ON ef_diesel.name = 'Diesel'
-            JOIN emission_factors ef_electricity ON ef_electricity.name = 'Electricity'
-            JOIN emission_factors ef_transport ON ef_transport.name = 'Transport'
-            WHERE p.id = %s AND p.user_id = %s
-            GROUP BY p.id, p.name, p.type, p.location, p.start_date, p.end_date
-        """, (project_id, session['user_id']))
+        # Project, totals, breakdown and recommendations in one round-trip
+        execute_hot_query(cur, 'project_detail', (project_id, session['user_id']))
         
         project = cur.fetchone()
+        cur.close()
+        conn.close()
         if not project:
             return redirect(url_for('dashboard'))
 
@@ -1107,9 +3109,8 @@ def project_detail(project_id):
         end_date = project[5]    # index 5 is end_date
         status = calculate_project_status(start_date, end_date) if start_date and end_date else "Unknown"
 
-        # Convert to float
-        total_co2e_tons = float(project[6]) if project[6] else 0.0
-        credits = float(project[7]) if project[7] else 0.0
+        total_co2e_tons = project[6]
+        credits = project[7]
 
         # Calculate and round reduction percentage
         total_co2e_kg = total_co2e_tons * 1000
@@ -1129,121 +3130,28 @@ def project_detail(project_id):
             'status': status  # Use calculated status
         }
         
-        # Get breakdown data
-        cur.execute("""
-            SELECT 
-                SUM(e.asphalt_t * ef_asphalt.co2e_per_unit) / 1000 AS asphalt,
-                SUM(e.aggregate_t * ef_aggregate.co2e_per_unit) / 1000 AS aggregate,
-                SUM(e.cement_t * ef_cement.co2e_per_unit) / 1000 AS cement,
-                SUM(e.steel_t * ef_steel.co2e_per_unit) / 1000 AS steel,
-                SUM(e.diesel_l * ef_diesel.co2e_per_unit) / 1000 AS diesel,
-                SUM(e.electricity_kwh * ef_electricity.co2e_per_unit) / 1000 AS electricity,
-                SUM(e.transport_tkm * ef_transport.co2e_per_unit) / 1000 AS transport
-            FROM emissions e
-            JOIN emission_factors ef_asphalt ON ef_asphalt.name = 'Asphalt'
-            JOIN emission_factors ef_aggregate ON ef_aggregate.name = 'Aggregate'
-            JOIN emission_factors ef_cement ON ef_cement.name = 'Cement'
-            JOIN emission_factors ef_steel ON ef_steel.name = 'Steel'
-            JOIN emission_factors ef_diesel ON ef_diesel.name = 'Diesel'
-            JOIN emission_factors ef_electricity ON ef_electricity.name = 'Electricity'
-            JOIN emission_factors ef_transport ON ef_transport.name = 'Transport'
-            WHERE e.project_id = %s
-        """, (project_id,))
-        
-        breakdown_row = cur.fetchone()
-        if breakdown_row:
-            values = [float(val) if val is not None else 0.0 for val in breakdown_row]
-        else:
-            values = [0.0] * 7
+        # Per-factor breakdown (tons CO2e) from the rollup row
+        values = list(project[8:15])
         breakdown = {
             "labels": ["Asphalt", "Aggregate", "Cement", "Steel", "Diesel", "Electricity", "Transport"],
-            "values": values  # Use converted values
+            "values": values
         }
 
-        cur.execute("""
-            SELECT 
-                'Materials' AS category,
-                SUM(
-                    e.asphalt_t * ef_asphalt.co2e_per_unit +
-                    e.aggregate_t * ef_aggregate.co2e_per_unit +
-                    e.cement_t * ef_cement.co2e_per_unit +
-                    e.steel_t * ef_steel.co2e_per_unit
-                ) / 1000 AS emissions
-            FROM emissions e
-            JOIN emission_factors ef_asphalt ON ef_asphalt.name = 'Asphalt'
-            JOIN emission_factors ef_aggregate ON ef_aggregate.name = 'Aggregate'
-            JOIN emission_factors ef_cement ON ef_cement.name = 'Cement'
-            JOIN emission_factors ef_steel ON ef_steel.name = 'Steel'
-            WHERE e.project_id = %s
-            
-            UNION ALL
-            
-            SELECT 
-                'Equipment' AS category,
-                SUM(e.diesel_l * ef_diesel.co2e_per_unit) / 1000
-            FROM emissions e
-            JOIN emission_factors ef_diesel ON ef_diesel.name = 'Diesel'
-            WHERE e.project_id = %s
-            
-            UNION ALL
-            
-            SELECT 
-                'Electricity' AS category,
-                SUM(e.electricity_kwh * ef_electricity.co2e_per_unit) / 1000
-            FROM emissions e
-            JOIN emission_factors ef_electricity ON ef_electricity.name = 'Electricity'
-            WHERE e.project_id = %s
-            
-            UNION ALL
-            
-            SELECT 
-                'Transport' AS category,
-                SUM(e.transport_tkm * ef_transport.co2e_per_unit) / 1000
-            FROM emissions e
-            JOIN emission_factors ef_transport ON ef_transport.name = 'Transport'
-            WHERE e.project_id = %s
-        """, (project_id, project_id, project_id, project_id))
-        
-        categories_data = cur.fetchall()
+        # Category totals come from the same rollup row
         categories = {
-            'labels': [row[0] for row in categories_data],
-            'values': [float(row[1]) if row[1] else 0.0 for row in categories_data]
+            'labels': ['Materials', 'Equipment', 'Electricity', 'Transport'],
+            'values': [project[15], values[4], values[5], values[6]]
         }
+        emission_factor_cache.observe(project[17])
+        uncertainty = emission_uncertainty.bands(project_id, values)
 
-        # Get recommendations from database
-        try:
-            # Try to get all columns if they exist
-            cur.execute("SELECT title, description, impact, cost, category FROM recommendations WHERE project_id = %s ORDER BY display_order", (project_id,))
-        except psycopg2.Error as e:
-            # If is_active column doesn't exist, get all recommendations
-            cur.execute("SELECT title, description, impact, cost FROM recommendations WHERE project_id = %s LIMIT 2", (project_id,))
-
-        recommendations = []
-        for row in cur.fetchall():
-            if len(row) == 5:  # With category
-                recommendations.append({
-                    'title': row[0],
-                    'description': row[1],
-                    'impact': row[2],
-                    'cost': float(row[3]) if row[3] else 0.0,
-                    'category': row[4] or 'General'
-                })
-            else:  # Without category
-                recommendations.append({
-                    'title': row[0],
-                    'description': row[1],
-                    'impact': row[2],
-                    'cost': float(row[3]) if row[3] else 0.0,
-                    'category': 'General'
-                })
-                
-                cur.close()
-                conn.close()
+        recommendations = project[16]
         
         return render_template('project_detail.html', 
                             project=project_data, 
                             breakdown=breakdown,
                             categories=categories,
+                            uncertainty=uncertainty,
                             recommendations=recommendations,  # Pass recommendations to template
                             username=session.get('username', 'User'))
     except Exception as e:
@@ -1258,7 +3166,7 @@ def new_carbon_credit():
     # Get user's projects
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute("SELECT id, name FROM projects WHERE user_id = %s", (session['user_id'],))
+    execute_hot_query(cur, 'user_project_names', (session['user_id'],))
     projects = [{'id': row[0], 'name': row[1]} for row in cur.fetchall()]
     cur.close()
     conn.close()
@@ -1409,6 +3317,7 @@ def delete_carbon_credit(credit_id):
 # REPORTING ROUTES
 # ====================================
 @app.route('/reports')
+@read_only_route
 def reports():
     if 'user_id' not in session:
         return redirect(url_for('login'))
@@ -1417,13 +3326,7 @@ def reports():
     cur = conn.cursor()
     
     # Get user's reports with project names
-    cur.execute("""
-        SELECT r.id, r.name, r.created_at, r.file_size, p.name as project_name
-        FROM reports r
-        LEFT JOIN projects p ON r.project_id = p.id
-        WHERE r.user_id = %s
-        ORDER BY r.created_at DESC
-    """, (session['user_id'],))
+    execute_hot_query(cur, 'user_reports', (session['user_id'],))
     
     reports = []
     for row in cur.fetchall():
@@ -1438,7 +3341,7 @@ def reports():
         })
     
     # Get projects for report generation
-    cur.execute("SELECT id, name FROM projects WHERE user_id = %s", (session['user_id'],))
+    execute_hot_query(cur, 'user_project_names', (session['user_id'],))
     projects = [{'id': row[0], 'name': row[1]} for row in cur.fetchall()]
     
     cur.close()
@@ -1454,6 +3357,7 @@ def reports():
 # FILE UPLOAD ROUTE
 # ====================================
 @app.route('/upload', methods=['POST'])
+@db_budget(30000, shed_when_slow=True)
 def upload_file():
     if 'file' not in request.files:
         return jsonify({"status": "error", "message": "No file part"})
@@ -1495,44 +3399,45 @@ def upload_file():
             if not all(col in df.columns for col in required_cols):
                 return jsonify({"status": "error", "message": "CSV missing required columns"})
             
+            # Optional start_date column; credits are priced with the factors in effect then
+            start_date = df.iloc[0]['start_date'] if 'start_date' in df.columns else None
+            try:
+                start_date = None if pd.isna(start_date) else parse_factor_date(str(start_date).strip())
+            except ValueError:
+                return jsonify({"status": "error", "message": "start_date must be YYYY-MM-DD"})
+            
             conn = get_db_connection()
             cur = conn.cursor()
             
             # Create project
             cur.execute(
-                "INSERT INTO projects (name, type, user_id, status) VALUES (%s, %s, %s, 'Active') RETURNING id",
+                "INSERT INTO projects (name, type, start_date, user_id, status) VALUES (%s, %s, %s, %s, 'Active') RETURNING id",
                 (df.iloc[0]['project_name'], 
                  df.iloc[0]['project_type'], 
+                 start_date,
                  session['user_id'])
             )
             project_id = cur.fetchone()[0]
             
-            # Process each row
-            for _, row in df.iterrows():
-                cur.execute(
-                    """INSERT INTO emissions (project_id, asphalt_t, aggregate_t, cement_t, steel_t, 
-                    diesel_l, electricity_kwh, transport_tkm, water_use, waste_t, recycled_pct, renewable_pct)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-                    (project_id,
-                     row.get('asphalt_t', 0),
-                     row.get('aggregate_t', 0),
-                     row.get('cement_t', 0),
-                     row.get('steel_t', 0),
-                     row.get('diesel_l', 0),
-                     row.get('electricity_kwh', 0),
-                     row.get('transport_tkm', 0),
-                     row.get('water_use', 0),
-                     row.get('waste_t', 0),
-                     row.get('recycled_pct', 0),
-                     row.get('renewable_pct', 0))
-                )
+            # Clean every row once and insert them in a single statement
+            records = emission_input_records(df)
+            batch = calculate_emissions_batch(records, emission_factor_cache.on(start_date))
+            psycopg2.extras.execute_values(
+                cur,
+                """INSERT INTO emissions (project_id, asphalt_t, aggregate_t, cement_t, steel_t, 
+                diesel_l, electricity_kwh, transport_tkm, water_use, waste_t, recycled_pct, renewable_pct)
+                VALUES %s""",
+                [(project_id,) + values for values in records.tolist()],
+                page_size=500
+            )
             
-            # Calculate and save credits
-            first_row = df.iloc[0].to_dict()
-            result = calculate_emissions_data(first_row)
+            # Calculate and save credits for the whole file
+            result = emission_data_from_totals(batch['total_kg'].sum(), batch['materials_kg'].sum(),
+                                               batch['fuel_kg'].sum(), batch['electricity_kg'].sum(),
+                                               batch['transport_kg'].sum(), batch['reduction_kg'].sum())
             cur.execute(
-                "INSERT INTO carbon_credits (project_id, credits_earned, credit_value) VALUES (%s, %s, %s)",
-                (project_id, result['credits'], result['credits'] * 1000))
+                "INSERT INTO carbon_credits (project_id, user_id, credits_earned, credit_value) VALUES (%s, %s, %s, %s)",
+                (project_id, session['user_id'], result['credits'], result['credits'] * 1000))
             
             conn.commit()
             cur.close()
@@ -1587,25 +3492,14 @@ def process_payment():
 # ====================================
 
 @app.route('/marketplace/listings')
+@read_only_route
 def marketplace_listings():
     try:
         conn = get_secure_db_connection()
         cur = conn.cursor()
         
         # Get active marketplace listings with project info
-        cur.execute("""
-            SELECT ml.id, ml.quantity_available, ml.price_per_credit, ml.listed_at,
-                   p.name as project_name, p.type as project_type, p.location,
-                   u.username as seller_name,
-                   cc.credits_earned, cc.credits_used,
-                   (cc.credits_earned - COALESCE(cc.credits_used, 0)) as total_available
-            FROM marketplace_listings ml
-            JOIN carbon_credits cc ON ml.credit_id = cc.id
-            JOIN projects p ON cc.project_id = p.id
-            JOIN users u ON ml.seller_id = u.id
-            WHERE ml.status = 'active' AND ml.quantity_available > 0
-            ORDER BY ml.listed_at DESC
-        """)
+        execute_hot_query(cur, 'marketplace_active_listings')
         
         listings = []
         for row in cur.fetchall():
@@ -1718,6 +3612,7 @@ def list_credits():
 
 
 @app.route('/marketplace/buy/<int:listing_id>', methods=['POST'])
+@db_budget(3000, lock_timeout_ms=1000)
 def buy_credits(listing_id):
     if 'user_id' not in session:
         return jsonify({"status": "error", "message": "Unauthorized"}), 401
@@ -1931,6 +3826,42 @@ def delete_project(project_id):
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+CALCULATION_CACHE_SIZE = int(os.getenv('CALCULATION_CACHE_SIZE', '2048'))
+CALCULATION_CACHE_TTL = float(os.getenv('CALCULATION_CACHE_TTL', '600'))  # seconds
+# Inputs calculate_emissions_data() actually reads
+CALCULATION_INPUT_FIELDS = ('asphalt_t', 'aggregate_t', 'cement_t', 'steel_t', 'diesel_l',
+                            'electricity_kwh', 'transport_tkm', 'recycled_pct', 'renewable_pct')
+
+calculation_cache = LRUCache(CALCULATION_CACHE_SIZE, ttl=CALCULATION_CACHE_TTL)
+
+
+def calculation_cache_key(data, on_date=None):
+    """
+    (factor version, date, input vector) for a /calculate payload, or None if
+    it cannot be keyed. Strings are read as calculate_emissions_data() reads
+    them, so "5", "5.0" and " 5" share an entry; blanks normalise to 0.
+    """
+    if not isinstance(data, dict):
+        return None
+    values = tuple(_text_input_float(value) if isinstance(value, str) else 0 if value is None else value
+                   for value in map(data.get, CALCULATION_INPUT_FIELDS))
+    key = (emission_factor_cache.version(), on_date, values)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def parse_factor_date(value):
+    """Optional YYYY-MM-DD selecting the emission factors in effect that day"""
+    if value in ('', None):
+        return None
+    if not isinstance(value, str):
+        raise ValueError(value)
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
 @app.route('/calculate', methods=['POST'])
 def calculate():
     # Get data from JSON
@@ -1944,8 +3875,19 @@ def calculate():
         if field in data and data[field] == '':
             data[field] = 0
 
-    # Calculate emissions
-    result = calculate_emissions_data(data)
+    # Factors in effect on the optional "date"; today's otherwise
+    try:
+        on_date = parse_factor_date(data.get('date'))
+    except ValueError:
+        return jsonify({"status": "error", "message": "date must be YYYY-MM-DD"}), 400
+
+    # Calculate emissions, memoised on the inputs and factor version
+    key = calculation_cache_key(data, on_date)
+    result = calculation_cache.get(key) if key else None
+    if result is None:
+        result = calculate_emissions_data(data, emission_factor_cache.on(on_date) if on_date else None)
+        if key:
+            calculation_cache.put(key, result)
     
     return jsonify({
         "status": "success",
@@ -1953,6 +3895,167 @@ def calculate():
     })
 
 
+@app.route('/calculate/batch', methods=['POST'])
+def calculate_batch():
+    """
+    Evaluates many scenarios in one request. Accepts a list of /calculate
+    payloads (bare, or as {"scenarios": [...]}) or a columnar
+    {"columns": {field: [values]}} body; columnar requests get columnar results.
+    """
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and 'columns' in data:
+        columns = data['columns']
+        if not isinstance(columns, dict) or not all(isinstance(v, list) for v in columns.values()):
+            return jsonify({"status": "error", "message": "columns must map field names to lists"}), 400
+        if len({len(v) for v in columns.values()}) > 1:
+            return jsonify({"status": "error", "message": "All columns must have the same length"}), 400
+        size = len(next(iter(columns.values()), []))
+        dates = columns.get('date')
+        columnar = True
+    else:
+        scenarios = data.get('scenarios') if isinstance(data, dict) else data
+        if not isinstance(scenarios, list) or not all(isinstance(row, dict) for row in scenarios):
+            return jsonify({"status": "error", "message": "Expected a list of scenarios"}), 400
+        columns = {field: [row.get(field) for row in scenarios] for field in EMISSION_INPUT_FIELDS}
+        dates = [row.get('date') for row in scenarios]
+        size = len(scenarios)
+        columnar = False
+
+    if size > CALCULATE_BATCH_MAX_ROWS:
+        return jsonify({
+            "status": "error",
+            "message": f"Batch of {size} scenarios exceeds the limit of {CALCULATE_BATCH_MAX_ROWS}"
+        }), 413
+
+    # Rows with a "date" use the factors in effect that day, the rest today's
+    factors = None
+    if dates and any(dates):
+        dates = pd.Series(dates, dtype=object)
+        parsed = pd.to_datetime(dates, format='%Y-%m-%d', errors='coerce')
+        malformed = parsed.isna() & ~dates.isin(['', None])
+        if malformed.any():
+            return jsonify({
+                "status": "error",
+                "message": f"date must be YYYY-MM-DD (row {int(malformed.idxmax())})"
+            }), 400
+        factors = emission_factor_cache.for_dates(
+            parsed.fillna(pd.Timestamp(date.today())).to_numpy(dtype='M8[D]'))
+    results = emission_results_from_batch(calculate_emissions_batch(columns, factors))
+    if not columnar:
+        return jsonify({"status": "success", "count": size, "results": results})
+
+    return jsonify({
+        "status": "success",
+        "count": size,
+        "columns": {
+            "total_co2e": [r['total_co2e'] for r in results],
+            "breakdown": {name: [r['breakdown'][name] for r in results]
+                          for name in ("Materials", "Equipment Fuel", "Electricity", "Transport")},
+            "credits": [r['credits'] for r in results],
+            "reduction_pct": [r['reduction_pct'] for r in results]
+        }
+    })
+
+
+def parse_sweep_axis(name, default, upper):
+    """Parses a "start,stop,steps" query argument into a linspace"""
+    raw = request.args.get(name, default)
+    try:
+        start, stop, steps = raw.split(',')
+        start, stop, steps = float(start), float(stop), int(steps)
+    except ValueError:
+        raise ValueError(f"{name} must be start,stop,steps")
+    if not (0 <= start <= upper and 0 <= stop <= upper):
+        raise ValueError(f"{name} must lie between 0 and {upper:g}")
+    if not 1 <= steps <= SWEEP_MAX_STEPS:
+        raise ValueError(f"{name} takes between 1 and {SWEEP_MAX_STEPS} steps")
+    return np.linspace(start, stop, steps)
+
+
+@app.route('/api/project/<project_id>/sensitivity')
+@read_only_route
+def project_sensitivity(project_id):
+    """
+    Credits / reduction surface over recycled_pct x renewable_pct, optionally
+    also over the substituted share of one material (?substitute=cement_t&substitution=0,0.5,6).
+    """
+    try:
+        recycled = parse_sweep_axis('recycled_pct', '0,100,101', 100)
+        renewable = parse_sweep_axis('renewable_pct', '0,100,101', 100)
+        substitute = request.args.get('substitute')
+        substitution = None
+        if substitute is not None:
+            if substitute not in SWEEP_MATERIALS:
+                raise ValueError(f"substitute must be one of {', '.join(SWEEP_MATERIALS)}")
+            substitution = parse_sweep_axis('substitution', '0,1,11', 1)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    try:
+        conn = get_secure_db_connection()
+        cur = conn.cursor()
+        execute_hot_query(cur, 'project_quantities', (project_id, session['user_id']))
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+    if not row:
+        return jsonify({"status": "error", "message": "Project not found"}), 404
+
+    quantities = dict(zip(EMISSION_INPUT_FIELDS[:7], map(float, row[1:8])))
+    grid = emissions_sensitivity_grid(quantities, emission_factor_cache.on(row[8]), recycled, renewable,
+                                      substitute, substitution)
+    if substitute is None:
+        # Without a substitution axis the surfaces are 2-D
+        grid = {key: values[0] for key, values in grid.items()}
+
+    axes = {"recycled_pct": recycled.tolist(), "renewable_pct": renewable.tolist()}
+    if substitute is not None:
+        axes["substitution"] = {"material": substitute, "ratio": substitution.tolist()}
+    return jsonify({
+        "status": "success",
+        "project_id": row[0],
+        "axes": axes,
+        **{key: np.round(values, 2).tolist() for key, values in grid.items()}
+    })
+
+
+@app.route('/api/project/<project_id>/uncertainty')
+@read_only_route
+def project_uncertainty(project_id):
+    """Monte Carlo percentile bands (tons CO2e) per category for a project"""
+    try:
+        draws = int(request.args.get('draws', UNCERTAINTY_DRAWS))
+    except ValueError:
+        return jsonify({"status": "error", "message": "draws must be an integer"}), 400
+    if not 1000 <= draws <= UNCERTAINTY_MAX_DRAWS:
+        return jsonify({"status": "error", "message": f"draws must be between 1000 and {UNCERTAINTY_MAX_DRAWS}"}), 400
+
+    try:
+        conn = get_secure_db_connection()
+        cur = conn.cursor()
+        execute_hot_query(cur, 'project_totals', (project_id, session['user_id']))
+        if not cur.fetchone():
+            cur.close()
+            conn.close()
+            return jsonify({"status": "error", "message": "Project not found"}), 404
+        execute_hot_query(cur, 'project_breakdown', (project_id,))
+        row = cur.fetchone()
+        cur.close()
+        conn.close()
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    contributions = [float(v or 0) for v in row[:7]] if row else [0.0] * 7
+    return jsonify({
+        "status": "success",
+        "draws": draws,
+        "percentiles": list(UNCERTAINTY_PERCENTILES),
+        "bands": emission_uncertainty.bands(project_id, contributions, draws)
+    })
+
+
 # ====================================
 # CARBON CREDIT ROUTES
 # ====================================
@@ -1962,19 +4065,7 @@ def carbon():
     cur = conn.cursor()
     
     # Get projects with their credit summaries
-    cur.execute("""
-        SELECT p.id AS project_id, p.name AS project_name,
-               COALESCE(SUM(cc.credits_earned), 0) AS total_credits,
-               COALESCE(SUM(cc.credits_used), 0) AS used_credits,
-               COALESCE(SUM(cc.listed_quantity), 0) AS listed_credits,
-               COALESCE(SUM(cc.credits_earned) - COALESCE(SUM(cc.credits_used), 0) - COALESCE(SUM(cc.listed_quantity), 0), 0) AS available_credits,
-               MAX(cc.issued_at) AS last_issued
-        FROM projects p
-        LEFT JOIN carbon_credits cc ON p.id = cc.project_id
-        WHERE p.user_id = %s
-        GROUP BY p.id, p.name
-        ORDER BY last_issued DESC NULLS LAST
-    """, (session['user_id'],))
+    execute_hot_query(cur, 'carbon_project_credits', (session['user_id'],))
     
     projects = []
     total_all_credits = 0
@@ -1998,14 +4089,7 @@ def carbon():
     
     # Get detailed issuances for each project
     for project in projects:
-        cur.execute("""
-            SELECT id, credits_earned, credits_used, listed_quantity, 
-                   (credits_earned - COALESCE(credits_used, 0) - listed_quantity) as available_quantity,
-                   credit_value, issued_at, status
-            FROM carbon_credits
-            WHERE project_id = %s
-            ORDER BY issued_at DESC
-        """, (project['id'],))
+        execute_hot_query(cur, 'project_credit_issuances', (project['id'],))
         
         issuances = []
         for row in cur.fetchall():
@@ -2022,19 +4106,7 @@ def carbon():
         project['issuances'] = issuances
     
     # Get marketplace credits
-    cur.execute("""
-        SELECT ml.id, ml.quantity_available, ml.price_per_credit, ml.listed_at, ml.status,
-               p.name as project_name, p.type as project_type, p.location,
-               u.username as seller_name,
-               cc.credits_earned, cc.credits_used, cc.listed_quantity
-        FROM marketplace_listings ml
-        JOIN carbon_credits cc ON ml.credit_id = cc.id
-        JOIN projects p ON cc.project_id = p.id
-        JOIN users u ON ml.seller_id = u.id
-        WHERE ml.status = 'active' AND ml.quantity_available > 0
-        AND ml.seller_id != %s
-        ORDER BY ml.listed_at DESC
-    """, (session['user_id'],))
+    execute_hot_query(cur, 'marketplace_other_listings', (session['user_id'],))
     
     marketplace_credits = []
     for row in cur.fetchall():
@@ -2069,6 +4141,7 @@ def carbon():
 # ====================================
 
 @app.route('/generate-report', methods=['POST'])
+@db_budget(30000, shed_when_slow=True)
 def generate_report():
     if 'user_id' not in session:
         return redirect(url_for('login'))
@@ -2086,7 +4159,7 @@ def generate_report():
     if report_type == "Annual Sustainability Report":
         conn = get_db_connection()
         cur = conn.cursor()
-        cur.execute("SELECT id, name FROM projects WHERE user_id = %s", (session['user_id'],))
+        execute_hot_query(cur, 'user_project_names', (session['user_id'],))
         projects = cur.fetchall()
         project_ids = [row[0] for row in projects]
         project_names = [row[1] for row in projects]
@@ -2140,64 +4213,27 @@ def generate_report():
     total_co2e = 0
     total_credits = 0
     
+    # Project details and rollup totals for every selected project in one query
+    execute_hot_query(cur, 'report_project_totals', ([int(pid) for pid in project_ids],))
+    rows_by_id = {row[0]: row for row in cur.fetchall()}
+    
     for pid in project_ids:
-        # Get project details
-        cur.execute("SELECT name, type, start_date, end_date FROM projects WHERE id = %s", (pid,))
-        project = cur.fetchone()
-        
-        # Get emissions data
-        cur.execute("""
-            SELECT 
-                SUM(asphalt_t) AS asphalt,
-                SUM(aggregate_t) AS aggregate,
-                SUM(cement_t) AS cement,
-                SUM(steel_t) AS steel,
-                SUM(diesel_l) AS diesel,
-                SUM(electricity_kwh) AS electricity,
-                SUM(transport_tkm) AS transport
-            FROM emissions
-            WHERE project_id = %s
-        """, (pid,))
-        materials = cur.fetchone() or [0]*7
-        
-        # Calculate CO2e
-        cur.execute("""
-            SELECT 
-                COALESCE(SUM(
-                    e.asphalt_t * ef_asphalt.co2e_per_unit +
-                    e.aggregate_t * ef_aggregate.co2e_per_unit +
-                    e.cement_t * ef_cement.co2e_per_unit +
-                    e.steel_t * ef_steel.co2e_per_unit +
-                    e.diesel_l * ef_diesel.co2e_per_unit +
-                    e.electricity_kwh * ef_electricity.co2e_per_unit +
-                    e.transport_tkm * ef_transport.co2e_per_unit
-                ) / 1000, 0) AS total_co2e
-            FROM emissions e
-            JOIN emission_factors ef_asphalt ON ef_asphalt.name = 'Asphalt'
-            JOIN emission_factors ef_aggregate ON ef_aggregate.name = 'Aggregate'
-            JOIN emission_factors ef_cement ON ef_cement.name = 'Cement'
-            JOIN emission_factors ef_steel ON ef_steel.name = 'Steel'
-            JOIN emission_factors ef_diesel ON ef_diesel.name = 'Diesel'
-            JOIN emission_factors ef_electricity ON ef_electricity.name = 'Electricity'
-            JOIN emission_factors ef_transport ON ef_transport.name = 'Transport'
-            WHERE project_id = %s
-        """, (pid,))
-        project_co2e = cur.fetchone()[0] or 0
-        
-        # Get credits
-        cur.execute("SELECT COALESCE(SUM(credits_earned), 0) FROM carbon_credits WHERE project_id = %s", (pid,))
-        credits = cur.fetchone()[0] or 0
+        row = rows_by_id.get(int(pid))
+        if not row:
+            continue
+        project_co2e = row[12]
+        credits = row[13]
         
         total_co2e += float(project_co2e)
         total_credits += float(credits)
         
         report_data.append({
             'id': pid,
-            'name': project[0],
-            'type': project[1],
-            'start_date': project[2].strftime('%Y-%m-%d') if project[2] else 'N/A',
-            'end_date': project[3].strftime('%Y-%m-%d') if project[3] else 'N/A',
-            'materials': [float(m) if m is not None else 0 for m in materials],  # Convert Decimals to floats
+            'name': row[1],
+            'type': row[2],
+            'start_date': row[3].strftime('%Y-%m-%d') if row[3] else 'N/A',
+            'end_date': row[4].strftime('%Y-%m-%d') if row[4] else 'N/A',
+            'materials': [float(m) if m is not None else 0 for m in row[5:12]],  # Convert Decimals to floats
             'co2e': float(project_co2e),
             'credits': float(credits)
         })
@@ -2374,12 +4410,7 @@ def generate_report():
             credit_rows = [credit_headers]
             
             for project in report_data:
-                cur.execute("""
-                    SELECT issued_at, credits_earned, credits_used 
-                    FROM carbon_credits 
-                    WHERE project_id = %s
-                    ORDER BY issued_at
-                """, (project['id'],))
+                execute_hot_query(cur, 'project_credit_history', (project['id'],))
                 transactions = cur.fetchall()
                 
                 balance = 0
@@ -2470,9 +4501,9 @@ def generate_report():
                 material_headers = ["Material/Energy Source", "Quantity Used", "Unit", "CO2e Factor", "Total CO2e (kg)"]
                 material_rows = [material_headers]
                 
-                # Get emission factors from database
-                cur.execute("SELECT name, co2e_per_unit FROM emission_factors")
-                db_factors = dict(cur.fetchall())
+                # Emission factors in effect on the project's start date
+                project_start = project_info['start_date']
+                db_factors = emission_factor_cache.on(None if project_start == 'N/A' else parse_factor_date(project_start))
                 
                 # Define emission factors with proper units
                 emission_factors = {
@@ -2830,6 +4861,7 @@ def delete_report(report_id):
 
 
 @app.route('/download/project/<project_id>')
+@db_budget(15000, shed_when_slow=True)
 def download_project_report(project_id):
     try:
         if 'user_id' not in session:
@@ -2839,31 +4871,7 @@ def download_project_report(project_id):
         cur = conn.cursor()
         
         # Get project details with emissions
-        cur.execute("""
-            SELECT p.id, p.name, p.type, p.location, p.start_date, p.end_date,
-                COALESCE(SUM(
-                    e.asphalt_t * ef_asphalt.co2e_per_unit +
-                    e.aggregate_t * ef_aggregate.co2e_per_unit +
-                    e.cement_t * ef_cement.co2e_per_unit +
-                    e.steel_t * ef_steel.co2e_per_unit +
-                    e.diesel_l * ef_diesel.co2e_per_unit +
-                    e.electricity_kwh * ef_electricity.co2e_per_unit +
-                    e.transport_tkm * ef_transport.co2e_per_unit
-                ) / 1000, 0) AS total_co2e_tons,
-                COALESCE(SUM(cc.credits_earned), 0) AS credits
-            FROM projects p
-            LEFT JOIN emissions e ON p.id = e.project_id
-            LEFT JOIN carbon_credits cc ON p.id = cc.project_id
-            JOIN emission_factors ef_asphalt ON ef_asphalt.name = 'Asphalt'
-            JOIN emission_factors ef_aggregate ON ef_aggregate.name = 'Aggregate'
-            JOIN emission_factors ef_cement ON ef_cement.name = 'Cement'
-            JOIN emission_factors ef_steel ON ef_steel.name = 'Steel'
-            JOIN emission_factors ef_diesel ON ef_diesel.name = 'Diesel'
-            JOIN emission_factors ef_electricity ON ef_electricity.name = 'Electricity'
-            JOIN emission_factors ef_transport ON ef_transport.name = 'Transport'
-            WHERE p.id = %s AND p.user_id = %s
-            GROUP BY p.id, p.name, p.type, p.location, p.start_date, p.end_date
-        """, (project_id, session['user_id']))
+        execute_hot_query(cur, 'project_totals', (project_id, session['user_id']))
         
         project = cur.fetchone()
         if not project:
@@ -2900,82 +4908,21 @@ def download_project_report(project_id):
         }
         
         # Get breakdown data
-        cur.execute("""
-            SELECT 
-                SUM(e.asphalt_t * ef_asphalt.co2e_per_unit) / 1000 AS asphalt,
-                SUM(e.aggregate_t * ef_aggregate.co2e_per_unit) / 1000 AS aggregate,
-                SUM(e.cement_t * ef_cement.co2e_per_unit) / 1000 AS cement,
-                SUM(e.steel_t * ef_steel.co2e_per_unit) / 1000 AS steel,
-                SUM(e.diesel_l * ef_diesel.co2e_per_unit) / 1000 AS diesel,
-                SUM(e.electricity_kwh * ef_electricity.co2e_per_unit) / 1000 AS electricity,
-                SUM(e.transport_tkm * ef_transport.co2e_per_unit) / 1000 AS transport
-            FROM emissions e
-            JOIN emission_factors ef_asphalt ON ef_asphalt.name = 'Asphalt'
-            JOIN emission_factors ef_aggregate ON ef_aggregate.name = 'Aggregate'
-            JOIN emission_factors ef_cement ON ef_cement.name = 'Cement'
-            JOIN emission_factors ef_steel ON ef_steel.name = 'Steel'
-            JOIN emission_factors ef_diesel ON ef_diesel.name = 'Diesel'
-            JOIN emission_factors ef_electricity ON ef_electricity.name = 'Electricity'
-            JOIN emission_factors ef_transport ON ef_transport.name = 'Transport'
-            WHERE e.project_id = %s
-        """, (project_id,))
+        execute_hot_query(cur, 'project_breakdown', (project_id,))
         
         breakdown_row = cur.fetchone()
         if breakdown_row:
             values = [float(val) if val is not None else 0.0 for val in breakdown_row]
         else:
-            values = [0.0] * 7
-            
-        # Get category breakdown
-        cur.execute("""
-            SELECT 
-                'Materials' AS category,
-                SUM(
-                    e.asphalt_t * ef_asphalt.co2e_per_unit +
-                    e.aggregate_t * ef_aggregate.co2e_per_unit +
-                    e.cement_t * ef_cement.co2e_per_unit +
-                    e.steel_t * ef_steel.co2e_per_unit
-                ) / 1000 AS emissions
-            FROM emissions e
-            JOIN emission_factors ef_asphalt ON ef_asphalt.name = 'Asphalt'
-            JOIN emission_factors ef_aggregate ON ef_aggregate.name = 'Aggregate'
-            JOIN emission_factors ef_cement ON ef_cement.name = 'Cement'
-            JOIN emission_factors ef_steel ON ef_steel.name = 'Steel'
-            WHERE e.project_id = %s
-            
-            UNION ALL
-            
-            SELECT 
-                'Equipment' AS category,
-                SUM(e.diesel_l * ef_diesel.co2e_per_unit) / 1000
-            FROM emissions e
-            JOIN emission_factors ef_diesel ON ef_diesel.name = 'Diesel'
-            WHERE e.project_id = %s
+            values = [0.0] * 8
+        materials_co2e = values.pop()
             
-            UNION ALL
-            
-            SELECT 
-                'Electricity' AS category,
-                SUM(e.electricity_kwh * ef_electricity.co2e_per_unit) / 1000
-            FROM emissions e
-            JOIN emission_factors ef_electricity ON ef_electricity.name = 'Electricity'
-            WHERE e.project_id = %s
-            
-            UNION ALL
-            
-            SELECT 
-                'Transport' AS category,
-                SUM(e.transport_tkm * ef_transport.co2e_per_unit) / 1000
-            FROM emissions e
-            JOIN emission_factors ef_transport ON ef_transport.name = 'Transport'
-            WHERE e.project_id = %s
-        """, (project_id, project_id, project_id, project_id))
-        
-        categories_data = cur.fetchall()
+        # Category totals come from the same rollup row
         categories = {
-            'labels': [row[0] for row in categories_data],
-            'values': [float(row[1]) if row[1] else 0.0 for row in categories_data]
+            'labels': ['Materials', 'Equipment', 'Electricity', 'Transport'],
+            'values': [materials_co2e, values[4], values[5], values[6]]
         }
+        uncertainty = emission_uncertainty.bands(project_id, values)
         
         # Get recommendations
         cur.execute("SELECT * FROM recommendations WHERE project_id = %s", (project_id,))
@@ -3131,12 +5078,15 @@ def download_project_report(project_id):
         # Emissions breakdown by category
         elements.append(Paragraph("Emissions by Category", section_style))
         
-        category_data = [["Category", "CO2e (tons)"]] + [
-            [categories['labels'][i], f"{categories['values'][i]:.2f}"] 
-            for i in range(len(categories['labels']))
+        band_labels = categories['labels'] + ['Total']
+        band_values = categories['values'] + [total_co2e_tons]
+        category_data = [["Category", "CO2e (tons)", "90% interval (tons)"]] + [
+            [band_labels[i], f"{band_values[i]:.2f}",
+             f"{uncertainty[band_labels[i]]['p5']:.2f} - {uncertainty[band_labels[i]]['p95']:.2f}"]
+            for i in range(len(band_labels))
         ]
         
-        category_table = Table(category_data, repeatRows=1, colWidths=[4*inch, 2*inch])
+        category_table = Table(category_data, repeatRows=1, colWidths=[4*inch, 2*inch, 2.5*inch])
         category_table.setStyle(TableStyle([
             ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#2E4A62')),
             ('TEXTCOLOR', (0,0), (-1,0), colors.white),
@@ -3268,19 +5218,7 @@ def carbon_marketplace():
     cur = conn.cursor()
     
     # Get marketplace credits (same as in carbon route)
-    cur.execute("""
-        SELECT ml.id, ml.quantity_available, ml.price_per_credit, ml.listed_at, ml.status,
-               p.name as project_name, p.type as project_type, p.location,
-               u.username as seller_name,
-               cc.credits_earned, cc.credits_used, cc.listed_quantity
-        FROM marketplace_listings ml
-        JOIN carbon_credits cc ON ml.credit_id = cc.id
-        JOIN projects p ON cc.project_id = p.id
-        JOIN users u ON ml.seller_id = u.id
-        WHERE ml.status = 'active' AND ml.quantity_available > 0
-        AND ml.seller_id != %s
-        ORDER BY ml.listed_at DESC
-    """, (session['user_id'],))
+    execute_hot_query(cur, 'marketplace_other_listings', (session['user_id'],))
     
     marketplace_credits = []
     for row in cur.fetchall():
@@ -3318,16 +5256,7 @@ def my_marketplace_listings():
         cur = conn.cursor()
         
         # Get user's marketplace listings
-        cur.execute("""
-            SELECT ml.id, ml.quantity_available, ml.price_per_credit, ml.listed_at, ml.status,
-                   p.name as project_name, p.type as project_type,
-                   cc.credits_earned, COALESCE(cc.credits_used, 0) as credits_used
-            FROM marketplace_listings ml
-            JOIN carbon_credits cc ON ml.credit_id = cc.id
-            JOIN projects p ON cc.project_id = p.id
-            WHERE ml.seller_id = %s
-            ORDER BY ml.listed_at DESC
-        """, (session['user_id'],))
+        execute_hot_query(cur, 'seller_listings', (session['user_id'],))
         
         listings = []
         for row in cur.fetchall():
@@ -3352,6 +5281,7 @@ def my_marketplace_listings():
 
 
 @app.route('/api/marketplace/listings')
+@read_only_route
 def get_marketplace_listings():
     """Get all active marketplace listings excluding current user's listings"""
     try:
@@ -3361,20 +5291,7 @@ def get_marketplace_listings():
         # Get current user ID from session
         user_id = session.get('user_id')
         
-        cur.execute("""
-            SELECT ml.id, ml.quantity_available, ml.price_per_credit, ml.listed_at,
-                   p.name as project_name, p.type as project_type, p.location,
-                   u.username as seller_name,
-                   cc.credits_earned, cc.credits_used,
-                   (cc.credits_earned - COALESCE(cc.credits_used, 0)) as total_available
-            FROM marketplace_listings ml
-            JOIN carbon_credits cc ON ml.credit_id = cc.id
-            JOIN projects p ON cc.project_id = p.id
-            JOIN users u ON ml.seller_id = u.id
-            WHERE ml.status = 'active' AND ml.quantity_available > 0
-            AND ml.seller_id != %s  -- Exclude current user's listings
-            ORDER BY ml.listed_at DESC
-        """, (user_id,))
+        execute_hot_query(cur, 'api_marketplace_listings', (user_id,))
         
         listings = []
         for row in cur.fetchall():
@@ -3463,6 +5380,7 @@ def create_marketplace_listing():
 
 
 @app.route('/api/marketplace/buy/<int:listing_id>', methods=['POST'])
+@db_budget(3000, lock_timeout_ms=1000)
 def purchase_credits(listing_id):
     if 'user_id' not in session:
         return jsonify({"status": "error", "message": "Unauthorized"}), 401
@@ -3488,14 +5406,7 @@ def purchase_credits(listing_id):
         cur = conn.cursor()
         
         # Get the listing details
-        cur.execute("""
-            SELECT ml.id, ml.credit_id, ml.quantity_available, ml.price_per_credit, ml.seller_id,
-                   cc.credits_earned, COALESCE(cc.credits_used, 0) as credits_used,
-                   cc.listed_quantity, cc.project_id as seller_project_id
-            FROM marketplace_listings ml
-            JOIN carbon_credits cc ON ml.credit_id = cc.id
-            WHERE ml.id = %s AND ml.status = 'active'
-        """, (listing_id,))
+        execute_hot_query(cur, 'listing_for_purchase', (listing_id,))
         
         listing = cur.fetchone()
         if not listing:
@@ -3589,16 +5500,7 @@ def get_my_listings():
         cur = conn.cursor()
         
         # Get user's marketplace listings
-        cur.execute("""
-            SELECT ml.id, ml.quantity_available, ml.price_per_credit, ml.listed_at, ml.status,
-                   p.name as project_name, p.type as project_type,
-                   cc.credits_earned, COALESCE(cc.credits_used, 0) as credits_used
-            FROM marketplace_listings ml
-            JOIN carbon_credits cc ON ml.credit_id = cc.id
-            JOIN projects p ON cc.project_id = p.id
-            WHERE ml.seller_id = %s
-            ORDER BY ml.listed_at DESC
-        """, (session['user_id'],))
+        execute_hot_query(cur, 'seller_listings', (session['user_id'],))
         
         listings = []
         for row in cur.fetchall():
@@ -3652,6 +5554,7 @@ def delete_listing(listing_id):
 
 
 @app.route('/api/user/credits')
+@read_only_route
 def get_user_credits():
     """Get the current user's available carbon credits"""
     if 'user_id' not in session:
@@ -3662,17 +5565,7 @@ def get_user_credits():
         cur = conn.cursor()
         
         # Get user's carbon credits with available quantity
-        cur.execute("""
-            SELECT cc.id, p.name as project_name, cc.credits_earned, 
-                   COALESCE(cc.credits_used, 0) as credits_used,
-                   cc.listed_quantity,
-                   (cc.credits_earned - COALESCE(cc.credits_used, 0) - cc.listed_quantity) as available_credits,
-                   cc.credit_value
-            FROM carbon_credits cc
-            JOIN projects p ON cc.project_id = p.id
-            WHERE p.user_id = %s
-            ORDER BY p.name
-        """, (session['user_id'],))
+        execute_hot_query(cur, 'user_credits', (session['user_id'],))
         
         credits = []
         for row in cur.fetchall():
@@ -3696,33 +5589,29 @@ def get_user_credits():
 
 @app.route('/api/user/projects')
 def get_user_projects():
-    """Get the current user's projects for credit assignment"""
+    """
+    A page of the current user's projects (for credit assignment).
+    ?sort=start_date|co2e|credits|reduction&dir=asc|desc&limit=, then
+    ?after=<next_cursor> / ?before=<prev_cursor> for the neighbouring pages.
+    """
     if 'user_id' not in session:
         return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    try:
+        page_args = project_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
         
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        
-        # Get user's projects
-        cur.execute("""
-            SELECT id, name 
-            FROM projects 
-            WHERE user_id = %s
-            ORDER BY name
-        """, (session['user_id'],))
-        
-        projects = []
-        for row in cur.fetchall():
-            projects.append({
-                'id': row[0],
-                'name': row[1]
-            })
-        
+        page = load_project_page(cur, session['user_id'], **page_args)
         cur.close()
         conn.close()
         
-        return jsonify({"status": "success", "projects": projects})
+        return jsonify({"status": "success", **page})
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
@@ -3738,6 +5627,7 @@ def carbon_payment():
                            username=session.get('username', 'User'))
 
 @app.route('/api/marketplace/complete-purchase', methods=['POST'])
+@db_budget(3000, lock_timeout_ms=1000)
 def complete_purchase():
     if 'user_id' not in session:
         return jsonify({"status": "error", "message": "Unauthorized"}), 401
@@ -3763,14 +5653,7 @@ def complete_purchase():
         cur = conn.cursor()
         
         # Get the listing details
-        cur.execute("""
-            SELECT ml.id, ml.credit_id, ml.quantity_available, ml.price_per_credit, ml.seller_id,
-                   cc.credits_earned, COALESCE(cc.credits_used, 0) as credits_used,
-                   cc.listed_quantity, cc.project_id as seller_project_id
-            FROM marketplace_listings ml
-            JOIN carbon_credits cc ON ml.credit_id = cc.id
-            WHERE ml.id = %s AND ml.status = 'active'
-        """, (listing_id,))
+        execute_hot_query(cur, 'listing_for_purchase', (listing_id,))
         
         listing = cur.fetchone()
         if not listing:
@@ -40,11 +40,26 @@ CREATE TABLE emission_factors (
     id SERIAL PRIMARY KEY,
     name VARCHAR(100) NOT NULL UNIQUE,
     co2e_per_unit NUMERIC(10,4) NOT NULL,
+    uncertainty_pct NUMERIC(5,2) NOT NULL DEFAULT 0,  -- relative standard deviation of co2e_per_unit
     unit VARCHAR(50) NOT NULL,
     category VARCHAR(100),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Effective-dated emission factor history. emission_factors holds today's
+-- values; every edit to it is recorded here by record_emission_factor_version()
+CREATE TABLE emission_factor_versions (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    co2e_per_unit NUMERIC(10,4) NOT NULL,
+    uncertainty_pct NUMERIC(5,2) NOT NULL DEFAULT 0,
+    effective_from DATE NOT NULL DEFAULT '-infinity',
+    effective_to DATE NOT NULL DEFAULT 'infinity',  -- exclusive
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_emission_factor_versions UNIQUE (name, effective_from),
+    CONSTRAINT chk_emission_factor_versions_range CHECK (effective_to > effective_from)
+);
+
 -- Emissions table
 CREATE TABLE emissions (
     id SERIAL PRIMARY KEY,
@@ -60,11 +75,77 @@ CREATE TABLE emissions (
     waste_t NUMERIC(10,2) DEFAULT 0,
     recycled_pct NUMERIC(5,2) DEFAULT 0,
     renewable_pct NUMERIC(5,2) DEFAULT 0,
+    -- Per-row CO2e (kg), maintained by set_emissions_co2e() and
+    -- recompute_emissions_co2e_for() from the factors in effect on the row's period
+    co2e_asphalt_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_aggregate_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_cement_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_steel_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_materials_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_fuel_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_electricity_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_transport_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_total_kg NUMERIC NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_emissions_project FOREIGN KEY (project_id) 
         REFERENCES projects(id) ON DELETE CASCADE
 );
 
+-- Per-project emissions rollup, maintained incrementally by triggers on
+-- emissions and carbon_credits so page views never re-aggregate raw rows
+CREATE TABLE project_emission_totals (
+    project_id INTEGER PRIMARY KEY,
+    emission_rows INTEGER NOT NULL DEFAULT 0,
+    asphalt_t NUMERIC NOT NULL DEFAULT 0,
+    aggregate_t NUMERIC NOT NULL DEFAULT 0,
+    cement_t NUMERIC NOT NULL DEFAULT 0,
+    steel_t NUMERIC NOT NULL DEFAULT 0,
+    diesel_l NUMERIC NOT NULL DEFAULT 0,
+    electricity_kwh NUMERIC NOT NULL DEFAULT 0,
+    transport_tkm NUMERIC NOT NULL DEFAULT 0,
+    water_use NUMERIC NOT NULL DEFAULT 0,
+    waste_t NUMERIC NOT NULL DEFAULT 0,
+    co2e_asphalt_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_aggregate_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_cement_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_steel_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_materials_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_fuel_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_electricity_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_transport_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_total_kg NUMERIC NOT NULL DEFAULT 0,
+    reduction_kg NUMERIC NOT NULL DEFAULT 0,
+    credit_rows INTEGER NOT NULL DEFAULT 0,
+    credits_earned NUMERIC NOT NULL DEFAULT 0,
+    credits_used NUMERIC NOT NULL DEFAULT 0,
+    listed_quantity NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    user_id INTEGER,  -- the project's owner, kept in step by triggers on projects
+    -- Sort keys as float8: NUMERIC comparisons are not leakproof, so under row
+    -- level security they could only filter an index scan, never bound it
+    -- (the same goes for COALESCE over the nullable start date)
+    sort_start_date DATE NOT NULL DEFAULT '-infinity',
+    sort_co2e_t DOUBLE PRECISION GENERATED ALWAYS AS ((co2e_total_kg / 1000)::float8) STORED,
+    sort_credits DOUBLE PRECISION GENERATED ALWAYS AS (credits_earned::float8) STORED,
+    -- Credits as a share of emissions (tons credited per ton emitted, in %)
+    sort_reduction_pct DOUBLE PRECISION GENERATED ALWAYS AS (
+        (CASE WHEN co2e_total_kg > 0 THEN credits_earned * 100000 / co2e_total_kg ELSE 0 END)::float8
+    ) STORED,
+    CONSTRAINT fk_emission_totals_project FOREIGN KEY (project_id) 
+        REFERENCES projects(id) ON DELETE CASCADE
+);
+
+-- Per-user counter bumped by triggers whenever data shown on the dashboard
+-- changes; cached dashboards and their ETags are keyed on it
+CREATE TABLE user_data_versions (
+    user_id INTEGER PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    bumped_xact BIGINT,  -- transaction of the last bump
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_user_data_versions_user FOREIGN KEY (user_id)
+        REFERENCES users(id) ON DELETE CASCADE
+);
+
 -- Recommendations table
 CREATE TABLE recommendations (
     id SERIAL PRIMARY KEY,
@@ -196,17 +277,410 @@ CREATE TABLE reports (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Bumped on every write to emission_factors(_versions); the application polls it to
+-- decide when its in-process factor snapshot is stale
+CREATE SEQUENCE emission_factors_version_seq;
+
+-- Migrations from migrations/ already applied to this database (flask db migrate)
+CREATE TABLE schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(200) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- =====================================================
 -- INDEXES
 -- =====================================================
 
 CREATE INDEX idx_reports_user_id ON reports(user_id);
 CREATE INDEX idx_reports_project_id ON reports(project_id);
+CREATE INDEX idx_projects_user_id ON projects(user_id);
+CREATE INDEX idx_emissions_project_id ON emissions(project_id);
+CREATE INDEX idx_carbon_credits_project_id ON carbon_credits(project_id, issued_at);
+CREATE INDEX idx_recommendations_project_id ON recommendations(project_id, display_order);
+CREATE INDEX idx_marketplace_listings_status_listed_at ON marketplace_listings(status, listed_at DESC);
+CREATE INDEX idx_marketplace_listings_seller_id ON marketplace_listings(seller_id, listed_at DESC);
+CREATE INDEX idx_marketplace_listings_active ON marketplace_listings(listed_at DESC)
+    WHERE status = 'active' AND quantity_available > 0;
+-- Keyset pages of a user's projects by each sort key
+CREATE INDEX idx_emission_totals_user_start_date ON project_emission_totals(user_id, sort_start_date, project_id);
+CREATE INDEX idx_emission_totals_user_co2e ON project_emission_totals(user_id, sort_co2e_t, project_id);
+CREATE INDEX idx_emission_totals_user_credits ON project_emission_totals(user_id, sort_credits, project_id);
+CREATE INDEX idx_emission_totals_user_reduction ON project_emission_totals(user_id, sort_reduction_pct, project_id);
 
 -- =====================================================
 -- FUNCTIONS
 -- =====================================================
 
+-- Date whose emission factors apply to an emissions row
+CREATE OR REPLACE FUNCTION emissions_period(project_id INTEGER, recorded_at TIMESTAMP)
+RETURNS DATE
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT COALESCE(
+        (SELECT p.start_date FROM projects p WHERE p.id = emissions_period.project_id),
+        recorded_at::date,
+        CURRENT_DATE
+    );
+$$;
+
+-- Emission factors in effect on a date, pivoted into a single row
+CREATE OR REPLACE FUNCTION emission_factor_set(on_date DATE)
+RETURNS TABLE(asphalt NUMERIC, aggregate NUMERIC, cement NUMERIC, steel NUMERIC,
+              diesel NUMERIC, electricity NUMERIC, transport NUMERIC)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Asphalt'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Aggregate'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Cement'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Steel'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Diesel'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Electricity'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Transport'), 0)
+    FROM emission_factor_versions
+    WHERE effective_from <= on_date AND on_date < effective_to;
+$$;
+
+-- Function to fill the stored CO2e columns of an emissions row
+CREATE OR REPLACE FUNCTION set_emissions_co2e()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    f RECORD;
+BEGIN
+    SELECT * INTO f FROM emission_factor_set(emissions_period(NEW.project_id, NEW.created_at));
+
+    NEW.co2e_asphalt_kg := COALESCE(NEW.asphalt_t, 0) * f.asphalt;
+    NEW.co2e_aggregate_kg := COALESCE(NEW.aggregate_t, 0) * f.aggregate;
+    NEW.co2e_cement_kg := COALESCE(NEW.cement_t, 0) * f.cement;
+    NEW.co2e_steel_kg := COALESCE(NEW.steel_t, 0) * f.steel;
+    NEW.co2e_materials_kg := NEW.co2e_asphalt_kg + NEW.co2e_aggregate_kg
+                           + NEW.co2e_cement_kg + NEW.co2e_steel_kg;
+    NEW.co2e_fuel_kg := COALESCE(NEW.diesel_l, 0) * f.diesel;
+    NEW.co2e_electricity_kg := COALESCE(NEW.electricity_kwh, 0) * f.electricity;
+    NEW.co2e_transport_kg := COALESCE(NEW.transport_tkm, 0) * f.transport;
+    NEW.co2e_total_kg := NEW.co2e_materials_kg + NEW.co2e_fuel_kg
+                       + NEW.co2e_electricity_kg + NEW.co2e_transport_kg;
+    RETURN NEW;
+END;
+$$;
+
+-- Function to recompute stored CO2e against the factor versions in effect
+-- on each row's period, in one set-based statement. project_ids NULL means
+-- every project. Rows whose values do not change are left alone.
+-- SECURITY DEFINER so the bulk update is not narrowed by the caller's RLS context.
+CREATE OR REPLACE FUNCTION recompute_emissions_co2e_for(project_ids INTEGER[])
+RETURNS VOID
+LANGUAGE sql
+SECURITY DEFINER
+AS $$
+    WITH periods AS (
+        SELECT e.id, COALESCE(p.start_date, e.created_at::date, CURRENT_DATE) AS period
+        FROM emissions e
+        JOIN projects p ON p.id = e.project_id
+        WHERE project_ids IS NULL OR e.project_id = ANY(project_ids)
+    ),
+    f AS (
+        SELECT pr.id,
+            COALESCE(MAX(v.co2e_per_unit) FILTER (WHERE v.name = 'Asphalt'), 0) AS asphalt,
+            COALESCE(MAX(v.co2e_per_unit) FILTER (WHERE v.name = 'Aggregate'), 0) AS aggregate,
+            COALESCE(MAX(v.co2e_per_unit) FILTER (WHERE v.name = 'Cement'), 0) AS cement,
+            COALESCE(MAX(v.co2e_per_unit) FILTER (WHERE v.name = 'Steel'), 0) AS steel,
+            COALESCE(MAX(v.co2e_per_unit) FILTER (WHERE v.name = 'Diesel'), 0) AS diesel,
+            COALESCE(MAX(v.co2e_per_unit) FILTER (WHERE v.name = 'Electricity'), 0) AS electricity,
+            COALESCE(MAX(v.co2e_per_unit) FILTER (WHERE v.name = 'Transport'), 0) AS transport
+        FROM periods pr
+        LEFT JOIN emission_factor_versions v
+            ON v.effective_from <= pr.period AND pr.period < v.effective_to
+        GROUP BY pr.id
+    ),
+    c AS (
+        SELECT e.id,
+            COALESCE(e.asphalt_t, 0) * f.asphalt AS asphalt_kg,
+            COALESCE(e.aggregate_t, 0) * f.aggregate AS aggregate_kg,
+            COALESCE(e.cement_t, 0) * f.cement AS cement_kg,
+            COALESCE(e.steel_t, 0) * f.steel AS steel_kg,
+            COALESCE(e.diesel_l, 0) * f.diesel AS fuel_kg,
+            COALESCE(e.electricity_kwh, 0) * f.electricity AS electricity_kg,
+            COALESCE(e.transport_tkm, 0) * f.transport AS transport_kg
+        FROM emissions e
+        JOIN f ON f.id = e.id
+    )
+    UPDATE emissions e SET
+        co2e_asphalt_kg = c.asphalt_kg,
+        co2e_aggregate_kg = c.aggregate_kg,
+        co2e_cement_kg = c.cement_kg,
+        co2e_steel_kg = c.steel_kg,
+        co2e_materials_kg = c.asphalt_kg + c.aggregate_kg + c.cement_kg + c.steel_kg,
+        co2e_fuel_kg = c.fuel_kg,
+        co2e_electricity_kg = c.electricity_kg,
+        co2e_transport_kg = c.transport_kg,
+        co2e_total_kg = c.asphalt_kg + c.aggregate_kg + c.cement_kg + c.steel_kg
+                      + c.fuel_kg + c.electricity_kg + c.transport_kg
+    FROM c
+    WHERE e.id = c.id
+      AND (e.co2e_asphalt_kg, e.co2e_aggregate_kg, e.co2e_cement_kg, e.co2e_steel_kg,
+           e.co2e_fuel_kg, e.co2e_electricity_kg, e.co2e_transport_kg)
+          IS DISTINCT FROM
+          (c.asphalt_kg, c.aggregate_kg, c.cement_kg, c.steel_kg,
+           c.fuel_kg, c.electricity_kg, c.transport_kg);
+$$;
+
+-- Statement trigger function recomputing every emissions row after a factor
+-- change. Versions written by record_emission_factor_version() are covered
+-- by the outer emission_factors statement, so nested calls are skipped.
+CREATE OR REPLACE FUNCTION recompute_emissions_co2e()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    IF pg_trigger_depth() > 1 THEN
+        RETURN NULL;
+    END IF;
+    PERFORM recompute_emissions_co2e_for(NULL);
+    RETURN NULL;
+END;
+$$;
+
+-- Row trigger function re-costing a project's emissions when its start date moves
+CREATE OR REPLACE FUNCTION recompute_project_emissions_co2e()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM recompute_emissions_co2e_for(ARRAY[NEW.id]);
+    RETURN NULL;
+END;
+$$;
+
+-- Function to add (sign = 1) or remove (sign = -1) emissions rows from the rollup.
+-- Rows of projects that no longer exist (cascading deletes) are skipped.
+CREATE OR REPLACE FUNCTION apply_emission_totals_delta(rows emissions[], sign INTEGER)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO project_emission_totals AS t (
+        project_id, user_id, sort_start_date, emission_rows,
+        asphalt_t, aggregate_t, cement_t, steel_t, diesel_l, electricity_kwh,
+        transport_tkm, water_use, waste_t,
+        co2e_asphalt_kg, co2e_aggregate_kg, co2e_cement_kg, co2e_steel_kg,
+        co2e_materials_kg, co2e_fuel_kg, co2e_electricity_kg, co2e_transport_kg,
+        co2e_total_kg, reduction_kg
+    )
+    SELECT r.project_id, p.user_id, COALESCE(p.start_date, '-infinity'), sign * COUNT(*),
+        sign * SUM(COALESCE(r.asphalt_t, 0)), sign * SUM(COALESCE(r.aggregate_t, 0)),
+        sign * SUM(COALESCE(r.cement_t, 0)), sign * SUM(COALESCE(r.steel_t, 0)),
+        sign * SUM(COALESCE(r.diesel_l, 0)), sign * SUM(COALESCE(r.electricity_kwh, 0)),
+        sign * SUM(COALESCE(r.transport_tkm, 0)), sign * SUM(COALESCE(r.water_use, 0)),
+        sign * SUM(COALESCE(r.waste_t, 0)),
+        sign * SUM(r.co2e_asphalt_kg), sign * SUM(r.co2e_aggregate_kg),
+        sign * SUM(r.co2e_cement_kg), sign * SUM(r.co2e_steel_kg),
+        sign * SUM(r.co2e_materials_kg), sign * SUM(r.co2e_fuel_kg),
+        sign * SUM(r.co2e_electricity_kg), sign * SUM(r.co2e_transport_kg),
+        sign * SUM(r.co2e_total_kg),
+        sign * SUM(r.co2e_total_kg * (COALESCE(r.recycled_pct, 0) * 0.3 + COALESCE(r.renewable_pct, 0) * 0.4) / 100)
+    FROM unnest(rows) r
+    JOIN projects p ON p.id = r.project_id
+    GROUP BY r.project_id, p.user_id, p.start_date
+    ON CONFLICT (project_id) DO UPDATE SET
+        emission_rows = t.emission_rows + EXCLUDED.emission_rows,
+        asphalt_t = t.asphalt_t + EXCLUDED.asphalt_t,
+        aggregate_t = t.aggregate_t + EXCLUDED.aggregate_t,
+        cement_t = t.cement_t + EXCLUDED.cement_t,
+        steel_t = t.steel_t + EXCLUDED.steel_t,
+        diesel_l = t.diesel_l + EXCLUDED.diesel_l,
+        electricity_kwh = t.electricity_kwh + EXCLUDED.electricity_kwh,
+        transport_tkm = t.transport_tkm + EXCLUDED.transport_tkm,
+        water_use = t.water_use + EXCLUDED.water_use,
+        waste_t = t.waste_t + EXCLUDED.waste_t,
+        co2e_asphalt_kg = t.co2e_asphalt_kg + EXCLUDED.co2e_asphalt_kg,
+        co2e_aggregate_kg = t.co2e_aggregate_kg + EXCLUDED.co2e_aggregate_kg,
+        co2e_cement_kg = t.co2e_cement_kg + EXCLUDED.co2e_cement_kg,
+        co2e_steel_kg = t.co2e_steel_kg + EXCLUDED.co2e_steel_kg,
+        co2e_materials_kg = t.co2e_materials_kg + EXCLUDED.co2e_materials_kg,
+        co2e_fuel_kg = t.co2e_fuel_kg + EXCLUDED.co2e_fuel_kg,
+        co2e_electricity_kg = t.co2e_electricity_kg + EXCLUDED.co2e_electricity_kg,
+        co2e_transport_kg = t.co2e_transport_kg + EXCLUDED.co2e_transport_kg,
+        co2e_total_kg = t.co2e_total_kg + EXCLUDED.co2e_total_kg,
+        reduction_kg = t.reduction_kg + EXCLUDED.reduction_kg,
+        updated_at = CURRENT_TIMESTAMP;
+$$;
+
+-- Function to add (sign = 1) or remove (sign = -1) carbon credit rows from the rollup
+CREATE OR REPLACE FUNCTION apply_credit_totals_delta(rows carbon_credits[], sign INTEGER)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO project_emission_totals AS t (
+        project_id, user_id, sort_start_date, credit_rows, credits_earned, credits_used, listed_quantity
+    )
+    SELECT r.project_id, p.user_id, COALESCE(p.start_date, '-infinity'), sign * COUNT(*),
+        sign * SUM(COALESCE(r.credits_earned, 0)),
+        sign * SUM(COALESCE(r.credits_used, 0)),
+        sign * SUM(COALESCE(r.listed_quantity, 0))
+    FROM unnest(rows) r
+    JOIN projects p ON p.id = r.project_id
+    GROUP BY r.project_id, p.user_id, p.start_date
+    ON CONFLICT (project_id) DO UPDATE SET
+        credit_rows = t.credit_rows + EXCLUDED.credit_rows,
+        credits_earned = t.credits_earned + EXCLUDED.credits_earned,
+        credits_used = t.credits_used + EXCLUDED.credits_used,
+        listed_quantity = t.listed_quantity + EXCLUDED.listed_quantity,
+        updated_at = CURRENT_TIMESTAMP;
+$$;
+
+-- Statement trigger function feeding emissions changes into the rollup
+CREATE OR REPLACE FUNCTION rollup_emission_totals()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_emission_totals_delta(ARRAY(SELECT o::emissions FROM old_rows o), -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_emission_totals_delta(ARRAY(SELECT n::emissions FROM new_rows n), 1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Statement trigger function feeding carbon_credits changes into the rollup
+CREATE OR REPLACE FUNCTION rollup_credit_totals()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_credit_totals_delta(ARRAY(SELECT o::carbon_credits FROM old_rows o), -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_credit_totals_delta(ARRAY(SELECT n::carbon_credits FROM new_rows n), 1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Function to rebuild the rollup from scratch (backfill / repair)
+CREATE OR REPLACE FUNCTION rebuild_project_emission_totals()
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    DELETE FROM project_emission_totals;
+    INSERT INTO project_emission_totals (project_id, user_id, sort_start_date)
+    SELECT id, user_id, COALESCE(start_date, '-infinity') FROM projects;
+    PERFORM apply_emission_totals_delta(ARRAY(SELECT e FROM emissions e), 1);
+    PERFORM apply_credit_totals_delta(ARRAY(SELECT cc FROM carbon_credits cc), 1);
+END;
+$$;
+
+-- Statement trigger function giving new projects an (empty) rollup row and
+-- keeping its owner and start date in step with the project's
+CREATE OR REPLACE FUNCTION projects_sync_emission_totals()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO project_emission_totals (project_id, user_id, sort_start_date)
+        SELECT n.id, n.user_id, COALESCE(n.start_date, '-infinity') FROM new_rows n
+        ON CONFLICT (project_id) DO NOTHING;
+    ELSE
+        UPDATE project_emission_totals t
+        SET user_id = n.user_id, sort_start_date = COALESCE(n.start_date, '-infinity')
+        FROM new_rows n
+        WHERE t.project_id = n.id
+          AND (t.user_id, t.sort_start_date) IS DISTINCT FROM (n.user_id, COALESCE(n.start_date, '-infinity'));
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Function to bump the data version of each given user, at most once per
+-- transaction (in id order, so concurrent writers lock rows consistently)
+CREATE OR REPLACE FUNCTION bump_user_data_versions(user_ids INTEGER[])
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO user_data_versions AS v (user_id, version, bumped_xact)
+    SELECT DISTINCT u.id, 1, txid_current()
+    FROM unnest(user_ids) AS ids(id)
+    JOIN users u ON u.id = ids.id
+    ORDER BY u.id
+    ON CONFLICT (user_id) DO UPDATE SET
+        version = v.version + 1,
+        bumped_xact = EXCLUDED.bumped_xact,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE v.bumped_xact IS DISTINCT FROM EXCLUDED.bumped_xact;
+$$;
+
+-- Statement trigger function bumping the owners of changed projects
+CREATE OR REPLACE FUNCTION projects_bump_user_data_versions()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_user_data_versions(ARRAY(SELECT n.user_id FROM new_rows n));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM bump_user_data_versions(ARRAY(SELECT o.user_id FROM old_rows o));
+    ELSE
+        PERFORM bump_user_data_versions(ARRAY(
+            SELECT unnest(ARRAY[o.user_id, n.user_id])
+            FROM old_rows o
+            JOIN new_rows n ON n.id = o.id
+            WHERE (o.user_id, o.name, o.type, o.start_date, o.end_date)
+                  IS DISTINCT FROM (n.user_id, n.name, n.type, n.start_date, n.end_date)
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Statement trigger function bumping the owners of projects whose
+-- emissions or credit totals changed
+CREATE OR REPLACE FUNCTION emission_totals_bump_user_data_versions()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_user_data_versions(ARRAY(
+            SELECT p.user_id FROM new_rows n JOIN projects p ON p.id = n.project_id
+        ));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM bump_user_data_versions(ARRAY(
+            SELECT p.user_id FROM old_rows o JOIN projects p ON p.id = o.project_id
+        ));
+    ELSE
+        PERFORM bump_user_data_versions(ARRAY(
+            SELECT p.user_id
+            FROM old_rows o
+            JOIN new_rows n ON n.project_id = o.project_id
+            JOIN projects p ON p.id = n.project_id
+            WHERE (o.co2e_total_kg, o.co2e_fuel_kg, o.co2e_electricity_kg, o.co2e_materials_kg,
+                   o.co2e_transport_kg, o.credits_earned)
+                  IS DISTINCT FROM
+                  (n.co2e_total_kg, n.co2e_fuel_kg, n.co2e_electricity_kg, n.co2e_materials_kg,
+                   n.co2e_transport_kg, n.credits_earned)
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
 -- Function to calculate project emissions and credits
 CREATE OR REPLACE FUNCTION calculate_project_emissions(project_id INTEGER)
 RETURNS TABLE(total_co2e_kg NUMERIC, credits_earned NUMERIC)
@@ -215,33 +689,11 @@ AS $$
 BEGIN
     RETURN QUERY
     SELECT 
+        COALESCE(SUM(e.co2e_total_kg), 0) AS total_co2e_kg,
         COALESCE(SUM(
-            e.asphalt_t * ef_asphalt.co2e_per_unit +
-            e.aggregate_t * ef_aggregate.co2e_per_unit +
-            e.cement_t * ef_cement.co2e_per_unit +
-            e.steel_t * ef_steel.co2e_per_unit +
-            e.diesel_l * ef_diesel.co2e_per_unit +
-            e.electricity_kwh * ef_electricity.co2e_per_unit +
-            e.transport_tkm * ef_transport.co2e_per_unit
-        ), 0) AS total_co2e_kg,
-        COALESCE(SUM(
-            (e.asphalt_t * ef_asphalt.co2e_per_unit +
-            e.aggregate_t * ef_aggregate.co2e_per_unit +
-            e.cement_t * ef_cement.co2e_per_unit +
-            e.steel_t * ef_steel.co2e_per_unit +
-            e.diesel_l * ef_diesel.co2e_per_unit +
-            e.electricity_kwh * ef_electricity.co2e_per_unit +
-            e.transport_tkm * ef_transport.co2e_per_unit) *
-            (e.recycled_pct * 0.3 + e.renewable_pct * 0.4) / 100
+            e.co2e_total_kg * (e.recycled_pct * 0.3 + e.renewable_pct * 0.4) / 100
         ) / 1000, 0) AS credits_earned
     FROM emissions e
-    JOIN emission_factors ef_asphalt ON ef_asphalt.name = 'Asphalt'
-    JOIN emission_factors ef_aggregate ON ef_aggregate.name = 'Aggregate'
-    JOIN emission_factors ef_cement ON ef_cement.name = 'Cement'
-    JOIN emission_factors ef_steel ON ef_steel.name = 'Steel'
-    JOIN emission_factors ef_diesel ON ef_diesel.name = 'Diesel'
-    JOIN emission_factors ef_electricity ON ef_electricity.name = 'Electricity'
-    JOIN emission_factors ef_transport ON ef_transport.name = 'Transport'
     WHERE e.project_id = calculate_project_emissions.project_id;
 END;
 $$;
@@ -266,10 +718,203 @@ BEGIN
 END;
 $$;
 
+-- Function to reject a version overlapping another of the same factor
+CREATE OR REPLACE FUNCTION check_emission_factor_version_overlap()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM emission_factor_versions v
+        WHERE v.name = NEW.name AND v.id <> NEW.id
+          AND v.effective_from < NEW.effective_to AND NEW.effective_from < v.effective_to
+    ) THEN
+        RAISE EXCEPTION 'Emission factor % already has a version in effect between % and %',
+            NEW.name, NEW.effective_from, NEW.effective_to;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+-- Function to record an edit of emission_factors as a new version effective
+-- today. The version in effect today is closed (or replaced, if it also
+-- started today); the first version of a factor is open-ended.
+CREATE OR REPLACE FUNCTION record_emission_factor_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    ends DATE;
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.name = OLD.name AND NEW.co2e_per_unit = OLD.co2e_per_unit
+            AND NEW.uncertainty_pct = OLD.uncertainty_pct THEN
+        RETURN NULL;
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM emission_factor_versions WHERE name = NEW.name) THEN
+        INSERT INTO emission_factor_versions (name, co2e_per_unit, uncertainty_pct)
+        VALUES (NEW.name, NEW.co2e_per_unit, NEW.uncertainty_pct);
+        RETURN NULL;
+    END IF;
+
+    SELECT effective_to INTO ends FROM emission_factor_versions
+    WHERE name = NEW.name AND effective_from <= CURRENT_DATE AND CURRENT_DATE < effective_to;
+    IF NOT FOUND THEN
+        SELECT COALESCE(MIN(effective_from), 'infinity') INTO ends FROM emission_factor_versions
+        WHERE name = NEW.name AND effective_from > CURRENT_DATE;
+    END IF;
+
+    DELETE FROM emission_factor_versions WHERE name = NEW.name AND effective_from = CURRENT_DATE;
+    UPDATE emission_factor_versions SET effective_to = CURRENT_DATE
+    WHERE name = NEW.name AND effective_from < CURRENT_DATE AND CURRENT_DATE < effective_to;
+    INSERT INTO emission_factor_versions (name, co2e_per_unit, uncertainty_pct, effective_from, effective_to)
+    VALUES (NEW.name, NEW.co2e_per_unit, NEW.uncertainty_pct, CURRENT_DATE, ends);
+    RETURN NULL;
+END;
+$$;
+
+-- Function to bump the emission factor version
+CREATE OR REPLACE FUNCTION bump_emission_factors_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM nextval('emission_factors_version_seq');
+    RETURN NULL;
+END;
+$$;
+
 -- =====================================================
 -- TRIGGERS
 -- =====================================================
 
+CREATE TRIGGER emission_factors_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON emission_factors
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_emission_factors_version();
+
+CREATE TRIGGER emission_factors_recompute_co2e
+AFTER INSERT OR UPDATE OR DELETE ON emission_factors
+FOR EACH STATEMENT
+EXECUTE FUNCTION recompute_emissions_co2e();
+
+CREATE TRIGGER emission_factors_record_version
+AFTER INSERT OR UPDATE OF name, co2e_per_unit, uncertainty_pct ON emission_factors
+FOR EACH ROW
+EXECUTE FUNCTION record_emission_factor_version();
+
+CREATE TRIGGER emission_factor_versions_no_overlap
+BEFORE INSERT OR UPDATE ON emission_factor_versions
+FOR EACH ROW
+EXECUTE FUNCTION check_emission_factor_version_overlap();
+
+CREATE TRIGGER emission_factor_versions_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON emission_factor_versions
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_emission_factors_version();
+
+CREATE TRIGGER emission_factor_versions_recompute_co2e
+AFTER INSERT OR UPDATE OR DELETE ON emission_factor_versions
+FOR EACH STATEMENT
+EXECUTE FUNCTION recompute_emissions_co2e();
+
+CREATE TRIGGER projects_recompute_co2e
+AFTER UPDATE OF start_date ON projects
+FOR EACH ROW
+WHEN (OLD.start_date IS DISTINCT FROM NEW.start_date)
+EXECUTE FUNCTION recompute_project_emissions_co2e();
+
+CREATE TRIGGER emissions_set_co2e
+BEFORE INSERT OR UPDATE OF asphalt_t, aggregate_t, cement_t, steel_t,
+    diesel_l, electricity_kwh, transport_tkm ON emissions
+FOR EACH ROW
+EXECUTE FUNCTION set_emissions_co2e();
+
+CREATE TRIGGER emissions_rollup_insert
+AFTER INSERT ON emissions
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION rollup_emission_totals();
+
+CREATE TRIGGER emissions_rollup_update
+AFTER UPDATE ON emissions
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION rollup_emission_totals();
+
+CREATE TRIGGER emissions_rollup_delete
+AFTER DELETE ON emissions
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION rollup_emission_totals();
+
+CREATE TRIGGER carbon_credits_rollup_insert
+AFTER INSERT ON carbon_credits
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION rollup_credit_totals();
+
+CREATE TRIGGER carbon_credits_rollup_update
+AFTER UPDATE ON carbon_credits
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION rollup_credit_totals();
+
+CREATE TRIGGER carbon_credits_rollup_delete
+AFTER DELETE ON carbon_credits
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION rollup_credit_totals();
+
+CREATE TRIGGER projects_emission_totals_insert
+AFTER INSERT ON projects
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION projects_sync_emission_totals();
+
+CREATE TRIGGER projects_emission_totals_update
+AFTER UPDATE ON projects
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION projects_sync_emission_totals();
+
+CREATE TRIGGER projects_data_version_insert
+AFTER INSERT ON projects
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION projects_bump_user_data_versions();
+
+CREATE TRIGGER projects_data_version_update
+AFTER UPDATE ON projects
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION projects_bump_user_data_versions();
+
+CREATE TRIGGER projects_data_version_delete
+AFTER DELETE ON projects
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION projects_bump_user_data_versions();
+
+CREATE TRIGGER emission_totals_data_version_insert
+AFTER INSERT ON project_emission_totals
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION emission_totals_bump_user_data_versions();
+
+CREATE TRIGGER emission_totals_data_version_update
+AFTER UPDATE ON project_emission_totals
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION emission_totals_bump_user_data_versions();
+
+CREATE TRIGGER emission_totals_data_version_delete
+AFTER DELETE ON project_emission_totals
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION emission_totals_bump_user_data_versions();
+
 CREATE TRIGGER audit_carbon_credits
 AFTER INSERT OR UPDATE OR DELETE ON carbon_credits
 FOR EACH ROW
@@ -284,6 +929,8 @@ ALTER TABLE users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE projects ENABLE ROW LEVEL SECURITY;
 ALTER TABLE emissions ENABLE ROW LEVEL SECURITY;
 ALTER TABLE carbon_credits ENABLE ROW LEVEL SECURITY;
+ALTER TABLE project_emission_totals ENABLE ROW LEVEL SECURITY;
+ALTER TABLE user_data_versions ENABLE ROW LEVEL SECURITY;
 
 -- User owns their profile
 CREATE POLICY user_owns_profile ON users
@@ -300,6 +947,14 @@ CREATE POLICY user_owns_emissions ON emissions
         WHERE user_id = (current_setting('app.user_id', true))::INTEGER
     ));
 
+-- User owns the rollup rows of their projects
+CREATE POLICY user_owns_emission_totals ON project_emission_totals
+    USING (user_id = (current_setting('app.user_id', true))::INTEGER);
+
+-- User sees their own data version
+CREATE POLICY user_owns_data_version ON user_data_versions
+    USING (user_id = (current_setting('app.user_id', true))::INTEGER);
+
 -- User owns credits for their projects or directly assigned to them
 CREATE POLICY user_owns_credits ON carbon_credits
     USING (
@@ -321,7 +976,10 @@ GRANT USAGE ON SCHEMA public TO app_user;
 GRANT SELECT, INSERT, UPDATE ON TABLE users TO app_user;
 GRANT SELECT, INSERT, UPDATE ON TABLE projects TO app_user;
 GRANT SELECT, INSERT, UPDATE ON TABLE emission_factors TO app_user;
+GRANT SELECT ON TABLE emission_factor_versions TO app_user;
 GRANT SELECT, INSERT, UPDATE ON TABLE emissions TO app_user;
+GRANT SELECT ON TABLE project_emission_totals TO app_user;
+GRANT SELECT ON TABLE user_data_versions TO app_user;
 GRANT SELECT, INSERT, UPDATE ON TABLE recommendations TO app_user;
 GRANT SELECT, INSERT, UPDATE ON TABLE carbon_credits TO app_user;
 GRANT SELECT, INSERT, UPDATE ON TABLE marketplace_listings TO app_user;
@@ -340,16 +998,28 @@ GRANT ALL ON ALL SEQUENCES IN SCHEMA public TO app_admin;
 -- SAMPLE DATA (Optional - Insert emission factors)
 -- =====================================================
 
-INSERT INTO emission_factors (name, co2e_per_unit, unit, category) VALUES
-    ('Asphalt', 0.0940, 'kg CO2e/kg', 'Materials'),
-    ('Aggregate', 0.0048, 'kg CO2e/kg', 'Materials'),
-    ('Cement', 0.9200, 'kg CO2e/kg', 'Materials'),
-    ('Steel', 1.8500, 'kg CO2e/kg', 'Materials'),
-    ('Diesel', 2.6800, 'kg CO2e/L', 'Fuel'),
-    ('Electricity', 0.4330, 'kg CO2e/kWh', 'Energy'),
-    ('Transport', 0.0620, 'kg CO2e/tkm', 'Logistics')
+INSERT INTO emission_factors (name, co2e_per_unit, uncertainty_pct, unit, category) VALUES
+    ('Asphalt', 0.0940, 20.00, 'kg CO2e/kg', 'Materials'),
+    ('Aggregate', 0.0048, 25.00, 'kg CO2e/kg', 'Materials'),
+    ('Cement', 0.9200, 10.00, 'kg CO2e/kg', 'Materials'),
+    ('Steel', 1.8500, 15.00, 'kg CO2e/kg', 'Materials'),
+    ('Diesel', 2.6800, 5.00, 'kg CO2e/L', 'Fuel'),
+    ('Electricity', 0.4330, 10.00, 'kg CO2e/kWh', 'Energy'),
+    ('Transport', 0.0620, 20.00, 'kg CO2e/tkm', 'Logistics')
 ON CONFLICT (name) DO NOTHING;
 
+-- This script already contains everything up to the latest migration
+INSERT INTO schema_migrations (version, name) VALUES
+    (1, 'emission_factors_version'),
+    (2, 'stored_emissions_co2e'),
+    (3, 'project_emission_totals'),
+    (4, 'hot_query_indexes'),
+    (5, 'emission_factor_uncertainty'),
+    (6, 'emission_factor_versions'),
+    (7, 'user_data_versions'),
+    (8, 'project_listing_keys')
+ON CONFLICT (version) DO NOTHING;
+
 -- =====================================================
 -- NOTES
 -- =====================================================
@@ -359,10 +1029,17 @@ ON CONFLICT (name) DO NOTHING;
 --
 -- 2. Update passwords in the role creation commands above
 --
--- 3. RLS policies use app.user_id setting. Set it in your application:
---    SET app.user_id = <user_id>;
+-- 3. RLS policies use app.user_id setting. The application sets it (and the
+--    role) transaction-locally at the start of every transaction so pooled
+--    connections never carry another user's context:
+--    SELECT set_config('role', 'app_user', true), set_config('app.user_id', '<user_id>', true);
 --
 -- 4. This script is idempotent for emission_factors but will fail 
 --    if tables already exist. Drop existing tables first if needed.
 --
--- 5. Consider backing up your data before running this script.
\ No newline at end of file
+-- 5. Consider backing up your data before running this script.
+--
+-- 6. Existing databases are upgraded with `flask --app app db migrate`, which
+--    applies the pending files in migrations/ and records them in
+--    schema_migrations. New schema changes go in a new numbered migration
+--    AND in this script (plus its row in the schema_migrations INSERT).
\ No newline at end of file
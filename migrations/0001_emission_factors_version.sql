@@ -0,0 +1,23 @@
+-- 0001_emission_factors_version
+-- Version counter polled by the in-process emission factor cache
+
+CREATE SEQUENCE IF NOT EXISTS emission_factors_version_seq;
+
+-- Function to bump the emission factor version
+CREATE OR REPLACE FUNCTION bump_emission_factors_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM nextval('emission_factors_version_seq');
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS emission_factors_version ON emission_factors;
+CREATE TRIGGER emission_factors_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON emission_factors
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_emission_factors_version();
+
+GRANT SELECT, USAGE ON SEQUENCE emission_factors_version_seq TO app_user;
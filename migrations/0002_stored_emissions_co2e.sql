@@ -0,0 +1,116 @@
+-- 0002_stored_emissions_co2e
+-- Per-row CO2e columns on emissions, kept current by triggers
+
+ALTER TABLE emissions
+    ADD COLUMN IF NOT EXISTS co2e_asphalt_kg NUMERIC NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS co2e_aggregate_kg NUMERIC NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS co2e_cement_kg NUMERIC NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS co2e_steel_kg NUMERIC NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS co2e_materials_kg NUMERIC NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS co2e_fuel_kg NUMERIC NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS co2e_electricity_kg NUMERIC NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS co2e_transport_kg NUMERIC NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS co2e_total_kg NUMERIC NOT NULL DEFAULT 0;
+
+-- Current emission factors pivoted into a single row
+CREATE OR REPLACE FUNCTION emission_factor_set()
+RETURNS TABLE(asphalt NUMERIC, aggregate NUMERIC, cement NUMERIC, steel NUMERIC,
+              diesel NUMERIC, electricity NUMERIC, transport NUMERIC)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Asphalt'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Aggregate'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Cement'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Steel'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Diesel'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Electricity'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Transport'), 0)
+    FROM emission_factors;
+$$;
+
+-- Function to fill the stored CO2e columns of an emissions row
+CREATE OR REPLACE FUNCTION set_emissions_co2e()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    f RECORD;
+BEGIN
+    SELECT * INTO f FROM emission_factor_set();
+
+    NEW.co2e_asphalt_kg := COALESCE(NEW.asphalt_t, 0) * f.asphalt;
+    NEW.co2e_aggregate_kg := COALESCE(NEW.aggregate_t, 0) * f.aggregate;
+    NEW.co2e_cement_kg := COALESCE(NEW.cement_t, 0) * f.cement;
+    NEW.co2e_steel_kg := COALESCE(NEW.steel_t, 0) * f.steel;
+    NEW.co2e_materials_kg := NEW.co2e_asphalt_kg + NEW.co2e_aggregate_kg
+                           + NEW.co2e_cement_kg + NEW.co2e_steel_kg;
+    NEW.co2e_fuel_kg := COALESCE(NEW.diesel_l, 0) * f.diesel;
+    NEW.co2e_electricity_kg := COALESCE(NEW.electricity_kwh, 0) * f.electricity;
+    NEW.co2e_transport_kg := COALESCE(NEW.transport_tkm, 0) * f.transport;
+    NEW.co2e_total_kg := NEW.co2e_materials_kg + NEW.co2e_fuel_kg
+                       + NEW.co2e_electricity_kg + NEW.co2e_transport_kg;
+    RETURN NEW;
+END;
+$$;
+
+-- Function to recompute stored CO2e for every emissions row after a factor change.
+-- SECURITY DEFINER so the bulk update is not narrowed by the caller's RLS context.
+CREATE OR REPLACE FUNCTION recompute_emissions_co2e()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    UPDATE emissions e SET
+        co2e_asphalt_kg = COALESCE(e.asphalt_t, 0) * f.asphalt,
+        co2e_aggregate_kg = COALESCE(e.aggregate_t, 0) * f.aggregate,
+        co2e_cement_kg = COALESCE(e.cement_t, 0) * f.cement,
+        co2e_steel_kg = COALESCE(e.steel_t, 0) * f.steel,
+        co2e_materials_kg = COALESCE(e.asphalt_t, 0) * f.asphalt + COALESCE(e.aggregate_t, 0) * f.aggregate
+                          + COALESCE(e.cement_t, 0) * f.cement + COALESCE(e.steel_t, 0) * f.steel,
+        co2e_fuel_kg = COALESCE(e.diesel_l, 0) * f.diesel,
+        co2e_electricity_kg = COALESCE(e.electricity_kwh, 0) * f.electricity,
+        co2e_transport_kg = COALESCE(e.transport_tkm, 0) * f.transport,
+        co2e_total_kg = COALESCE(e.asphalt_t, 0) * f.asphalt + COALESCE(e.aggregate_t, 0) * f.aggregate
+                      + COALESCE(e.cement_t, 0) * f.cement + COALESCE(e.steel_t, 0) * f.steel
+                      + COALESCE(e.diesel_l, 0) * f.diesel + COALESCE(e.electricity_kwh, 0) * f.electricity
+                      + COALESCE(e.transport_tkm, 0) * f.transport
+    FROM emission_factor_set() f;
+    RETURN NULL;
+END;
+$$;
+
+-- Function to calculate project emissions and credits
+CREATE OR REPLACE FUNCTION calculate_project_emissions(project_id INTEGER)
+RETURNS TABLE(total_co2e_kg NUMERIC, credits_earned NUMERIC)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT 
+        COALESCE(SUM(e.co2e_total_kg), 0) AS total_co2e_kg,
+        COALESCE(SUM(
+            e.co2e_total_kg * (e.recycled_pct * 0.3 + e.renewable_pct * 0.4) / 100
+        ) / 1000, 0) AS credits_earned
+    FROM emissions e
+    WHERE e.project_id = calculate_project_emissions.project_id;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS emission_factors_recompute_co2e ON emission_factors;
+CREATE TRIGGER emission_factors_recompute_co2e
+AFTER INSERT OR UPDATE OR DELETE ON emission_factors
+FOR EACH STATEMENT
+EXECUTE FUNCTION recompute_emissions_co2e();
+
+DROP TRIGGER IF EXISTS emissions_set_co2e ON emissions;
+CREATE TRIGGER emissions_set_co2e
+BEFORE INSERT OR UPDATE OF asphalt_t, aggregate_t, cement_t, steel_t,
+    diesel_l, electricity_kwh, transport_tkm ON emissions
+FOR EACH ROW
+EXECUTE FUNCTION set_emissions_co2e();
+
+-- Backfill existing rows through the row trigger
+UPDATE emissions SET asphalt_t = asphalt_t;
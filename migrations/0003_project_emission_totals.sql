@@ -0,0 +1,215 @@
+-- 0003_project_emission_totals
+-- Per-project emissions/credits rollup maintained by statement triggers
+
+-- Per-project emissions rollup, maintained incrementally by triggers on
+-- emissions and carbon_credits so page views never re-aggregate raw rows
+CREATE TABLE IF NOT EXISTS project_emission_totals (
+    project_id INTEGER PRIMARY KEY,
+    emission_rows INTEGER NOT NULL DEFAULT 0,
+    asphalt_t NUMERIC NOT NULL DEFAULT 0,
+    aggregate_t NUMERIC NOT NULL DEFAULT 0,
+    cement_t NUMERIC NOT NULL DEFAULT 0,
+    steel_t NUMERIC NOT NULL DEFAULT 0,
+    diesel_l NUMERIC NOT NULL DEFAULT 0,
+    electricity_kwh NUMERIC NOT NULL DEFAULT 0,
+    transport_tkm NUMERIC NOT NULL DEFAULT 0,
+    water_use NUMERIC NOT NULL DEFAULT 0,
+    waste_t NUMERIC NOT NULL DEFAULT 0,
+    co2e_asphalt_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_aggregate_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_cement_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_steel_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_materials_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_fuel_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_electricity_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_transport_kg NUMERIC NOT NULL DEFAULT 0,
+    co2e_total_kg NUMERIC NOT NULL DEFAULT 0,
+    reduction_kg NUMERIC NOT NULL DEFAULT 0,
+    credit_rows INTEGER NOT NULL DEFAULT 0,
+    credits_earned NUMERIC NOT NULL DEFAULT 0,
+    credits_used NUMERIC NOT NULL DEFAULT 0,
+    listed_quantity NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_emission_totals_project FOREIGN KEY (project_id) 
+        REFERENCES projects(id) ON DELETE CASCADE
+);
+
+-- Function to add (sign = 1) or remove (sign = -1) emissions rows from the rollup.
+-- Rows of projects that no longer exist (cascading deletes) are skipped.
+CREATE OR REPLACE FUNCTION apply_emission_totals_delta(rows emissions[], sign INTEGER)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO project_emission_totals AS t (
+        project_id, emission_rows,
+        asphalt_t, aggregate_t, cement_t, steel_t, diesel_l, electricity_kwh,
+        transport_tkm, water_use, waste_t,
+        co2e_asphalt_kg, co2e_aggregate_kg, co2e_cement_kg, co2e_steel_kg,
+        co2e_materials_kg, co2e_fuel_kg, co2e_electricity_kg, co2e_transport_kg,
+        co2e_total_kg, reduction_kg
+    )
+    SELECT r.project_id, sign * COUNT(*),
+        sign * SUM(COALESCE(r.asphalt_t, 0)), sign * SUM(COALESCE(r.aggregate_t, 0)),
+        sign * SUM(COALESCE(r.cement_t, 0)), sign * SUM(COALESCE(r.steel_t, 0)),
+        sign * SUM(COALESCE(r.diesel_l, 0)), sign * SUM(COALESCE(r.electricity_kwh, 0)),
+        sign * SUM(COALESCE(r.transport_tkm, 0)), sign * SUM(COALESCE(r.water_use, 0)),
+        sign * SUM(COALESCE(r.waste_t, 0)),
+        sign * SUM(r.co2e_asphalt_kg), sign * SUM(r.co2e_aggregate_kg),
+        sign * SUM(r.co2e_cement_kg), sign * SUM(r.co2e_steel_kg),
+        sign * SUM(r.co2e_materials_kg), sign * SUM(r.co2e_fuel_kg),
+        sign * SUM(r.co2e_electricity_kg), sign * SUM(r.co2e_transport_kg),
+        sign * SUM(r.co2e_total_kg),
+        sign * SUM(r.co2e_total_kg * (COALESCE(r.recycled_pct, 0) * 0.3 + COALESCE(r.renewable_pct, 0) * 0.4) / 100)
+    FROM unnest(rows) r
+    WHERE EXISTS (SELECT 1 FROM projects p WHERE p.id = r.project_id)
+    GROUP BY r.project_id
+    ON CONFLICT (project_id) DO UPDATE SET
+        emission_rows = t.emission_rows + EXCLUDED.emission_rows,
+        asphalt_t = t.asphalt_t + EXCLUDED.asphalt_t,
+        aggregate_t = t.aggregate_t + EXCLUDED.aggregate_t,
+        cement_t = t.cement_t + EXCLUDED.cement_t,
+        steel_t = t.steel_t + EXCLUDED.steel_t,
+        diesel_l = t.diesel_l + EXCLUDED.diesel_l,
+        electricity_kwh = t.electricity_kwh + EXCLUDED.electricity_kwh,
+        transport_tkm = t.transport_tkm + EXCLUDED.transport_tkm,
+        water_use = t.water_use + EXCLUDED.water_use,
+        waste_t = t.waste_t + EXCLUDED.waste_t,
+        co2e_asphalt_kg = t.co2e_asphalt_kg + EXCLUDED.co2e_asphalt_kg,
+        co2e_aggregate_kg = t.co2e_aggregate_kg + EXCLUDED.co2e_aggregate_kg,
+        co2e_cement_kg = t.co2e_cement_kg + EXCLUDED.co2e_cement_kg,
+        co2e_steel_kg = t.co2e_steel_kg + EXCLUDED.co2e_steel_kg,
+        co2e_materials_kg = t.co2e_materials_kg + EXCLUDED.co2e_materials_kg,
+        co2e_fuel_kg = t.co2e_fuel_kg + EXCLUDED.co2e_fuel_kg,
+        co2e_electricity_kg = t.co2e_electricity_kg + EXCLUDED.co2e_electricity_kg,
+        co2e_transport_kg = t.co2e_transport_kg + EXCLUDED.co2e_transport_kg,
+        co2e_total_kg = t.co2e_total_kg + EXCLUDED.co2e_total_kg,
+        reduction_kg = t.reduction_kg + EXCLUDED.reduction_kg,
+        updated_at = CURRENT_TIMESTAMP;
+$$;
+
+-- Function to add (sign = 1) or remove (sign = -1) carbon credit rows from the rollup
+CREATE OR REPLACE FUNCTION apply_credit_totals_delta(rows carbon_credits[], sign INTEGER)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO project_emission_totals AS t (
+        project_id, credit_rows, credits_earned, credits_used, listed_quantity
+    )
+    SELECT r.project_id, sign * COUNT(*),
+        sign * SUM(COALESCE(r.credits_earned, 0)),
+        sign * SUM(COALESCE(r.credits_used, 0)),
+        sign * SUM(COALESCE(r.listed_quantity, 0))
+    FROM unnest(rows) r
+    WHERE EXISTS (SELECT 1 FROM projects p WHERE p.id = r.project_id)
+    GROUP BY r.project_id
+    ON CONFLICT (project_id) DO UPDATE SET
+        credit_rows = t.credit_rows + EXCLUDED.credit_rows,
+        credits_earned = t.credits_earned + EXCLUDED.credits_earned,
+        credits_used = t.credits_used + EXCLUDED.credits_used,
+        listed_quantity = t.listed_quantity + EXCLUDED.listed_quantity,
+        updated_at = CURRENT_TIMESTAMP;
+$$;
+
+-- Statement trigger function feeding emissions changes into the rollup
+CREATE OR REPLACE FUNCTION rollup_emission_totals()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_emission_totals_delta(ARRAY(SELECT o::emissions FROM old_rows o), -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_emission_totals_delta(ARRAY(SELECT n::emissions FROM new_rows n), 1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Statement trigger function feeding carbon_credits changes into the rollup
+CREATE OR REPLACE FUNCTION rollup_credit_totals()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_credit_totals_delta(ARRAY(SELECT o::carbon_credits FROM old_rows o), -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_credit_totals_delta(ARRAY(SELECT n::carbon_credits FROM new_rows n), 1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Function to rebuild the rollup from scratch (backfill / repair)
+CREATE OR REPLACE FUNCTION rebuild_project_emission_totals()
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    DELETE FROM project_emission_totals;
+    PERFORM apply_emission_totals_delta(ARRAY(SELECT e FROM emissions e), 1);
+    PERFORM apply_credit_totals_delta(ARRAY(SELECT cc FROM carbon_credits cc), 1);
+END;
+$$;
+
+DROP TRIGGER IF EXISTS emissions_rollup_insert ON emissions;
+CREATE TRIGGER emissions_rollup_insert
+AFTER INSERT ON emissions
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION rollup_emission_totals();
+
+DROP TRIGGER IF EXISTS emissions_rollup_update ON emissions;
+CREATE TRIGGER emissions_rollup_update
+AFTER UPDATE ON emissions
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION rollup_emission_totals();
+
+DROP TRIGGER IF EXISTS emissions_rollup_delete ON emissions;
+CREATE TRIGGER emissions_rollup_delete
+AFTER DELETE ON emissions
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION rollup_emission_totals();
+
+DROP TRIGGER IF EXISTS carbon_credits_rollup_insert ON carbon_credits;
+CREATE TRIGGER carbon_credits_rollup_insert
+AFTER INSERT ON carbon_credits
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION rollup_credit_totals();
+
+DROP TRIGGER IF EXISTS carbon_credits_rollup_update ON carbon_credits;
+CREATE TRIGGER carbon_credits_rollup_update
+AFTER UPDATE ON carbon_credits
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION rollup_credit_totals();
+
+DROP TRIGGER IF EXISTS carbon_credits_rollup_delete ON carbon_credits;
+CREATE TRIGGER carbon_credits_rollup_delete
+AFTER DELETE ON carbon_credits
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION rollup_credit_totals();
+
+ALTER TABLE project_emission_totals ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS user_owns_emission_totals ON project_emission_totals;
+CREATE POLICY user_owns_emission_totals ON project_emission_totals
+    USING (project_id IN (
+        SELECT id FROM projects 
+        WHERE user_id = (current_setting('app.user_id', true))::INTEGER
+    ));
+
+GRANT SELECT ON TABLE project_emission_totals TO app_user;
+GRANT ALL ON TABLE project_emission_totals TO app_admin;
+
+-- Backfill from existing rows
+SELECT rebuild_project_emission_totals();
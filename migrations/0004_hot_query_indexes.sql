@@ -0,0 +1,14 @@
+-- 0004_hot_query_indexes
+-- Indexes backing the per-user and marketplace queries in HOT_QUERIES;
+-- `flask db check-plans` fails if any of them falls back to a sequential scan
+
+CREATE INDEX IF NOT EXISTS idx_projects_user_id ON projects(user_id);
+CREATE INDEX IF NOT EXISTS idx_emissions_project_id ON emissions(project_id);
+CREATE INDEX IF NOT EXISTS idx_carbon_credits_project_id ON carbon_credits(project_id, issued_at);
+CREATE INDEX IF NOT EXISTS idx_recommendations_project_id ON recommendations(project_id, display_order);
+CREATE INDEX IF NOT EXISTS idx_marketplace_listings_status_listed_at ON marketplace_listings(status, listed_at DESC);
+CREATE INDEX IF NOT EXISTS idx_marketplace_listings_seller_id ON marketplace_listings(seller_id, listed_at DESC);
+
+-- Only open listings are browsed, and they are a small slice of the table
+CREATE INDEX IF NOT EXISTS idx_marketplace_listings_active ON marketplace_listings(listed_at DESC)
+    WHERE status = 'active' AND quantity_available > 0;
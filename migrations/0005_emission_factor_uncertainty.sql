@@ -0,0 +1,18 @@
+-- 0005_emission_factor_uncertainty
+-- Relative standard deviation of each emission factor, sampled by the
+-- Monte Carlo uncertainty bands on project pages and reports
+
+ALTER TABLE emission_factors
+    ADD COLUMN IF NOT EXISTS uncertainty_pct NUMERIC(5,2) NOT NULL DEFAULT 0;
+
+UPDATE emission_factors f SET uncertainty_pct = d.uncertainty_pct
+FROM (VALUES
+    ('Asphalt', 20.00),
+    ('Aggregate', 25.00),
+    ('Cement', 10.00),
+    ('Steel', 15.00),
+    ('Diesel', 5.00),
+    ('Electricity', 10.00),
+    ('Transport', 20.00)
+) AS d(name, uncertainty_pct)
+WHERE f.name = d.name AND f.uncertainty_pct = 0;
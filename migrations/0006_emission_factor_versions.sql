@@ -0,0 +1,262 @@
+-- 0006_emission_factor_versions
+-- Effective-dated emission factor history. Each emissions row is costed with
+-- the factors in effect on its period: the project's start date, or the day
+-- the row was recorded when the project has none.
+
+CREATE TABLE IF NOT EXISTS emission_factor_versions (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    co2e_per_unit NUMERIC(10,4) NOT NULL,
+    uncertainty_pct NUMERIC(5,2) NOT NULL DEFAULT 0,
+    effective_from DATE NOT NULL DEFAULT '-infinity',
+    effective_to DATE NOT NULL DEFAULT 'infinity',  -- exclusive
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_emission_factor_versions UNIQUE (name, effective_from),
+    CONSTRAINT chk_emission_factor_versions_range CHECK (effective_to > effective_from)
+);
+
+-- Today's factors become the first, open-ended version of each
+INSERT INTO emission_factor_versions (name, co2e_per_unit, uncertainty_pct)
+SELECT name, co2e_per_unit, uncertainty_pct FROM emission_factors
+ON CONFLICT (name, effective_from) DO NOTHING;
+
+-- Function to reject a version overlapping another of the same factor
+CREATE OR REPLACE FUNCTION check_emission_factor_version_overlap()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM emission_factor_versions v
+        WHERE v.name = NEW.name AND v.id <> NEW.id
+          AND v.effective_from < NEW.effective_to AND NEW.effective_from < v.effective_to
+    ) THEN
+        RAISE EXCEPTION 'Emission factor % already has a version in effect between % and %',
+            NEW.name, NEW.effective_from, NEW.effective_to;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+-- Function to record an edit of emission_factors as a new version effective
+-- today. The version in effect today is closed (or replaced, if it also
+-- started today); the first version of a factor is open-ended.
+CREATE OR REPLACE FUNCTION record_emission_factor_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    ends DATE;
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.name = OLD.name AND NEW.co2e_per_unit = OLD.co2e_per_unit
+            AND NEW.uncertainty_pct = OLD.uncertainty_pct THEN
+        RETURN NULL;
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM emission_factor_versions WHERE name = NEW.name) THEN
+        INSERT INTO emission_factor_versions (name, co2e_per_unit, uncertainty_pct)
+        VALUES (NEW.name, NEW.co2e_per_unit, NEW.uncertainty_pct);
+        RETURN NULL;
+    END IF;
+
+    SELECT effective_to INTO ends FROM emission_factor_versions
+    WHERE name = NEW.name AND effective_from <= CURRENT_DATE AND CURRENT_DATE < effective_to;
+    IF NOT FOUND THEN
+        SELECT COALESCE(MIN(effective_from), 'infinity') INTO ends FROM emission_factor_versions
+        WHERE name = NEW.name AND effective_from > CURRENT_DATE;
+    END IF;
+
+    DELETE FROM emission_factor_versions WHERE name = NEW.name AND effective_from = CURRENT_DATE;
+    UPDATE emission_factor_versions SET effective_to = CURRENT_DATE
+    WHERE name = NEW.name AND effective_from < CURRENT_DATE AND CURRENT_DATE < effective_to;
+    INSERT INTO emission_factor_versions (name, co2e_per_unit, uncertainty_pct, effective_from, effective_to)
+    VALUES (NEW.name, NEW.co2e_per_unit, NEW.uncertainty_pct, CURRENT_DATE, ends);
+    RETURN NULL;
+END;
+$$;
+
+-- Date whose emission factors apply to an emissions row
+CREATE OR REPLACE FUNCTION emissions_period(project_id INTEGER, recorded_at TIMESTAMP)
+RETURNS DATE
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT COALESCE(
+        (SELECT p.start_date FROM projects p WHERE p.id = emissions_period.project_id),
+        recorded_at::date,
+        CURRENT_DATE
+    );
+$$;
+
+-- Emission factors in effect on a date, pivoted into a single row
+DROP FUNCTION IF EXISTS emission_factor_set();
+CREATE OR REPLACE FUNCTION emission_factor_set(on_date DATE)
+RETURNS TABLE(asphalt NUMERIC, aggregate NUMERIC, cement NUMERIC, steel NUMERIC,
+              diesel NUMERIC, electricity NUMERIC, transport NUMERIC)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Asphalt'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Aggregate'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Cement'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Steel'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Diesel'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Electricity'), 0),
+        COALESCE(MAX(co2e_per_unit) FILTER (WHERE name = 'Transport'), 0)
+    FROM emission_factor_versions
+    WHERE effective_from <= on_date AND on_date < effective_to;
+$$;
+
+-- Function to fill the stored CO2e columns of an emissions row
+CREATE OR REPLACE FUNCTION set_emissions_co2e()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    f RECORD;
+BEGIN
+    SELECT * INTO f FROM emission_factor_set(emissions_period(NEW.project_id, NEW.created_at));
+
+    NEW.co2e_asphalt_kg := COALESCE(NEW.asphalt_t, 0) * f.asphalt;
+    NEW.co2e_aggregate_kg := COALESCE(NEW.aggregate_t, 0) * f.aggregate;
+    NEW.co2e_cement_kg := COALESCE(NEW.cement_t, 0) * f.cement;
+    NEW.co2e_steel_kg := COALESCE(NEW.steel_t, 0) * f.steel;
+    NEW.co2e_materials_kg := NEW.co2e_asphalt_kg + NEW.co2e_aggregate_kg
+                           + NEW.co2e_cement_kg + NEW.co2e_steel_kg;
+    NEW.co2e_fuel_kg := COALESCE(NEW.diesel_l, 0) * f.diesel;
+    NEW.co2e_electricity_kg := COALESCE(NEW.electricity_kwh, 0) * f.electricity;
+    NEW.co2e_transport_kg := COALESCE(NEW.transport_tkm, 0) * f.transport;
+    NEW.co2e_total_kg := NEW.co2e_materials_kg + NEW.co2e_fuel_kg
+                       + NEW.co2e_electricity_kg + NEW.co2e_transport_kg;
+    RETURN NEW;
+END;
+$$;
+
+-- Function to recompute stored CO2e against the factor versions in effect
+-- on each row's period, in one set-based statement. project_ids NULL means
+-- every project. Rows whose values do not change are left alone.
+-- SECURITY DEFINER so the bulk update is not narrowed by the caller's RLS context.
+CREATE OR REPLACE FUNCTION recompute_emissions_co2e_for(project_ids INTEGER[])
+RETURNS VOID
+LANGUAGE sql
+SECURITY DEFINER
+AS $$
+    WITH periods AS (
+        SELECT e.id, COALESCE(p.start_date, e.created_at::date, CURRENT_DATE) AS period
+        FROM emissions e
+        JOIN projects p ON p.id = e.project_id
+        WHERE project_ids IS NULL OR e.project_id = ANY(project_ids)
+    ),
+    f AS (
+        SELECT pr.id,
+            COALESCE(MAX(v.co2e_per_unit) FILTER (WHERE v.name = 'Asphalt'), 0) AS asphalt,
+            COALESCE(MAX(v.co2e_per_unit) FILTER (WHERE v.name = 'Aggregate'), 0) AS aggregate,
+            COALESCE(MAX(v.co2e_per_unit) FILTER (WHERE v.name = 'Cement'), 0) AS cement,
+            COALESCE(MAX(v.co2e_per_unit) FILTER (WHERE v.name = 'Steel'), 0) AS steel,
+            COALESCE(MAX(v.co2e_per_unit) FILTER (WHERE v.name = 'Diesel'), 0) AS diesel,
+            COALESCE(MAX(v.co2e_per_unit) FILTER (WHERE v.name = 'Electricity'), 0) AS electricity,
+            COALESCE(MAX(v.co2e_per_unit) FILTER (WHERE v.name = 'Transport'), 0) AS transport
+        FROM periods pr
+        LEFT JOIN emission_factor_versions v
+            ON v.effective_from <= pr.period AND pr.period < v.effective_to
+        GROUP BY pr.id
+    ),
+    c AS (
+        SELECT e.id,
+            COALESCE(e.asphalt_t, 0) * f.asphalt AS asphalt_kg,
+            COALESCE(e.aggregate_t, 0) * f.aggregate AS aggregate_kg,
+            COALESCE(e.cement_t, 0) * f.cement AS cement_kg,
+            COALESCE(e.steel_t, 0) * f.steel AS steel_kg,
+            COALESCE(e.diesel_l, 0) * f.diesel AS fuel_kg,
+            COALESCE(e.electricity_kwh, 0) * f.electricity AS electricity_kg,
+            COALESCE(e.transport_tkm, 0) * f.transport AS transport_kg
+        FROM emissions e
+        JOIN f ON f.id = e.id
+    )
+    UPDATE emissions e SET
+        co2e_asphalt_kg = c.asphalt_kg,
+        co2e_aggregate_kg = c.aggregate_kg,
+        co2e_cement_kg = c.cement_kg,
+        co2e_steel_kg = c.steel_kg,
+        co2e_materials_kg = c.asphalt_kg + c.aggregate_kg + c.cement_kg + c.steel_kg,
+        co2e_fuel_kg = c.fuel_kg,
+        co2e_electricity_kg = c.electricity_kg,
+        co2e_transport_kg = c.transport_kg,
+        co2e_total_kg = c.asphalt_kg + c.aggregate_kg + c.cement_kg + c.steel_kg
+                      + c.fuel_kg + c.electricity_kg + c.transport_kg
+    FROM c
+    WHERE e.id = c.id
+      AND (e.co2e_asphalt_kg, e.co2e_aggregate_kg, e.co2e_cement_kg, e.co2e_steel_kg,
+           e.co2e_fuel_kg, e.co2e_electricity_kg, e.co2e_transport_kg)
+          IS DISTINCT FROM
+          (c.asphalt_kg, c.aggregate_kg, c.cement_kg, c.steel_kg,
+           c.fuel_kg, c.electricity_kg, c.transport_kg);
+$$;
+
+-- Statement trigger function recomputing every emissions row after a factor
+-- change. Versions written by record_emission_factor_version() are covered
+-- by the outer emission_factors statement, so nested calls are skipped.
+CREATE OR REPLACE FUNCTION recompute_emissions_co2e()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    IF pg_trigger_depth() > 1 THEN
+        RETURN NULL;
+    END IF;
+    PERFORM recompute_emissions_co2e_for(NULL);
+    RETURN NULL;
+END;
+$$;
+
+-- Row trigger function re-costing a project's emissions when its start date moves
+CREATE OR REPLACE FUNCTION recompute_project_emissions_co2e()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM recompute_emissions_co2e_for(ARRAY[NEW.id]);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS emission_factor_versions_no_overlap ON emission_factor_versions;
+CREATE TRIGGER emission_factor_versions_no_overlap
+BEFORE INSERT OR UPDATE ON emission_factor_versions
+FOR EACH ROW
+EXECUTE FUNCTION check_emission_factor_version_overlap();
+
+DROP TRIGGER IF EXISTS emission_factors_record_version ON emission_factors;
+CREATE TRIGGER emission_factors_record_version
+AFTER INSERT OR UPDATE OF name, co2e_per_unit, uncertainty_pct ON emission_factors
+FOR EACH ROW
+EXECUTE FUNCTION record_emission_factor_version();
+
+DROP TRIGGER IF EXISTS emission_factor_versions_version ON emission_factor_versions;
+CREATE TRIGGER emission_factor_versions_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON emission_factor_versions
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_emission_factors_version();
+
+DROP TRIGGER IF EXISTS emission_factor_versions_recompute_co2e ON emission_factor_versions;
+CREATE TRIGGER emission_factor_versions_recompute_co2e
+AFTER INSERT OR UPDATE OR DELETE ON emission_factor_versions
+FOR EACH STATEMENT
+EXECUTE FUNCTION recompute_emissions_co2e();
+
+DROP TRIGGER IF EXISTS projects_recompute_co2e ON projects;
+CREATE TRIGGER projects_recompute_co2e
+AFTER UPDATE OF start_date ON projects
+FOR EACH ROW
+WHEN (OLD.start_date IS DISTINCT FROM NEW.start_date)
+EXECUTE FUNCTION recompute_project_emissions_co2e();
+
+GRANT SELECT ON TABLE emission_factor_versions TO app_user;
+GRANT SELECT, USAGE ON SEQUENCE emission_factor_versions_id_seq TO app_user;
+GRANT ALL ON TABLE emission_factor_versions TO app_admin;
+
+-- Re-cost existing rows against their own periods
+SELECT recompute_emissions_co2e_for(NULL);
@@ -0,0 +1,139 @@
+-- 0007_user_data_versions
+-- Per-user counter bumped whenever data shown on the dashboard changes: the
+-- user's projects or their emissions/credits rollup. Cached dashboards are
+-- keyed on it, so every write path invalidates them in every worker.
+
+CREATE TABLE IF NOT EXISTS user_data_versions (
+    user_id INTEGER PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    bumped_xact BIGINT,  -- transaction of the last bump
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_user_data_versions_user FOREIGN KEY (user_id)
+        REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Function to bump the data version of each given user, at most once per
+-- transaction (in id order, so concurrent writers lock rows consistently)
+CREATE OR REPLACE FUNCTION bump_user_data_versions(user_ids INTEGER[])
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO user_data_versions AS v (user_id, version, bumped_xact)
+    SELECT DISTINCT u.id, 1, txid_current()
+    FROM unnest(user_ids) AS ids(id)
+    JOIN users u ON u.id = ids.id
+    ORDER BY u.id
+    ON CONFLICT (user_id) DO UPDATE SET
+        version = v.version + 1,
+        bumped_xact = EXCLUDED.bumped_xact,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE v.bumped_xact IS DISTINCT FROM EXCLUDED.bumped_xact;
+$$;
+
+-- Statement trigger function bumping the owners of changed projects
+CREATE OR REPLACE FUNCTION projects_bump_user_data_versions()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_user_data_versions(ARRAY(SELECT n.user_id FROM new_rows n));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM bump_user_data_versions(ARRAY(SELECT o.user_id FROM old_rows o));
+    ELSE
+        PERFORM bump_user_data_versions(ARRAY(
+            SELECT unnest(ARRAY[o.user_id, n.user_id])
+            FROM old_rows o
+            JOIN new_rows n ON n.id = o.id
+            WHERE (o.user_id, o.name, o.type, o.start_date, o.end_date)
+                  IS DISTINCT FROM (n.user_id, n.name, n.type, n.start_date, n.end_date)
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Statement trigger function bumping the owners of projects whose
+-- emissions or credit totals changed
+CREATE OR REPLACE FUNCTION emission_totals_bump_user_data_versions()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_user_data_versions(ARRAY(
+            SELECT p.user_id FROM new_rows n JOIN projects p ON p.id = n.project_id
+        ));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM bump_user_data_versions(ARRAY(
+            SELECT p.user_id FROM old_rows o JOIN projects p ON p.id = o.project_id
+        ));
+    ELSE
+        PERFORM bump_user_data_versions(ARRAY(
+            SELECT p.user_id
+            FROM old_rows o
+            JOIN new_rows n ON n.project_id = o.project_id
+            JOIN projects p ON p.id = n.project_id
+            WHERE (o.co2e_total_kg, o.co2e_fuel_kg, o.co2e_electricity_kg, o.co2e_materials_kg,
+                   o.co2e_transport_kg, o.credits_earned)
+                  IS DISTINCT FROM
+                  (n.co2e_total_kg, n.co2e_fuel_kg, n.co2e_electricity_kg, n.co2e_materials_kg,
+                   n.co2e_transport_kg, n.credits_earned)
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS projects_data_version_insert ON projects;
+CREATE TRIGGER projects_data_version_insert
+AFTER INSERT ON projects
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION projects_bump_user_data_versions();
+
+DROP TRIGGER IF EXISTS projects_data_version_update ON projects;
+CREATE TRIGGER projects_data_version_update
+AFTER UPDATE ON projects
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION projects_bump_user_data_versions();
+
+DROP TRIGGER IF EXISTS projects_data_version_delete ON projects;
+CREATE TRIGGER projects_data_version_delete
+AFTER DELETE ON projects
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION projects_bump_user_data_versions();
+
+DROP TRIGGER IF EXISTS emission_totals_data_version_insert ON project_emission_totals;
+CREATE TRIGGER emission_totals_data_version_insert
+AFTER INSERT ON project_emission_totals
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION emission_totals_bump_user_data_versions();
+
+DROP TRIGGER IF EXISTS emission_totals_data_version_update ON project_emission_totals;
+CREATE TRIGGER emission_totals_data_version_update
+AFTER UPDATE ON project_emission_totals
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION emission_totals_bump_user_data_versions();
+
+DROP TRIGGER IF EXISTS emission_totals_data_version_delete ON project_emission_totals;
+CREATE TRIGGER emission_totals_data_version_delete
+AFTER DELETE ON project_emission_totals
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION emission_totals_bump_user_data_versions();
+
+ALTER TABLE user_data_versions ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS user_owns_data_version ON user_data_versions;
+CREATE POLICY user_owns_data_version ON user_data_versions
+    USING (user_id = (current_setting('app.user_id', true))::INTEGER);
+
+GRANT SELECT ON TABLE user_data_versions TO app_user;
+GRANT ALL ON TABLE user_data_versions TO app_admin;
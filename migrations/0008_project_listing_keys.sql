@@ -0,0 +1,167 @@
+-- 0008_project_listing_keys
+-- Sort keys for paging through a user's projects. Every project gets a rollup
+-- row carrying its owner and its sort keys, so every page is read off a
+-- (user_id, key, project_id) index instead of sorting the whole portfolio.
+
+ALTER TABLE project_emission_totals ADD COLUMN IF NOT EXISTS user_id INTEGER;
+-- Sort keys as float8: NUMERIC comparisons are not leakproof, so under row
+-- level security they could only filter an index scan, never bound it
+-- (the same goes for COALESCE over the nullable start date)
+ALTER TABLE project_emission_totals ADD COLUMN IF NOT EXISTS sort_start_date DATE NOT NULL DEFAULT '-infinity';
+ALTER TABLE project_emission_totals ADD COLUMN IF NOT EXISTS sort_co2e_t DOUBLE PRECISION
+    GENERATED ALWAYS AS ((co2e_total_kg / 1000)::float8) STORED;
+ALTER TABLE project_emission_totals ADD COLUMN IF NOT EXISTS sort_credits DOUBLE PRECISION
+    GENERATED ALWAYS AS (credits_earned::float8) STORED;
+-- Credits as a share of emissions (tons credited per ton emitted, in %)
+ALTER TABLE project_emission_totals ADD COLUMN IF NOT EXISTS sort_reduction_pct DOUBLE PRECISION
+    GENERATED ALWAYS AS (
+        (CASE WHEN co2e_total_kg > 0 THEN credits_earned * 100000 / co2e_total_kg ELSE 0 END)::float8
+    ) STORED;
+
+-- Function to add (sign = 1) or remove (sign = -1) emissions rows from the rollup.
+-- Rows of projects that no longer exist (cascading deletes) are skipped.
+CREATE OR REPLACE FUNCTION apply_emission_totals_delta(rows emissions[], sign INTEGER)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO project_emission_totals AS t (
+        project_id, user_id, sort_start_date, emission_rows,
+        asphalt_t, aggregate_t, cement_t, steel_t, diesel_l, electricity_kwh,
+        transport_tkm, water_use, waste_t,
+        co2e_asphalt_kg, co2e_aggregate_kg, co2e_cement_kg, co2e_steel_kg,
+        co2e_materials_kg, co2e_fuel_kg, co2e_electricity_kg, co2e_transport_kg,
+        co2e_total_kg, reduction_kg
+    )
+    SELECT r.project_id, p.user_id, COALESCE(p.start_date, '-infinity'), sign * COUNT(*),
+        sign * SUM(COALESCE(r.asphalt_t, 0)), sign * SUM(COALESCE(r.aggregate_t, 0)),
+        sign * SUM(COALESCE(r.cement_t, 0)), sign * SUM(COALESCE(r.steel_t, 0)),
+        sign * SUM(COALESCE(r.diesel_l, 0)), sign * SUM(COALESCE(r.electricity_kwh, 0)),
+        sign * SUM(COALESCE(r.transport_tkm, 0)), sign * SUM(COALESCE(r.water_use, 0)),
+        sign * SUM(COALESCE(r.waste_t, 0)),
+        sign * SUM(r.co2e_asphalt_kg), sign * SUM(r.co2e_aggregate_kg),
+        sign * SUM(r.co2e_cement_kg), sign * SUM(r.co2e_steel_kg),
+        sign * SUM(r.co2e_materials_kg), sign * SUM(r.co2e_fuel_kg),
+        sign * SUM(r.co2e_electricity_kg), sign * SUM(r.co2e_transport_kg),
+        sign * SUM(r.co2e_total_kg),
+        sign * SUM(r.co2e_total_kg * (COALESCE(r.recycled_pct, 0) * 0.3 + COALESCE(r.renewable_pct, 0) * 0.4) / 100)
+    FROM unnest(rows) r
+    JOIN projects p ON p.id = r.project_id
+    GROUP BY r.project_id, p.user_id, p.start_date
+    ON CONFLICT (project_id) DO UPDATE SET
+        emission_rows = t.emission_rows + EXCLUDED.emission_rows,
+        asphalt_t = t.asphalt_t + EXCLUDED.asphalt_t,
+        aggregate_t = t.aggregate_t + EXCLUDED.aggregate_t,
+        cement_t = t.cement_t + EXCLUDED.cement_t,
+        steel_t = t.steel_t + EXCLUDED.steel_t,
+        diesel_l = t.diesel_l + EXCLUDED.diesel_l,
+        electricity_kwh = t.electricity_kwh + EXCLUDED.electricity_kwh,
+        transport_tkm = t.transport_tkm + EXCLUDED.transport_tkm,
+        water_use = t.water_use + EXCLUDED.water_use,
+        waste_t = t.waste_t + EXCLUDED.waste_t,
+        co2e_asphalt_kg = t.co2e_asphalt_kg + EXCLUDED.co2e_asphalt_kg,
+        co2e_aggregate_kg = t.co2e_aggregate_kg + EXCLUDED.co2e_aggregate_kg,
+        co2e_cement_kg = t.co2e_cement_kg + EXCLUDED.co2e_cement_kg,
+        co2e_steel_kg = t.co2e_steel_kg + EXCLUDED.co2e_steel_kg,
+        co2e_materials_kg = t.co2e_materials_kg + EXCLUDED.co2e_materials_kg,
+        co2e_fuel_kg = t.co2e_fuel_kg + EXCLUDED.co2e_fuel_kg,
+        co2e_electricity_kg = t.co2e_electricity_kg + EXCLUDED.co2e_electricity_kg,
+        co2e_transport_kg = t.co2e_transport_kg + EXCLUDED.co2e_transport_kg,
+        co2e_total_kg = t.co2e_total_kg + EXCLUDED.co2e_total_kg,
+        reduction_kg = t.reduction_kg + EXCLUDED.reduction_kg,
+        updated_at = CURRENT_TIMESTAMP;
+$$;
+
+-- Function to add (sign = 1) or remove (sign = -1) carbon credit rows from the rollup
+CREATE OR REPLACE FUNCTION apply_credit_totals_delta(rows carbon_credits[], sign INTEGER)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO project_emission_totals AS t (
+        project_id, user_id, sort_start_date, credit_rows, credits_earned, credits_used, listed_quantity
+    )
+    SELECT r.project_id, p.user_id, COALESCE(p.start_date, '-infinity'), sign * COUNT(*),
+        sign * SUM(COALESCE(r.credits_earned, 0)),
+        sign * SUM(COALESCE(r.credits_used, 0)),
+        sign * SUM(COALESCE(r.listed_quantity, 0))
+    FROM unnest(rows) r
+    JOIN projects p ON p.id = r.project_id
+    GROUP BY r.project_id, p.user_id, p.start_date
+    ON CONFLICT (project_id) DO UPDATE SET
+        credit_rows = t.credit_rows + EXCLUDED.credit_rows,
+        credits_earned = t.credits_earned + EXCLUDED.credits_earned,
+        credits_used = t.credits_used + EXCLUDED.credits_used,
+        listed_quantity = t.listed_quantity + EXCLUDED.listed_quantity,
+        updated_at = CURRENT_TIMESTAMP;
+$$;
+
+-- Function to rebuild the rollup from scratch (backfill / repair)
+CREATE OR REPLACE FUNCTION rebuild_project_emission_totals()
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    DELETE FROM project_emission_totals;
+    INSERT INTO project_emission_totals (project_id, user_id, sort_start_date)
+    SELECT id, user_id, COALESCE(start_date, '-infinity') FROM projects;
+    PERFORM apply_emission_totals_delta(ARRAY(SELECT e FROM emissions e), 1);
+    PERFORM apply_credit_totals_delta(ARRAY(SELECT cc FROM carbon_credits cc), 1);
+END;
+$$;
+
+-- Statement trigger function giving new projects an (empty) rollup row and
+-- keeping its owner and start date in step with the project's
+CREATE OR REPLACE FUNCTION projects_sync_emission_totals()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO project_emission_totals (project_id, user_id, sort_start_date)
+        SELECT n.id, n.user_id, COALESCE(n.start_date, '-infinity') FROM new_rows n
+        ON CONFLICT (project_id) DO NOTHING;
+    ELSE
+        UPDATE project_emission_totals t
+        SET user_id = n.user_id, sort_start_date = COALESCE(n.start_date, '-infinity')
+        FROM new_rows n
+        WHERE t.project_id = n.id
+          AND (t.user_id, t.sort_start_date) IS DISTINCT FROM (n.user_id, COALESCE(n.start_date, '-infinity'));
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS projects_emission_totals_insert ON projects;
+CREATE TRIGGER projects_emission_totals_insert
+AFTER INSERT ON projects
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION projects_sync_emission_totals();
+
+DROP TRIGGER IF EXISTS projects_emission_totals_update ON projects;
+CREATE TRIGGER projects_emission_totals_update
+AFTER UPDATE ON projects
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION projects_sync_emission_totals();
+
+-- Backfill: owners of existing rollup rows, empty rows for the other projects
+INSERT INTO project_emission_totals AS t (project_id, user_id, sort_start_date)
+SELECT id, user_id, COALESCE(start_date, '-infinity') FROM projects
+ON CONFLICT (project_id) DO UPDATE SET
+    user_id = EXCLUDED.user_id,
+    sort_start_date = EXCLUDED.sort_start_date;
+
+CREATE INDEX IF NOT EXISTS idx_emission_totals_user_start_date
+    ON project_emission_totals(user_id, sort_start_date, project_id);
+CREATE INDEX IF NOT EXISTS idx_emission_totals_user_co2e
+    ON project_emission_totals(user_id, sort_co2e_t, project_id);
+CREATE INDEX IF NOT EXISTS idx_emission_totals_user_credits
+    ON project_emission_totals(user_id, sort_credits, project_id);
+CREATE INDEX IF NOT EXISTS idx_emission_totals_user_reduction
+    ON project_emission_totals(user_id, sort_reduction_pct, project_id);
+-- The owner is on the row now; no per-row lookup into projects
+DROP POLICY IF EXISTS user_owns_emission_totals ON project_emission_totals;
+CREATE POLICY user_owns_emission_totals ON project_emission_totals
+    USING (user_id = (current_setting('app.user_id', true))::INTEGER);
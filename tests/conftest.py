@@ -0,0 +1,65 @@
+import os
+import sys
+import uuid
+
+import psycopg2
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def appmod(tmp_path_factory):
+    """The app module, imported with its session and upload folders in a scratch directory."""
+    os.chdir(tmp_path_factory.mktemp('app'))
+    import app as appmod
+    appmod.app.config['TESTING'] = True
+    return appmod
+
+
+@pytest.fixture
+def admin_conn(appmod):
+    """Superuser connection, for setting up and removing test data. Skips without a database."""
+    try:
+        conn = psycopg2.connect(**appmod.get_db_params())
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL not available: {e}")
+    conn.autocommit = True
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def make_user(admin_conn):
+    """Creates users with one project each; everything is deleted afterwards."""
+    user_ids = []
+
+    def make_user():
+        cur = admin_conn.cursor()
+        cur.execute("INSERT INTO users (username, email) VALUES (%s, %s) RETURNING id",
+                    (f"test-{uuid.uuid4().hex}", f"{uuid.uuid4().hex}@test.invalid"))
+        user_id = cur.fetchone()[0]
+        user_ids.append(user_id)
+        cur.execute("INSERT INTO projects (user_id, name, type) VALUES (%s, 'Test project', 'Road')", (user_id,))
+        cur.close()
+        return user_id
+
+    yield make_user
+    cur = admin_conn.cursor()
+    cur.execute("DELETE FROM users WHERE id = ANY(%s)", (user_ids,))
+    cur.close()
+
+
+@pytest.fixture
+def client(appmod, admin_conn):
+    """Test client logged in as a freshly registered user."""
+    client = appmod.app.test_client()
+    username = f"test-{uuid.uuid4().hex[:12]}"
+    client.post('/register', data={'username': username, 'email': f"{username}@test.invalid", 'password': 'pw'})
+    with client.session_transaction() as session:
+        user_id = session['user_id']
+    yield client
+    cur = admin_conn.cursor()
+    cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
+    cur.close()
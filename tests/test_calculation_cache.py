@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.fixture
+def factor_version(appmod, monkeypatch):
+    monkeypatch.setattr(appmod.emission_factor_cache, 'version', lambda: 1)
+
+
+def test_key_normalises_numeric_strings(appmod, factor_version):
+    keys = {appmod.calculation_cache_key({'asphalt_t': value, 'diesel_l': blank})
+            for value in (5, 5.0, '5', '5.0', ' 5', '5e0') for blank in ('', None, 0, '0')}
+
+    assert len(keys) == 1
+
+
+def test_key_separates_inputs_and_dates(appmod, factor_version):
+    key = appmod.calculation_cache_key({'asphalt_t': '5'})
+
+    assert appmod.calculation_cache_key({'asphalt_t': '6'}) != key
+    assert appmod.calculation_cache_key({'cement_t': '5'}) != key
+    assert appmod.calculation_cache_key({'asphalt_t': '5'}, on_date=appmod.date(2024, 1, 1)) != key
+
+
+def test_unhashable_inputs_are_not_keyed(appmod, factor_version):
+    assert appmod.calculation_cache_key({'asphalt_t': [5]}) is None
+    assert appmod.calculation_cache_key(['asphalt_t']) is None
@@ -0,0 +1,49 @@
+import pytest
+
+
+def rls_state(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT current_setting('app.user_id', true), current_user")
+    state = cur.fetchone()
+    cur.close()
+    return state
+
+
+def visible_project_owners(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT DISTINCT user_id FROM projects")
+    owners = {row[0] for row in cur.fetchall()}
+    cur.close()
+    return owners
+
+
+@pytest.mark.parametrize('end_of_request', ['commit', 'rollback', 'close'])
+def test_rls_context_does_not_leak_to_next_checkout(appmod, make_user, end_of_request):
+    user_a, user_b = make_user(), make_user()
+    # A single connection, so the second checkout reuses the first one's server session
+    pool = appmod.ConnectionPool(1, 1, 60, 5, 60)
+    try:
+        with appmod.app.test_request_context():
+            conn = pool.getconn()
+            conn.rls_context = ('app_user', str(user_a))
+            assert rls_state(conn) == (str(user_a), 'app_user')
+            assert visible_project_owners(conn) == {user_a}
+            server_session = conn._conn
+            if end_of_request != 'close':
+                getattr(conn, end_of_request)()
+            conn.close()
+
+        with appmod.app.test_request_context():
+            conn = pool.getconn()
+            assert conn._conn is server_session
+            setting, role = rls_state(conn)
+            assert setting in (None, '')
+            assert role != 'app_user'
+            conn.rollback()
+
+            conn.rls_context = ('app_user', str(user_b))
+            assert rls_state(conn) == (str(user_b), 'app_user')
+            assert visible_project_owners(conn) == {user_b}
+            conn.close()
+    finally:
+        pool.closeall()
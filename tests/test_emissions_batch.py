@@ -0,0 +1,70 @@
+import json
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+FACTORS = {
+    'Asphalt': 52.3, 'Aggregate': 4.9, 'Cement': 913.0, 'Steel': 1850.7,
+    'Diesel': 2.68, 'Electricity': 0.82, 'Transport': 0.062
+}
+FIELDS = ['asphalt_t', 'aggregate_t', 'cement_t', 'steel_t', 'diesel_l',
+          'electricity_kwh', 'transport_tkm', 'recycled_pct', 'renewable_pct']
+# Blanks, None, numeric strings, junk and zeros, as forms and JSON clients send them
+INPUT_VALUES = ['', None, '0', 0, 0.0, '5', ' 7.5 ', '1e3', '1_000', 'abc', '0x10', 'nan', 12, 3.25, True, '-4']
+
+
+def rows(count, seed=0):
+    rng = random.Random(seed)
+    return [{field: rng.choice(INPUT_VALUES) for field in FIELDS if rng.random() > 0.1}
+            for _ in range(count)]
+
+
+def scalar_results(appmod, scenarios):
+    return [appmod.calculate_emissions_data(dict(row), FACTORS) for row in scenarios]
+
+
+def batch_results(appmod, columns):
+    return appmod.emission_results_from_batch(appmod.calculate_emissions_batch(columns, FACTORS))
+
+
+def same(a, b):
+    # json.dumps compares NaN equal to NaN and tells -0.0 from 0.0
+    return json.dumps(a, sort_keys=True) == json.dumps(b, sort_keys=True)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_batch_matches_scalar_on_mixed_inputs(appmod, seed):
+    scenarios = rows(500, seed)
+    columns = {field: [row.get(field) for row in scenarios] for field in appmod.EMISSION_INPUT_FIELDS}
+
+    assert same(batch_results(appmod, columns), scalar_results(appmod, scenarios))
+
+
+def test_batch_matches_scalar_on_dataframe_and_records(appmod):
+    values = np.random.default_rng(1).uniform(0, 500, (50, len(FIELDS)))
+    scenarios = [dict(zip(FIELDS, row)) for row in values.tolist()]
+    expected = scalar_results(appmod, scenarios)
+
+    frame = pd.DataFrame(scenarios)
+    assert same(batch_results(appmod, frame), expected)
+    records = appmod.emission_input_records(frame)
+    assert same(batch_results(appmod, records), expected)
+
+
+def test_batch_reads_strings_like_float(appmod):
+    columns = appmod.emission_input_columns({'asphalt_t': ['1_000', ' 5 ', 'nan', 'abc', '', None, 2]})
+    values = columns['asphalt_t']
+
+    assert values[:2].tolist() == [1000.0, 5.0]
+    assert np.isnan(values[2])
+    assert values[3:].tolist() == [0.0, 0.0, 0.0, 2.0]
+
+
+def test_batch_reads_nan_numbers_as_blank(appmod):
+    # pandas marks a blank CSV cell as NaN
+    columns = appmod.emission_input_columns(pd.DataFrame({'asphalt_t': [1.0, np.nan], 'steel_t': ['x', np.nan]}))
+
+    assert columns['asphalt_t'].tolist() == [1.0, 0.0]
+    assert columns['steel_t'].tolist() == [0.0, 0.0]
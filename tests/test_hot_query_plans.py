@@ -0,0 +1,87 @@
+import uuid
+
+import pytest
+
+# Tables the hot queries reach through an index; a Seq Scan over any of them
+# means a page that slows down as the data grows
+INDEXED_TABLES = {
+    'users', 'projects', 'project_emission_totals', 'carbon_credits',
+    'marketplace_listings', 'recommendations', 'reports', 'user_data_versions'
+}
+USERS = 300
+PROJECTS_PER_USER = 10
+
+
+@pytest.fixture
+def seeded_user(admin_conn):
+    """
+    Seeds USERS users with PROJECTS_PER_USER projects each, plus credits,
+    recommendations, reports and a few active listings, and ANALYZEs.
+    Returns one of the users; they are all deleted afterwards.
+    """
+    prefix = f"plan-{uuid.uuid4().hex[:12]}-"
+    cur = admin_conn.cursor()
+    cur.execute("""
+        INSERT INTO users (username, email)
+        SELECT %(prefix)s || g, %(prefix)s || g || '@test.invalid' FROM generate_series(1, %(users)s) g
+    """, {'prefix': prefix, 'users': USERS})
+    cur.execute("""
+        INSERT INTO projects (user_id, name, type, start_date, end_date)
+        SELECT u.id, 'Plan test ' || g, 'Road', DATE '2024-01-01' + g * 30, DATE '2024-06-01' + g * 30
+        FROM users u CROSS JOIN generate_series(1, %s) g
+        WHERE u.username LIKE %s
+    """, (PROJECTS_PER_USER, prefix + '%'))
+    cur.execute("""
+        INSERT INTO emissions (project_id, asphalt_t, diesel_l, electricity_kwh, transport_tkm, recycled_pct)
+        SELECT p.id, p.id %% 997, 50, 1000, 20, p.id %% 40
+        FROM projects p JOIN users u ON u.id = p.user_id WHERE u.username LIKE %s
+    """, (prefix + '%',))
+    cur.execute("""
+        INSERT INTO carbon_credits (project_id, user_id, credits_earned, issued_at)
+        SELECT p.id, p.user_id, p.id %% 101, p.start_date
+        FROM projects p JOIN users u ON u.id = p.user_id WHERE u.username LIKE %s
+    """, (prefix + '%',))
+    cur.execute("""
+        INSERT INTO recommendations (project_id, title, description, impact, category, display_order)
+        SELECT p.id, 'Recommendation ' || g, 'Text', 'High', 'Materials', g
+        FROM projects p JOIN users u ON u.id = p.user_id CROSS JOIN generate_series(1, 5) g
+        WHERE u.username LIKE %s
+    """, (prefix + '%',))
+    cur.execute("""
+        INSERT INTO reports (user_id, project_id, name, file_path)
+        SELECT p.user_id, p.id, 'Report', '/dev/null'
+        FROM projects p JOIN users u ON u.id = p.user_id WHERE u.username LIKE %s
+    """, (prefix + '%',))
+    # Most listings have been sold; one seller in fifty has one up for sale
+    cur.execute("""
+        INSERT INTO marketplace_listings (credit_id, seller_id, quantity_available, price_per_credit, status)
+        SELECT cc.id, cc.user_id, 1, 10, CASE WHEN cc.id %% 500 = 0 THEN 'active' ELSE 'sold' END
+        FROM carbon_credits cc JOIN users u ON u.id = cc.user_id WHERE u.username LIKE %s
+    """, (prefix + '%',))
+    for table in sorted(INDEXED_TABLES) + ['emissions']:
+        cur.execute(f"ANALYZE {table}")
+    cur.execute("SELECT min(id) FROM users WHERE username LIKE %s", (prefix + '%',))
+    user_id = cur.fetchone()[0]
+    yield user_id
+    cur.execute("DELETE FROM users WHERE username LIKE %s", (prefix + '%',))
+    cur.close()
+
+
+def test_hot_queries_use_indexes(appmod, admin_conn, seeded_user):
+    conn = admin_conn
+    conn.autocommit = False
+    cur = conn.cursor()
+    # As the app runs them: app_user under row level security, default planner settings
+    cur.execute("SELECT set_config('role', 'app_user', true), set_config('app.user_id', %s, true)",
+                (str(seeded_user),))
+    scans = {}
+    try:
+        for name, query in appmod.HOT_QUERIES.items():
+            cur.execute("EXPLAIN (FORMAT JSON) " + query, appmod._sample_params(query, seeded_user))
+            relations = set(appmod._seq_scanned_relations(cur.fetchone()[0][0]['Plan'])) & INDEXED_TABLES
+            if relations:
+                scans[name] = sorted(relations)
+    finally:
+        conn.rollback()
+        conn.autocommit = True
+    assert not scans, f"Seq Scan on indexed tables: {scans}"
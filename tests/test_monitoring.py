@@ -0,0 +1,23 @@
+import pytest
+
+MONITORING_ENDPOINTS = ['/api/db/pool-stats', '/api/cache/stats']
+
+
+@pytest.fixture
+def monitor(appmod):
+    def monitor(path, role=None):
+        client = appmod.app.test_client()
+        if role:
+            with client.session_transaction() as session:
+                session.update(user_id=1, username='monitor', role=role)
+        return client.get(path)
+    return monitor
+
+
+@pytest.mark.parametrize('path', MONITORING_ENDPOINTS)
+def test_monitoring_needs_admin(monitor, path):
+    assert monitor(path).status_code == 302  # to the login page
+    assert monitor(path, role='user').status_code == 403
+    response = monitor(path, role='admin')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'success'
@@ -0,0 +1,40 @@
+import pytest
+
+
+@pytest.fixture
+def executed_statements(appmod, monkeypatch):
+    """Every statement RLSCursor records into g.query_stats, in order."""
+    statements = []
+    record = appmod.RequestQueryStats.record
+
+    def recording(self, query, elapsed):
+        statements.append(appmod.normalize_sql(query))
+        record(self, query, elapsed)
+
+    monkeypatch.setattr(appmod, 'SQL_INSTRUMENTATION', True)
+    monkeypatch.setattr(appmod.RequestQueryStats, 'record', recording)
+    return statements
+
+
+def saved_project(client):
+    response = client.post('/save-project', json={
+        'project_name': 'Budget test', 'project_type': 'Road Construction', 'location': 'Test',
+        'start_date': '2026-01-01', 'end_date': '2026-12-31', 'asphalt_t': 100, 'aggregate_t': 50,
+        'cement_t': 20, 'steel_t': 5, 'diesel_l': 1000, 'electricity_kwh': 5000, 'transport_tkm': 2000,
+        'recycled_pct': 20, 'renewable_pct': 30
+    })
+    return response.get_json()['project_id']
+
+
+def test_project_detail_runs_at_most_two_statements(appmod, client, executed_statements):
+    project_id = saved_project(client)
+    # First visit (may PREPARE), a warm one, and one due for a factor version check
+    for invalidate_factors in (False, False, True):
+        if invalidate_factors:
+            appmod.emission_factor_cache.invalidate()
+        executed_statements.clear()
+        response = client.get(f'/project/{project_id}')
+
+        assert response.status_code == 200
+        assert f'desc="{len(executed_statements)} queries"' in response.headers['Server-Timing']
+        assert len(executed_statements) <= 2, "\n".join(executed_statements)
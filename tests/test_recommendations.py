@@ -0,0 +1,100 @@
+import itertools
+
+import pytest
+
+# (breakdown key, catalog group, share of total emissions above which it applies)
+HOTSPOTS = (
+    ('Materials', 'materials', 0.3),
+    ('Equipment Fuel', 'equipment', 0.2),
+    ('Electricity', 'energy', 0.15),
+    ('Transport', 'transport', 0.25)
+)
+PROJECT_TYPES = (None, '', 'Building Renovation', 'Road Construction', 'Highway Widening', 'Bridge')
+
+
+def baseline_recommendations(catalog, emission_data, project_type=None):
+    """generate_recommendations() as it was before the catalog was precompiled."""
+    material_recommendations = list(catalog['materials'])
+    equipment_recommendations = list(catalog['equipment'])
+    energy_recommendations = list(catalog['energy'])
+    transport_recommendations = list(catalog['transport'])
+    general_recommendations = list(catalog['general'])
+
+    project_specific_recommendations = []
+    if project_type:
+        if 'Building' in project_type or 'Construction' in project_type:
+            project_specific_recommendations.extend(catalog['building'])
+        elif 'Road' in project_type or 'Highway' in project_type:
+            project_specific_recommendations.extend(catalog['road'])
+
+    breakdown = emission_data['breakdown']
+    total_emissions = emission_data['total_co2e']
+    all_recommendations = []
+    if breakdown.get('Materials', 0) > total_emissions * 0.3:
+        all_recommendations.extend(material_recommendations)
+    if breakdown.get('Equipment Fuel', 0) > total_emissions * 0.2:
+        all_recommendations.extend(equipment_recommendations)
+    if breakdown.get('Electricity', 0) > total_emissions * 0.15:
+        all_recommendations.extend(energy_recommendations)
+    if breakdown.get('Transport', 0) > total_emissions * 0.25:
+        all_recommendations.extend(transport_recommendations)
+    all_recommendations.extend(general_recommendations)
+    all_recommendations.extend(project_specific_recommendations)
+
+    if not all_recommendations:
+        all_recommendations.extend(material_recommendations[:2])
+        all_recommendations.extend(equipment_recommendations[:2])
+        all_recommendations.extend(energy_recommendations[:1])
+        all_recommendations.extend(transport_recommendations[:1])
+        all_recommendations.extend(general_recommendations[:2])
+
+    unique_recommendations = []
+    seen_titles = set()
+    for rec in all_recommendations:
+        if rec['title'] not in seen_titles:
+            seen_titles.add(rec['title'])
+            unique_recommendations.append(rec)
+    return unique_recommendations
+
+
+def emission_data(flags, total=100.0):
+    # A flag that is off sits exactly on its threshold, which does not count
+    breakdown = {key: total * share + (1 if flag else 0)
+                 for flag, (key, _, share) in zip(flags, HOTSPOTS)}
+    return {'total_co2e': total, 'breakdown': breakdown}
+
+
+@pytest.mark.parametrize('flags', list(itertools.product((False, True), repeat=len(HOTSPOTS))))
+@pytest.mark.parametrize('project_type', PROJECT_TYPES)
+def test_generate_recommendations_matches_baseline(appmod, flags, project_type):
+    data = emission_data(flags)
+    expected = baseline_recommendations(appmod.RECOMMENDATION_CATALOG, data, project_type)
+
+    result = appmod.generate_recommendations(data, project_type)
+
+    assert [dict(rec) for rec in result] == [dict(rec) for rec in expected]
+    for (_, group, _), flag in zip(HOTSPOTS, flags):
+        assert flag == any(rec in result for rec in appmod.RECOMMENDATION_CATALOG[group])
+
+
+@pytest.mark.parametrize('data', [
+    {'total_co2e': 0, 'breakdown': {}},
+    {'total_co2e': 0, 'breakdown': {'Materials': 0, 'Transport': 1}},
+    {'total_co2e': 50, 'breakdown': {'Electricity': 50}}
+])
+def test_generate_recommendations_matches_baseline_on_edge_cases(appmod, data):
+    for project_type in PROJECT_TYPES:
+        expected = baseline_recommendations(appmod.RECOMMENDATION_CATALOG, data, project_type)
+        assert appmod.generate_recommendations(data, project_type) == expected
+
+
+def test_recommendation_candidates_split_by_priority_category(appmod):
+    for (flags, type_group), (recommendations, by_category) in appmod.RECOMMENDATION_TABLE.items():
+        for category in appmod.RECOMMENDATION_CATEGORY_PRIORITY:
+            assert list(by_category[category]) == [rec for rec in recommendations if rec['category'] == category]
+
+
+def test_recommendations_are_read_only(appmod):
+    rec = appmod.generate_recommendations(emission_data((True,) * len(HOTSPOTS)), 'Road')[0]
+    with pytest.raises(TypeError):
+        rec['title'] = 'Changed'
@@ -0,0 +1,68 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+
+def brute_force_allocation(starts, ends, totals, edges):
+    """Spreads every interval day by day (both ends inclusive) into the buckets."""
+    edges = [day.item() for day in edges]
+    buckets = np.zeros(len(edges) - 1)
+    for start, end, total in zip(starts, ends, totals):
+        if start is None or end is None or end < start:
+            continue
+        days = (end - start).days + 1
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            for i in range(len(buckets)):
+                if edges[i] <= day < edges[i + 1]:
+                    buckets[i] += total / days
+    return buckets
+
+
+def random_intervals(count, seed):
+    rng = np.random.default_rng(seed)
+    first = date(2023, 1, 1)
+    starts, ends, totals = [], [], []
+    for _ in range(count):
+        start = first + timedelta(days=int(rng.integers(-60, 800)))
+        # Same-day projects, long ones and a few that end before they start
+        end = start + timedelta(days=int(rng.choice([0, 1, rng.integers(-5, 400)])))
+        starts.append(None if rng.random() < 0.05 else start)
+        ends.append(None if rng.random() < 0.05 else end)
+        totals.append(float(rng.uniform(0, 1000)))
+    return starts, ends, totals
+
+
+@pytest.mark.parametrize('period', ['week', 'month', 'quarter', 'year'])
+def test_allocation_matches_day_by_day_loop(appmod, period):
+    starts, ends, totals = random_intervals(300, seed=len(period))
+    edges = appmod.period_edges(date(2023, 2, 10), date(2024, 11, 20), period)
+
+    allocated = appmod.allocate_to_periods(appmod.dates_to_days(starts), appmod.dates_to_days(ends), totals, edges)
+
+    np.testing.assert_allclose(allocated, brute_force_allocation(starts, ends, totals, edges), rtol=1e-9, atol=1e-9)
+
+
+def test_allocation_counts_both_end_days(appmod):
+    edges = appmod.period_edges(date(2024, 1, 1), date(2024, 2, 29), 'month')
+
+    allocated = appmod.allocate_to_periods(appmod.dates_to_days([date(2024, 1, 31), date(2024, 2, 10)]),
+                                           appmod.dates_to_days([date(2024, 2, 1), date(2024, 2, 10)]),
+                                           [2.0, 5.0], edges)
+
+    # Jan 31 - Feb 1 is two days, one in each month; a same-day project lands on its day
+    assert allocated.tolist() == [1.0, 6.0]
+
+
+@pytest.mark.parametrize('period', ['week', 'month', 'quarter', 'year'])
+def test_period_edges_cover_range(appmod, period):
+    first, last = date(2024, 1, 3), date(2025, 3, 30)
+    edges = [day.item() for day in appmod.period_edges(first, last, period)]
+
+    assert edges[0] <= first < edges[1]
+    assert edges[-2] <= last < edges[-1]
+    if period == 'week':
+        assert all(day.weekday() == 0 for day in edges)
+    else:
+        assert all(day.day == 1 for day in edges)